@@ -0,0 +1,70 @@
+"""Compare the parallel image discovery with Path.glob on a synthetic directory tree.
+
+Network shares answer each directory listing with a delay, --latency-ms simulates that
+by waiting in every call of os.scandir. Run from the repository root, e.g.:
+
+    python benchmarks/bench_discovery.py --depth 3 --fanout 6 --latency-ms 5
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from phrugal.discovery import ImageFilter, find_images
+
+
+def _create_tree(target: Path, depth: int, fanout: int, files: int) -> int:
+    """Create empty image files in a tree of directories, return the number of files."""
+    count = 0
+    for i in range(files):
+        (target / f"{i}.jpg").touch()
+        (target / f"{i}.txt").touch()
+        count += 1
+    if depth > 0:
+        for i in range(fanout):
+            subdir = target / f"dir{i}"
+            subdir.mkdir()
+            count += _create_tree(subdir, depth - 1, fanout, files)
+    return count
+
+
+def _add_latency(latency: float) -> None:
+    scandir = os.scandir
+
+    def slow_scandir(path="."):
+        time.sleep(latency)
+        return scandir(path)
+
+    os.scandir = slow_scandir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=6)
+    parser.add_argument("--files", type=int, default=20, help="files per directory")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with TemporaryDirectory(prefix="phrugal-bench") as temp_dir:
+        root = Path(temp_dir)
+        count = _create_tree(root, args.depth, args.fanout, args.files)
+        _add_latency(args.latency_ms / 1000)
+
+        start = time.perf_counter()
+        globbed = list(root.glob("**/*.jpg"))
+        glob = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = list(find_images(root, ImageFilter(extensions={".jpg"})))
+        discovery = time.perf_counter() - start
+        assert len(globbed) == len(found) == count
+
+    print(f"{'files':>6} {'glob [s]':>9} {'find_images [s]':>16} {'speedup':>8}")
+    print(f"{count:>6} {glob:>9.3f} {discovery:>16.3f} {glob / discovery:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
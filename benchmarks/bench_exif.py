@@ -0,0 +1,101 @@
+"""Compare reading EXIF data with exifread to the selective reading of phrugal.
+
+Each image is read from its file, once with a full exifread parse (as phrugal did
+before), once with exifread without MakerNote and thumbnail, and once with
+phrugal.exif_reader, which only reads the tags needed by the default config. The
+synthetic images have a MakerNote of --maker-note-kb, like the files of most cameras.
+Run from the repository root, e.g.:
+
+    python benchmarks/bench_exif.py --count 100 --maker-note-kb 60
+"""
+
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import exifread
+from phrugal.decoration_config import DecorationConfig
+from phrugal.exif_reader import ExifTagReader
+from phrugal.metrics import CountingFileIO
+
+from corpus import CorpusSpec, create_corpus
+
+MODES = ["exifread", "exifread_no_details", "selective"]
+
+
+def read_tags(path: Path, mode: str, tag_names: frozenset[str]) -> tuple[dict, int]:
+    """Read the tags of an image, return them and the bytes read from the file."""
+    raw_file = CountingFileIO(path, "rb")
+    with io.BufferedReader(raw_file) as fp:
+        if mode == "exifread":
+            tags = exifread.process_file(fp)
+        elif mode == "exifread_no_details":
+            tags = exifread.process_file(fp, details=False)
+        else:
+            tags = ExifTagReader(fp, tag_names).read()
+    return tags, raw_file.bytes_read
+
+
+def run(files: list[Path], repeat: int) -> dict:
+    config = DecorationConfig()
+    config.load_default_config()
+    tag_names = frozenset(config.get_required_exif_tags())
+    results = dict()
+    for mode in MODES:
+        runs = []
+        for _ in range(repeat):
+            bytes_read = 0
+            start = time.perf_counter()
+            for f in files:
+                bytes_read += read_tags(f, mode, tag_names)[1]
+            runs.append(time.perf_counter() - start)
+        median = statistics.median(runs)
+        results[mode] = {
+            "runs": runs,
+            "median_seconds": median,
+            "median_seconds_per_item": median / len(files),
+            "bytes_read_per_item": bytes_read / len(files),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--count", type=int, default=CorpusSpec.count)
+    parser.add_argument("--maker-note-kb", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    # the pixels do not matter here, small images are created faster
+    spec = CorpusSpec(
+        count=args.count, resolution=(640, 480), maker_note_kb=args.maker_note_kb
+    )
+    with TemporaryDirectory(prefix="phrugal-bench") as temp_dir:
+        print(f"creating {spec.count} images in {temp_dir}...", file=sys.stderr)
+        files = create_corpus(temp_dir, spec)
+        results = run(files, args.repeat)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fp:
+            json.dump({"corpus": spec.as_dict(), "results": results}, fp, indent=2)
+
+    baseline = results["exifread"]["median_seconds"]
+    print(f"{'mode':<22} {'per item [ms]':>14} {'read [kB]':>10} {'speedup':>8}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<22} {result['median_seconds_per_item'] * 1000:>14.3f} "
+            f"{result['bytes_read_per_item'] / 1024:>10.1f} "
+            f"{baseline / result['median_seconds']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
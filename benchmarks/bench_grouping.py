@@ -0,0 +1,80 @@
+"""Compare the grouping strategies by time and wasted area of the prints.
+
+The images are only headers (ImageInfo) of different resolution and orientation, so
+that tens of thousands of them need no files. Run from the repository root, e.g.:
+
+    python benchmarks/bench_grouping.py --count 1000 20000 --group-len 4
+"""
+
+import argparse
+import random
+import time
+from fractions import Fraction
+from pathlib import Path
+
+from phrugal.grouping import GroupingStrategy, get_wasted_area, group_images
+from phrugal.image import ImageInfo
+
+# strategies that need no EXIF data
+STRATEGIES = [
+    GroupingStrategy.ASPECT_RATIO,
+    GroupingStrategy.ORDER,
+    GroupingStrategy.AREA,
+]
+LONG_SIDES = [1200, 2000, 4000, 6000]  # e.g. phone, scans and cameras
+ASPECT_RATIOS = [Fraction(3, 2), Fraction(4, 3), Fraction(16, 9), Fraction(1)]
+
+
+def get_images(count: int, seed: int) -> list[ImageInfo]:
+    rng = random.Random(seed)
+    images = []
+    for i in range(count):
+        long_side = rng.choice(LONG_SIDES)
+        dims = (long_side, int(long_side / rng.choice(ASPECT_RATIOS)))
+        if rng.random() < 0.3:
+            dims = dims[::-1]
+        images.append(ImageInfo(Path(f"img{i:05d}.jpg"), dims))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--group-len", type=int, default=4)
+    parser.add_argument("--aspect-ratio", type=Fraction, default=Fraction(4, 3))
+    parser.add_argument(
+        "--print-long-side",
+        type=int,
+        help="long side of the compositions in pixel (default: not scaled)",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(
+        f"{'images':>7} {'strategy':<13} {'time [s]':>9} {'prints':>7} "
+        f"{'wasted [prints]':>16} {'wasted':>7}"
+    )
+    for count in args.count:
+        images = get_images(count, args.seed)
+        for strategy in STRATEGIES:
+            start = time.perf_counter()
+            groups = group_images(
+                images,
+                args.group_len,
+                strategy,
+                args.aspect_ratio,
+                args.print_long_side,
+            )
+            seconds = time.perf_counter() - start
+            wasted = sum(
+                get_wasted_area(g, args.aspect_ratio, args.print_long_side)
+                for g in groups
+            )
+            print(
+                f"{count:>7} {strategy:<13} {seconds:>9.3f} {len(groups):>7} "
+                f"{wasted:>16.1f} {wasted / len(groups):>7.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
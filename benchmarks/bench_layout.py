@@ -0,0 +1,54 @@
+"""Compare pairwise merging of decorated images with the single pass layout planner.
+
+Run from the repository root, e.g.:
+
+    python benchmarks/bench_layout.py --count 4 8 16 --size 3000x2250
+"""
+
+import argparse
+import time
+
+import PIL.Image
+
+from phrugal.composition import ImageComposition
+
+
+def _parse_size(value: str) -> tuple[int, int]:
+    x, y = value.lower().split("x")
+    return int(x), int(y)
+
+
+def _get_images(count: int, size: tuple[int, int]) -> list[PIL.Image.Image]:
+    noise = PIL.Image.effect_noise((size[0] // 4, size[1] // 4), 60).resize(size)
+    return [PIL.Image.merge("RGB", (noise, noise, noise)) for _ in range(count)]
+
+
+def _time_composition(images, single_pass: bool, repeat: int) -> float:
+    composition = ImageComposition([], target_aspect_ratio=4 / 3)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        composition.get_composition(images, single_pass=single_pass)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, nargs="+", default=[2, 4, 8, 16])
+    parser.add_argument("--size", type=_parse_size, default=(3000, 2250))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'images':>6} {'pairwise [s]':>13} {'single pass [s]':>16} {'speedup':>8}")
+    for count in args.count:
+        images = _get_images(count, args.size)
+        pairwise = _time_composition(images, single_pass=False, repeat=args.repeat)
+        single_pass = _time_composition(images, single_pass=True, repeat=args.repeat)
+        print(
+            f"{count:>6} {pairwise:>13.3f} {single_pass:>16.3f} {pairwise / single_pass:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
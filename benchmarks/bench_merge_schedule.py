@@ -0,0 +1,56 @@
+"""Compare scheduling the layout merges with a heap to sorting the list before each merge.
+
+Only the layout is planned, no pixels are involved. Run from the repository root, e.g.:
+
+    python benchmarks/bench_merge_schedule.py --count 10 100 1000 3000
+"""
+
+import argparse
+import time
+
+from phrugal.layout import LayoutNode, LayoutPlanner, merge_pairwise
+
+
+def _get_nodes(count: int) -> list[LayoutNode]:
+    return [LayoutNode.for_image(i, (400 + i % 7, 300 + i % 5)) for i in range(count)]
+
+
+def _merge_by_sorting(nodes: list[LayoutNode]) -> LayoutNode:
+    """The schedule used before, sort and pop from the front for every merge"""
+    while len(nodes) > 1:
+        nodes.sort(key=lambda n: n.count)
+        nodes.append(LayoutPlanner._merge_two_nodes(nodes.pop(0), nodes.pop(0)))
+    return nodes[0]
+
+
+def _merge_with_heap(nodes: list[LayoutNode]) -> LayoutNode:
+    return merge_pairwise(
+        nodes, merge=LayoutPlanner._merge_two_nodes, get_count=lambda n: n.count
+    )
+
+
+def _time_schedule(schedule, count: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        nodes = _get_nodes(count)
+        start = time.perf_counter()
+        schedule(nodes)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, nargs="+", default=[10, 100, 1000, 3000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'tiles':>6} {'sorting [s]':>12} {'heap [s]':>10} {'speedup':>8}")
+    for count in args.count:
+        sorting = _time_schedule(_merge_by_sorting, count, args.repeat)
+        heap = _time_schedule(_merge_with_heap, count, args.repeat)
+        print(f"{count:>6} {sorting:>12.4f} {heap:>10.4f} {sorting / heap:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compare header-only probing of image files with opening them in pillow.
+
+Run from the repository root, e.g.:
+
+    python benchmarks/bench_probe.py --count 10000
+"""
+
+import argparse
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from phrugal.image import PhrugalImage
+from phrugal.probe import probe_images
+
+TEST_IMAGES = Path(__file__).parent.parent / "test" / "img"
+
+
+def _create_files(target: Path, count: int) -> list[Path]:
+    """Link the test images again and again, so the OS cache serves all reads."""
+    sources = sorted(TEST_IMAGES.glob("**/*.jpg"))
+    files = []
+    for i in range(count):
+        link = target / f"{i}.jpg"
+        link.symlink_to(sources[i % len(sources)].resolve())
+        files.append(link)
+    return files
+
+
+def _open_with_pillow(files: list[Path]) -> None:
+    for f in files:
+        with PhrugalImage(f) as img:
+            __ = img.aspect_ratio_normalized
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with TemporaryDirectory(prefix="phrugal-bench") as temp_dir:
+        files = _create_files(Path(temp_dir), args.count)
+        start = time.perf_counter()
+        _open_with_pillow(files)
+        pillow = time.perf_counter() - start
+
+        start = time.perf_counter()
+        probe_images(files, max_workers=args.workers)
+        probe = time.perf_counter() - start
+
+    print(f"{'files':>6} {'PhrugalImage [s]':>17} {'probe [s]':>10} {'speedup':>8}")
+    print(f"{args.count:>6} {pillow:>17.3f} {probe:>10.3f} {pillow / probe:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Time the startup of the phrugal CLI and fail if it exceeds a budget.
+
+Every command is run in a fresh interpreter, the median of the runs is compared to the
+budget. The imports of the slowest modules are listed with -X importtime, which helps
+to find out what made the startup slower. Run from the repository root, e.g.:
+
+    python benchmarks/bench_startup.py --repeat 20 --budget-ms 150
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+COMMANDS = {
+    "version": ["--version"],
+    "help": ["--help"],
+    "default_config": ["--create-default-config", "{temp_dir}/config.json"],
+}
+
+
+def _get_env() -> dict:
+    env = dict(os.environ)
+    # find phrugal in the child process the same way as here, e.g. via PYTHONPATH
+    env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+    return env
+
+
+def time_command(command: list[str], repeat: int) -> list[float]:
+    """Run the command repeatedly, return the wall times in seconds."""
+    env = _get_env()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, env=env, capture_output=True)
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def get_slowest_imports(count: int) -> list[tuple[int, str]]:
+    """Return the cumulative import time in µs of the slowest modules of the CLI."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import phrugal.cli"],
+        check=True,
+        env=_get_env(),
+        capture_output=True,
+        text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=150.0,
+        help="maximum median startup time of --version (default: 150)",
+    )
+    parser.add_argument("--only", nargs="+", choices=COMMANDS, default=list(COMMANDS))
+    parser.add_argument(
+        "--imports", type=int, default=10, help="list this many of the slowest imports"
+    )
+    args = parser.parse_args()
+
+    # the interpreter alone, to tell the startup of phrugal from the one of python
+    python_runs = time_command([sys.executable, "-c", "pass"], args.repeat)
+    python_ms = 1000 * statistics.median(python_runs)
+    print(f"{'command':<16} {'median [ms]':>12} {'best [ms]':>10}")
+    print(f"{'python':<16} {python_ms:>12.1f} {1000 * min(python_runs):>10.1f}")
+    medians = dict()
+    with TemporaryDirectory(prefix="phrugal-bench") as temp_dir:
+        for name in args.only:
+            command = [sys.executable, "-m", "phrugal.cli"]
+            command += [a.format(temp_dir=temp_dir) for a in COMMANDS[name]]
+            runs = time_command(command, args.repeat)
+            medians[name] = 1000 * statistics.median(runs)
+            print(f"{name:<16} {medians[name]:>12.1f} {1000 * min(runs):>10.1f}")
+
+    if args.imports:
+        print(f"\n{'module':<40} {'import [ms]':>12}")
+        for cumulative, module in get_slowest_imports(args.imports):
+            print(f"{module:<40} {cumulative / 1000:>12.1f}")
+
+    if "version" in medians and medians["version"] > args.budget_ms:
+        sys.exit(
+            f"phrugal --version took {medians['version']:.1f} ms, "
+            f"the budget is {args.budget_ms:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
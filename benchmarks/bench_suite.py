@@ -0,0 +1,301 @@
+"""Time phrugal end to end and stage by stage on a synthetic corpus, fully offline.
+
+The corpus is created by corpus.py, with EXIF and GPS data. Geocoding sends its requests
+to phrugal.nominatim_stub, a local stand-in for Nominatim (optionally with a simulated
+latency), the end to end run of the CLI uses the gazetteer of the corpus.
+
+The results are written as JSON, so that they can be compared between releases. With
+--compare, the medians are compared to an earlier result and the script fails if a
+benchmark got slower than the threshold allows. Run from the repository root, e.g.:
+
+    python benchmarks/bench_suite.py --count 40 --out results-1.2.json
+    python benchmarks/bench_suite.py --count 40 --out results-1.3.json --compare results-1.2.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from fractions import Fraction
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable
+
+import phrugal
+from phrugal.composition import ImageComposition, ImageMerge
+from phrugal.decorated_image import DecoratedPhrugalImage
+from phrugal.decoration_config import DecorationConfig
+from phrugal.exif import PhrugalExifData
+from phrugal.geocode import Geocoder
+from phrugal.image import PhrugalImage
+from phrugal.nominatim_stub import NominatimStub
+
+from corpus import (
+    GAZETTEER_NAME,
+    CorpusSpec,
+    create_corpus,
+    get_nominatim_places,
+    parse_resolution,
+)
+
+RESULTS_VERSION = 1
+BENCHMARKS = ["exif", "geocode", "decorate", "merge_image_list", "cli"]
+
+
+def _reset_geocoder() -> None:
+    Geocoder._ADDRESS_CACHE = dict()
+    Geocoder.GEOCODE_CACHE = None
+
+
+def _time(function: Callable[[], None], repeat: int, items: int) -> dict:
+    """Run the function repeatedly, return the timings in seconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    median = statistics.median(runs)
+    return {
+        "items": items,
+        "runs": runs,
+        "best_seconds": min(runs),
+        "median_seconds": median,
+        "median_seconds_per_item": median / items if items else None,
+    }
+
+
+def _bench_exif(files: list[Path], repeat: int) -> dict:
+    def parse_all():
+        for f in files:
+            PhrugalExifData(f)
+
+    return _time(parse_all, repeat, len(files))
+
+
+def _bench_geocode(files: list[Path], stub: NominatimStub, repeat: int) -> dict:
+    points = [PhrugalExifData(f).get_gps_decimal() for f in files]
+    points = [p for p in points if p is not None]
+    geocoder = Geocoder()
+    requests_before = stub.request_count
+
+    def geocode_all():
+        _reset_geocoder()  # every run starts cold
+        for lat, lon in points:
+            geocoder.get_location_name(lat, lon)
+
+    result = _time(geocode_all, repeat, len(points))
+    result["requests_per_run"] = (stub.request_count - requests_before) / repeat
+    return result
+
+
+def _decorate(files: list[Path], config: DecorationConfig) -> list:
+    decorated = []
+    for f in files:
+        with PhrugalImage(f) as image:
+            decorator = DecoratedPhrugalImage(
+                image, target_aspect_ratio=Fraction(3, 2), decoration_config=config
+            )
+            decorated.append(decorator.get_decorated_image())
+    return decorated
+
+
+def _bench_decorate(files: list[Path], config: DecorationConfig, repeat: int) -> dict:
+    return _time(lambda: _decorate(files, config), repeat, len(files))
+
+
+def _bench_merge_image_list(
+    files: list[Path], config: DecorationConfig, repeat: int
+) -> dict:
+    group_len = min(config.get_image_count(), len(files))
+    decorated = _decorate(files[:group_len], config)
+
+    def merge():
+        merges = [ImageMerge(image=image, count=1) for image in decorated]
+        ImageComposition._merge_image_list(merges, draw_separator=True)
+
+    return _time(merge, repeat, 1)
+
+
+def _bench_cli(corpus: Path, jobs: int, repeat: int) -> dict:
+    """Run the CLI as a user would, the stage metrics of the last run are included."""
+    with TemporaryDirectory(prefix="phrugal-bench-out") as temp_dir:
+        metrics_path = Path(temp_dir) / "metrics.json"
+        command = [
+            sys.executable,
+            "-m",
+            "phrugal.cli",
+            "--input-dir",
+            str(corpus),
+            "--output-dir",
+            str(Path(temp_dir) / "out"),
+            "--gazetteer",
+            str(corpus / GAZETTEER_NAME),
+            "--jobs",
+            str(jobs),
+            "--metrics-out",
+            str(metrics_path),
+        ]
+        env = dict(os.environ)
+        # find phrugal in the child process the same way as here, e.g. via PYTHONPATH
+        env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+        image_count = len(list(corpus.glob("*.jpg")))
+        result = _time(
+            lambda: subprocess.run(
+                command, check=True, env=env, capture_output=True, text=True
+            ),
+            repeat,
+            image_count,
+        )
+        with open(metrics_path, "r", encoding="utf-8") as fp:
+            result["metrics"] = json.load(fp)
+    return result
+
+
+def run_benchmarks(
+    corpus: Path,
+    files: list[Path],
+    selected: list[str],
+    repeat: int,
+    jobs: int,
+    geocode_latency: float,
+) -> dict:
+    config = DecorationConfig()
+    config.load_default_config()
+    stub = NominatimStub(get_nominatim_places(), latency_seconds=geocode_latency)
+    Geocoder.set_nominatim_url(stub.start().url, min_delay_seconds=0.0)
+
+    benchmarks = {
+        "exif": lambda: _bench_exif(files, repeat),
+        "geocode": lambda: _bench_geocode(files, stub, repeat),
+        "decorate": lambda: _bench_decorate(files, config, repeat),
+        "merge_image_list": lambda: _bench_merge_image_list(files, config, repeat),
+        "cli": lambda: _bench_cli(corpus, jobs, repeat),
+    }
+    results = dict()
+    try:
+        for name in selected:
+            print(f"running {name}...", file=sys.stderr)
+            _reset_geocoder()
+            results[name] = benchmarks[name]()
+    finally:
+        stub.stop()
+    return results
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Print the change of the medians, return the benchmarks that got slower."""
+    regressions = []
+    print(f"{'benchmark':<18} {'baseline [s]':>13} {'current [s]':>12} {'change':>8}")
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        old_median, new_median = old["median_seconds"], result["median_seconds"]
+        change = new_median / old_median - 1 if old_median else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  <- slower"
+        print(
+            f"{name:<18} {old_median:>13.4f} {new_median:>12.4f} {change:>+8.1%}{flag}"
+        )
+    if baseline.get("corpus") != current.get("corpus"):
+        print("note: the results were measured on different corpora")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--count", type=int, default=CorpusSpec.count)
+    parser.add_argument(
+        "--resolution",
+        type=parse_resolution,
+        default="1600x1200",
+        help="e.g. 4000x3000",
+    )
+    parser.add_argument(
+        "--portrait-ratio", type=float, default=CorpusSpec.portrait_ratio
+    )
+    parser.add_argument("--rotated-ratio", type=float, default=CorpusSpec.rotated_ratio)
+    parser.add_argument("--seed", type=int, default=CorpusSpec.seed)
+    parser.add_argument(
+        "--corpus",
+        help="keep the corpus in this directory, it is created if it does not exist",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=1, help="workers of the CLI run")
+    parser.add_argument("--geocode-latency-ms", type=float, default=0.0)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of earlier results")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown of the median that counts as regression (default: 0.1)",
+    )
+    args = parser.parse_args()
+
+    spec = CorpusSpec(
+        count=args.count,
+        resolution=args.resolution,
+        portrait_ratio=args.portrait_ratio,
+        rotated_ratio=args.rotated_ratio,
+        seed=args.seed,
+    )
+    with TemporaryDirectory(prefix="phrugal-bench") as temp_dir:
+        corpus = Path(args.corpus) if args.corpus else Path(temp_dir)
+        files = sorted(corpus.glob("*.jpg"))
+        if len(files) != spec.count:
+            print(f"creating {spec.count} images in {corpus}...", file=sys.stderr)
+            files = create_corpus(corpus, spec)
+        results = run_benchmarks(
+            corpus,
+            files,
+            args.only,
+            args.repeat,
+            args.jobs,
+            args.geocode_latency_ms / 1000,
+        )
+
+    current = {
+        "version": RESULTS_VERSION,
+        "phrugal_version": phrugal.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "corpus": spec.as_dict(),
+        "settings": {
+            "repeat": args.repeat,
+            "jobs": args.jobs,
+            "geocode_latency_ms": args.geocode_latency_ms,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fp:
+            json.dump(current, fp, indent=2)
+
+    print(f"{'benchmark':<18} {'median [s]':>11} {'per item [ms]':>14}")
+    for name, result in results.items():
+        per_item = result["median_seconds_per_item"] * 1000
+        print(f"{name:<18} {result['median_seconds']:>11.4f} {per_item:>14.2f}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        print()
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            sys.exit(f"slower than {args.compare}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
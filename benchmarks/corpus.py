@@ -0,0 +1,208 @@
+"""Create synthetic JPEG images with EXIF and GPS data, so benchmarks need no photos.
+
+The corpus is reproducible: the same parameters and seed give the same images. It can
+also be created on its own, e.g. to try the CLI on a few hundred images:
+
+    python benchmarks/corpus.py /tmp/corpus --count 200 --resolution 4000x3000
+"""
+
+import argparse
+import csv
+import math
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import PIL.Image
+from PIL.ExifTags import IFD, Base, GPS
+from PIL.TiffImagePlugin import IFDRational
+
+GAZETTEER_NAME = "gazetteer.csv"
+# the images are taken around these places, the gazetteer knows all of them
+PLACES = [
+    (48.137, 11.575, "Marienplatz", "München", "Bayern", "Deutschland"),
+    (52.516, 13.378, "Pariser Platz", "Berlin", "Berlin", "Deutschland"),
+    (45.434, 12.339, "Piazza San Marco", "Venezia", "Veneto", "Italia"),
+    (40.758, -73.985, "Times Square", "New York", "New York", "United States"),
+    (-33.857, 151.215, "Bennelong Point", "Sydney", "New South Wales", "Australia"),
+    (35.659, 139.700, "Shibuya Crossing", "Tokyo", "Tokyo", "Japan"),
+]
+F_NUMBERS = [1.8, 2.8, 4.0, 5.6, 8.0, 11.0]
+EXPOSURE_TIMES = [1 / 1000, 1 / 250, 1 / 60, 1 / 8]
+ISO_VALUES = [100, 200, 400, 800, 3200]
+FOCAL_LENGTHS = [IFDRational(f) for f in (24, 35, 50, 85, 200)]
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    count: int = 40
+    resolution: tuple[int, int] = (1600, 1200)  # landscape, portrait images are rotated
+    portrait_ratio: float = 0.3  # images stored in portrait format
+    rotated_ratio: float = 0.2  # landscape pixels with an EXIF orientation of 90°
+    gps_ratio: float = 0.9  # images with GPS coordinates
+    maker_note_kb: int = 0  # size of the MakerNote, at most 60, the EXIF data has 64 kB
+    quality: int = 85
+    seed: int = 1
+
+    def as_dict(self) -> dict:
+        params = asdict(self)
+        params["resolution"] = list(self.resolution)  # as it is read back from JSON
+        return params
+
+
+def create_corpus(target: Path | str, spec: CorpusSpec) -> list[Path]:
+    """Write the images and a gazetteer for offline geocoding, return the images."""
+    target = Path(target)
+    target.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(spec.seed)
+    files = []
+    for i, (is_portrait, orientation) in enumerate(_get_orientations(spec, rng)):
+        path = target / f"img{i:05d}.jpg"
+        _write_image(path, i, is_portrait, orientation, spec, rng)
+        files.append(path)
+    write_gazetteer(target / GAZETTEER_NAME)
+    return files
+
+
+def get_nominatim_places() -> list[dict]:
+    """Return the places in the format of phrugal.nominatim_stub.load_fixture()."""
+    return [
+        {
+            "lat": str(lat),
+            "lon": str(lon),
+            "display_name": ", ".join([road, city, state, country]),
+            "address": {"road": road, "city": city, "state": state, "country": country},
+        }
+        for lat, lon, road, city, state, country in PLACES
+    ]
+
+
+def write_gazetteer(path: Path) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(["lat", "lon", "road", "city", "state", "country"])
+        writer.writerows(PLACES)
+
+
+def _get_orientations(spec: CorpusSpec, rng: random.Random) -> list[tuple[bool, int]]:
+    """Return portrait format and EXIF orientation per image, in the exact ratios."""
+    portrait_count = round(spec.count * spec.portrait_ratio)
+    rotated_count = min(
+        round(spec.count * spec.rotated_ratio), spec.count - portrait_count
+    )
+    orientations = [(True, 1)] * portrait_count + [(False, 6)] * rotated_count
+    orientations += [(False, 1)] * (spec.count - len(orientations))
+    rng.shuffle(orientations)
+    return orientations
+
+
+def _write_image(
+    path: Path,
+    index: int,
+    is_portrait: bool,
+    orientation: int,
+    spec: CorpusSpec,
+    rng: random.Random,
+):
+    width, height = spec.resolution
+    if is_portrait:
+        width, height = height, width
+    # noise on a gradient compresses like a photo, a flat color would be too easy
+    image = PIL.Image.merge(
+        "RGB",
+        [
+            PIL.Image.linear_gradient("L").resize((width, height)),
+            PIL.Image.effect_noise((width, height), 40),
+            PIL.Image.radial_gradient("L").resize((width, height)),
+        ],
+    )
+    exif = _get_exif(index, orientation, spec, rng)
+    image.save(path, format="JPEG", quality=spec.quality, exif=exif)
+
+
+def _get_exif(
+    index: int, orientation: int, spec: CorpusSpec, rng: random.Random
+) -> PIL.Image.Exif:
+    exif = PIL.Image.Exif()
+    exif[Base.Make] = "Phrugal"
+    exif[Base.Model] = "Synthetic One"
+    exif[Base.Orientation] = orientation
+    exif[Base.ImageDescription] = f"synthetic image {index}"
+    exif_ifd = exif.get_ifd(IFD.Exif)
+    exif_ifd[Base.DateTimeOriginal] = (
+        f"2024:{index % 12 + 1:02d}:{index % 28 + 1:02d} 12:{index % 60:02d}:00"
+    )
+    f_number = rng.choice(F_NUMBERS)
+    exif_ifd[Base.FNumber] = _to_rational(f_number)
+    exif_ifd[Base.ApertureValue] = _to_rational(2 * math.log2(f_number))  # APEX
+    exposure_time = rng.choice(EXPOSURE_TIMES)
+    exif_ifd[Base.ExposureTime] = _to_rational(exposure_time)
+    exif_ifd[Base.ShutterSpeedValue] = _to_rational(-math.log2(exposure_time))
+    exif_ifd[Base.ISOSpeedRatings] = rng.choice(ISO_VALUES)
+    exif_ifd[Base.FocalLength] = rng.choice(FOCAL_LENGTHS)
+    exif_ifd[Base.LensModel] = "Synthetic Lens"
+    if spec.maker_note_kb:
+        exif_ifd[Base.MakerNote] = rng.randbytes(spec.maker_note_kb * 1024)
+    if rng.random() < spec.gps_ratio:
+        lat, lon = rng.choice(PLACES)[:2]
+        # scatter the images within some 100 m of the place
+        lat += rng.uniform(-0.001, 0.001)
+        lon += rng.uniform(-0.001, 0.001)
+        gps_ifd = exif.get_ifd(IFD.GPSInfo)
+        gps_ifd[GPS.GPSLatitudeRef] = "N" if lat >= 0 else "S"
+        gps_ifd[GPS.GPSLatitude] = _to_dms(lat)
+        gps_ifd[GPS.GPSLongitudeRef] = "E" if lon >= 0 else "W"
+        gps_ifd[GPS.GPSLongitude] = _to_dms(lon)
+        gps_ifd[GPS.GPSAltitude] = IFDRational(500)
+    return exif
+
+
+def _to_rational(value: float) -> IFDRational:
+    return IFDRational(round(value * 10000), 10000)
+
+
+def _to_dms(value: float) -> tuple[IFDRational, IFDRational, IFDRational]:
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    centiseconds = round((value - degrees - minutes / 60) * 360000)
+    return IFDRational(degrees), IFDRational(minutes), IFDRational(centiseconds, 100)
+
+
+def parse_resolution(value: str) -> tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("target", help="directory for the images")
+    parser.add_argument("--count", type=int, default=CorpusSpec.count)
+    parser.add_argument(
+        "--resolution",
+        type=parse_resolution,
+        default="1600x1200",
+        help="e.g. 4000x3000",
+    )
+    parser.add_argument(
+        "--portrait-ratio", type=float, default=CorpusSpec.portrait_ratio
+    )
+    parser.add_argument("--rotated-ratio", type=float, default=CorpusSpec.rotated_ratio)
+    parser.add_argument("--seed", type=int, default=CorpusSpec.seed)
+    parser.add_argument("--maker-note-kb", type=int, default=CorpusSpec.maker_note_kb)
+    args = parser.parse_args()
+
+    spec = CorpusSpec(
+        count=args.count,
+        resolution=args.resolution,
+        portrait_ratio=args.portrait_ratio,
+        rotated_ratio=args.rotated_ratio,
+        seed=args.seed,
+        maker_note_kb=args.maker_note_kb,
+    )
+    files = create_corpus(args.target, spec)
+    print(f"{len(files)} images written to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
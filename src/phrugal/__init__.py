@@ -1,5 +1,11 @@
-from . import _version
+from .decoration_config import DecorationConfig
 
-__version__ = _version.get_versions()["version"]
 
-from .decoration_config import DecorationConfig
+def __getattr__(name: str):
+    # computing the version may run git, so it is done on first use only
+    if name == "__version__":
+        from . import _version
+
+        globals()["__version__"] = _version.get_versions()["version"]
+        return globals()["__version__"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from fractions import Fraction
+from pathlib import Path
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class CachedExifTag:
+    """Stand-in for exifread's IfdTag, restored from the metadata cache.
+
+    It provides the attributes that PhrugalExifData reads from a tag: the values and the
+    printable representation.
+    """
+
+    def __init__(self, values: list | str, printable: str):
+        self.values = values
+        self.printable = printable
+
+    def __str__(self) -> str:
+        return self.printable
+
+    def __repr__(self) -> str:
+        return f"CachedExifTag({self.printable!r})"
+
+    @classmethod
+    def from_tag(cls, tag) -> "CachedExifTag":
+        return cls(tag.values, str(tag))
+
+    def to_json(self) -> dict:
+        if isinstance(self.values, str):
+            values = self.values
+        else:
+            values = [
+                [v.numerator, v.denominator] if isinstance(v, Fraction) else v
+                for v in self.values
+            ]
+        return {"values": values, "printable": self.printable}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "CachedExifTag":
+        from exifread.utils import Ratio  # only needed once the cache is read
+
+        values = data["values"]
+        if not isinstance(values, str):
+            values = [Ratio(*v) if isinstance(v, list) else v for v in values]
+        return cls(values, data["printable"])
+
+
+class SqliteCache:
+    """Base class for persistent caches that are stored in an SQLite database.
+
+    A cache can be used from several threads of a process, e.g. by the geocode prefetch
+    thread and the rendering thread.
+    """
+
+    NAME = "cache"
+    TABLE_DEFINITION = ""  # CREATE TABLE statement
+    COMMIT_INTERVAL = 100  # number of new entries after which we commit
+    CONNECT_TIMEOUT_SECONDS = 30.0  # several processes can share one cache file
+    IN_MEMORY = (
+        ":memory:"  # use as db_path for a cache that lives as long as the process
+    )
+
+    def __init__(self, db_path: Path | str):
+        self.db_path = Path(db_path)
+        self.hits = 0
+        self.misses = 0
+        self._uncommitted = 0
+        # an open write transaction locks the database for other processes, so set this
+        # to 1 while other processes write to it as well
+        self.commit_interval = self.COMMIT_INTERVAL
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(
+            self.db_path,
+            timeout=self.CONNECT_TIMEOUT_SECONDS,
+            check_same_thread=False,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(self.TABLE_DEFINITION)
+        self._connection.commit()
+
+    def _read(self, statement: str, parameters: tuple) -> tuple | None:
+        with self._lock:
+            return self._connection.execute(statement, parameters).fetchone()
+
+    def _write(self, statement: str, parameters: tuple) -> None:
+        with self._lock:
+            self._connection.execute(statement, parameters)
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_interval:
+                self.flush()
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            self._connection.commit()
+            self._uncommitted = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._connection.close()
+
+    def get_statistics(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"{self.NAME}: {self.hits} hits, {self.misses} misses "
+            f"({hit_rate:.0%} hit rate)"
+        )
+
+
+class MetadataCache(SqliteCache):
+    """Persistent cache for EXIF tags.
+
+    Only the tags given in tag_names are stored. An entry is valid as long as size and
+    modification time of the image file are unchanged, and it holds all requested tags.
+    """
+
+    NAME = "metadata cache"
+    TABLE_DEFINITION = (
+        "CREATE TABLE IF NOT EXISTS exif_tags ("
+        "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+        "tag_names TEXT, tags TEXT)"
+    )
+
+    def __init__(self, db_path: Path | str, tag_names: Iterable[str]):
+        super().__init__(db_path)
+        self.tag_names = frozenset(tag_names)
+
+    @staticmethod
+    def _get_key(image_path: Path | str) -> tuple[str, int, int]:
+        stat = os.stat(image_path)
+        return str(Path(image_path).resolve()), stat.st_size, stat.st_mtime_ns
+
+    def get(self, image_path: Path | str) -> dict[str, CachedExifTag] | None:
+        """Return the cached tags of an image, or None if there is no valid entry."""
+        path, size, mtime_ns = self._get_key(image_path)
+        row = self._read(
+            "SELECT size, mtime_ns, tag_names, tags FROM exif_tags WHERE path = ?",
+            (path,),
+        )
+        if (
+            row is None
+            or (row[0], row[1]) != (size, mtime_ns)
+            or not self.tag_names.issubset(json.loads(row[2]))
+        ):
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        return {
+            name: CachedExifTag.from_json(tag)
+            for name, tag in json.loads(row[3]).items()
+        }
+
+    def put(self, image_path: Path | str, exif_data: dict) -> None:
+        """Store the relevant tags of an image, exif_data maps tag names to exifread tags."""
+        path, size, mtime_ns = self._get_key(image_path)
+        tags = {
+            name: CachedExifTag.from_tag(tag).to_json()
+            for name, tag in exif_data.items()
+            if name in self.tag_names
+        }
+        self._write(
+            "INSERT OR REPLACE INTO exif_tags VALUES (?, ?, ?, ?, ?)",
+            (
+                path,
+                size,
+                mtime_ns,
+                json.dumps(sorted(self.tag_names)),
+                json.dumps(tags),
+            ),
+        )
+
+
+class GeocodeCache(SqliteCache):
+    """Persistent cache for reverse geocoding results.
+
+    The key is built by the geocoder from the (quantized) coordinates and the zoom level,
+    the value is the address as returned by the server.
+    """
+
+    NAME = "geocode cache"
+    TABLE_DEFINITION = (
+        "CREATE TABLE IF NOT EXISTS addresses (key TEXT PRIMARY KEY, address TEXT)"
+    )
+
+    def get(self, key: str) -> dict | None:
+        row = self._read("SELECT address FROM addresses WHERE key = ?", (key,))
+        if row is None:
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        return json.loads(row[0])
+
+    def put(self, key: str, address: dict) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO addresses VALUES (?, ?)", (key, json.dumps(address))
+        )
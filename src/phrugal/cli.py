@@ -3,17 +3,33 @@ import logging
 import os
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import phrugal
-from phrugal import DecorationConfig
-from phrugal.composer import PhrugalComposer
+from phrugal.decoration_config import DecorationConfig
+from phrugal.discovery import ImageFilter
+from phrugal.grouping import GroupingStrategy
+from phrugal.metrics import Metrics
+from phrugal.output import DEFAULT_PRINT_DPI, OutputFormat, OutputSettings
+from phrugal.watch import PhrugalWatcher
+
+if TYPE_CHECKING:
+    from phrugal.composer import PhrugalComposer
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
 
-def _get_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(prog="phrugal")
+def _get_common_parser(keep_given: bool = False) -> argparse.ArgumentParser:
+    """Arguments for both, a single run and the watch mode.
+
+    :param keep_given: the arguments have no defaults, for the parser of a subcommand.
+                       Otherwise its defaults would replace the values that were given
+                       before the subcommand.
+    """
+    parser = argparse.ArgumentParser(
+        add_help=False, argument_default=argparse.SUPPRESS if keep_given else None
+    )
     parser.add_argument("-c", "--config", help="Path to custom JSON config")
     parser.add_argument(
         "-i",
@@ -26,6 +42,150 @@ def _get_parser() -> argparse.ArgumentParser:
         help="Path to folder where to locate the output. If omitted, will default to current dir. "
         "The tool will attempt to create a directory if its not yet existing.",
     )
+    parser.add_argument(
+        "--extensions",
+        help="Comma separated file extensions of the input images, case does not matter "
+        "(default: all formats pillow can read, e.g. jpg,jpeg,png,tif,tiff,webp).",
+    )
+    parser.add_argument(
+        "--include",
+        help="Only use images whose path (relative to the input directory) or name "
+        "matches this glob pattern. Can be given several times.",
+        action="append",
+    )
+    parser.add_argument(
+        "--exclude",
+        help="Skip images and directories whose path (relative to the input directory) "
+        "or name matches this glob pattern. Can be given several times.",
+        action="append",
+    )
+    parser.add_argument(
+        "--max-depth",
+        help="How deep to search subdirectories of the input directory, 0 only uses the "
+        "input directory itself (default: no limit).",
+        type=int,
+    )
+    parser.add_argument(
+        "--print-size",
+        help="Length of the longer side of the print in mm. If given, compositions are scaled "
+        "to this size, and input images are decoded only at the resolution needed for it.",
+        type=float,
+    )
+    parser.add_argument(
+        "--dpi",
+        help=f"Print resolution in dots per inch, used together with --print-size "
+        f"(default: {DEFAULT_PRINT_DPI}).",
+        type=int,
+    )
+    parser.add_argument(
+        "--format",
+        help="File format of the compositions (default: jpeg, or as configured).",
+        choices=[f.value for f in OutputFormat],
+    )
+    parser.add_argument(
+        "--quality",
+        help="Quality of JPEG and WebP compositions, from 1 (worst) to 100 (best).",
+        type=int,
+    )
+    parser.add_argument(
+        "--subsampling",
+        help="Chroma subsampling of JPEG compositions. 4:4:4 keeps the most color detail, "
+        "4:2:0 gives the smallest files.",
+        choices=OutputSettings.SUBSAMPLING_VALUES,
+    )
+    parser.add_argument(
+        "--progressive",
+        help="Write progressive JPEG files.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--optimize",
+        help="Spend more time on encoding to get smaller files.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--metadata-cache",
+        help="Path to an SQLite database that caches EXIF data between runs. "
+        "Created if it does not exist yet.",
+    )
+    parser.add_argument(
+        "--geocode-cache",
+        help="Path to an SQLite database that caches geocoding results between runs. "
+        "Created if it does not exist yet.",
+    )
+    parser.add_argument(
+        "--gazetteer",
+        help="Path to a CSV file with locations (columns lat, lon and address parts like "
+        "city or country). If given, geocoding uses this file instead of Nominatim.",
+    )
+    parser.add_argument(
+        "--nominatim-url",
+        help="URL of the Nominatim server used for geocoding, e.g. an own instance or "
+        "http://localhost:8080 for the local stand-in phrugal.nominatim_stub "
+        "(default: the public server of OpenStreetMap).",
+    )
+    parser.add_argument(
+        "--nominatim-delay",
+        help="Minimum seconds between two requests to the server of --nominatim-url "
+        "(default: 1.1, as for the public server).",
+        type=float,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of worker processes that render compositions in parallel. "
+        "0 uses one process per CPU (default: 1).",
+        type=int,
+    )
+    parser.add_argument(
+        "--metrics-out",
+        help="Write time, CPU time and bytes read/written per processing stage, cache hit "
+        "rates and throughput of the run to this JSON file.",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        help="Estimated memory in MB that the compositions rendered in parallel may use. "
+        "Fewer groups are handed to the worker processes if needed (default: no limit).",
+        type=float,
+    )
+    parser.add_argument(
+        "--grouping",
+        help="Which images are composed together: images with similar aspect ratios, "
+        "the least wasted area of the prints, by capture time, by location, or in the "
+        "order of the file names (default: aspect_ratio).",
+        choices=[s.value for s in GroupingStrategy],
+    )
+    if not keep_given:
+        parser.set_defaults(
+            include=[],
+            exclude=[],
+            dpi=DEFAULT_PRINT_DPI,
+            progressive=None,  # as configured
+            optimize=None,
+            jobs=1,
+            grouping=GroupingStrategy.ASPECT_RATIO.value,
+        )
+    return parser
+
+
+class _VersionAction(argparse.Action):
+    """Like action="version", but the version is only computed if the flag is given.
+
+    Computing the version may run git, see phrugal.__getattr__().
+    """
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, **kwargs):
+        super().__init__(
+            option_strings, dest, nargs=0, default=argparse.SUPPRESS, **kwargs
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(f"{parser.prog} {phrugal.__version__}")
+        parser.exit()
+
+
+def _get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="phrugal", parents=[_get_common_parser()])
     parser.add_argument(
         "--create-default-config",
         help="If given, create default configuration at given path (or in current directory if omitted) and exit.",
@@ -34,7 +194,39 @@ def _get_parser() -> argparse.ArgumentParser:
         default=None,
     )
     parser.add_argument(
-        "--version", action="version", version=f"{parser.prog} {phrugal.__version__}"
+        "--incremental",
+        help="Only render compositions whose input images or settings changed since the "
+        "last run into the same output directory.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--version",
+        action=_VersionAction,
+        help="show program's version number and exit",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", title="commands")
+    watch_parser = subparsers.add_parser(
+        "watch",
+        parents=[_get_common_parser(keep_given=True)],
+        help="Compose the images in the input directory, then keep running and compose "
+        "new images as they arrive. The other parameters can be given before or after "
+        "'watch'.",
+    )
+    watch_parser.add_argument(
+        "--poll-interval",
+        help=f"Seconds between two checks for new images "
+        f"(default: {PhrugalWatcher.DEFAULT_POLL_INTERVAL_SECONDS}).",
+        type=float,
+        default=PhrugalWatcher.DEFAULT_POLL_INTERVAL_SECONDS,
+    )
+    watch_parser.add_argument(
+        "--batch-timeout",
+        help=f"Seconds after which new images are composed even if there are not enough "
+        f"of them to fill a composition (default: "
+        f"{PhrugalWatcher.DEFAULT_BATCH_TIMEOUT_SECONDS}).",
+        type=float,
+        default=PhrugalWatcher.DEFAULT_BATCH_TIMEOUT_SECONDS,
     )
     return parser
 
@@ -47,6 +239,10 @@ def _phrugal_main(args: argparse.Namespace):
             "parameter input_dir is needed, refer to --help for help!",
         )
     else:
+        # pillow and the other dependencies of the composer are only imported when
+        # needed, so that e.g. --version or --create-default-config start quickly
+        from phrugal.composer import PhrugalComposer
+
         input_dir = Path(args.input_dir)
         output_dir = Path(args.output_dir) if args.output_dir else Path(os.getcwd())
 
@@ -58,10 +254,83 @@ def _phrugal_main(args: argparse.Namespace):
             config.load_from_file(Path(args.config))
         else:
             config.load_default_config()
+        config.set_output_params(
+            format=args.format,
+            quality=args.quality,
+            subsampling=args.subsampling,
+            progressive=args.progressive,
+            optimize=args.optimize,
+        )
+
+        composer = PhrugalComposer(
+            decoration_config=config,
+            print_size_mm=args.print_size,
+            print_dpi=args.dpi,
+            metadata_cache=args.metadata_cache,
+            geocode_cache=args.geocode_cache,
+            gazetteer=args.gazetteer,
+            nominatim_url=args.nominatim_url,
+            nominatim_delay_seconds=args.nominatim_delay,
+            memory_budget_mb=args.memory_budget,
+            grouping_strategy=GroupingStrategy(args.grouping),
+        )
+        max_workers = args.jobs if args.jobs > 0 else None
+        image_filter = _get_image_filter(args)
+        if args.command == "watch":
+            _watch(composer, input_dir, output_dir, max_workers, image_filter, args)
+            return
 
-        composer = PhrugalComposer(decoration_config=config)
-        composer.discover_images(input_dir)
-        composer.create_compositions(output_path=output_dir)
+        composer.discover_images(input_dir, image_filter)
+        composer.create_compositions(
+            output_path=output_dir,
+            max_workers=max_workers,
+            incremental=args.incremental,
+        )
+        _report_metrics(args.metrics_out)
+        if composer.failed_groups:
+            raise RuntimeError(
+                f"{len(composer.failed_groups)} composition(s) could not be created, see log!"
+            )
+
+
+def _watch(
+    composer: "PhrugalComposer",
+    input_dir: Path,
+    output_dir: Path,
+    max_workers: int | None,
+    image_filter: ImageFilter,
+    args: argparse.Namespace,
+):
+    watcher = PhrugalWatcher(
+        composer,
+        input_dir,
+        output_dir,
+        poll_interval=args.poll_interval,
+        batch_timeout=args.batch_timeout,
+        max_workers=max_workers,
+        image_filter=image_filter,
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.info("stopped watching")
+    _report_metrics(args.metrics_out)
+
+
+def _report_metrics(metrics_out: str | None):
+    logger.info(f"summary:\n{Metrics.get_summary()}")
+    if metrics_out:
+        Metrics.write_report(metrics_out)
+        logger.info(f"metrics written to {metrics_out}")
+
+
+def _get_image_filter(args: argparse.Namespace) -> ImageFilter:
+    filter_params = dict(
+        include=args.include, exclude=args.exclude, max_depth=args.max_depth
+    )
+    if args.extensions:
+        filter_params["extensions"] = [e.strip() for e in args.extensions.split(",")]
+    return ImageFilter(**filter_params)
 
 
 def _create_default_config(provided_path: str):
@@ -1,13 +1,43 @@
+import itertools
+import json
 import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from enum import StrEnum, unique, auto
 from fractions import Fraction
+from multiprocessing.context import BaseContext
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 
 import PIL.Image
+from phrugal.cache import GeocodeCache, MetadataCache, SqliteCache
 from phrugal.composition import ImageComposition
 from phrugal.decoration_config import DecorationConfig
-from phrugal.image import PhrugalImage, PhrugalPlaceholder
+from phrugal.discovery import ImageFilter, find_images, register_image_plugins
+from phrugal.exif import ExifRecords, PhrugalExifData
+from phrugal.gazetteer import GazetteerBackend
+from phrugal.geocode import Geocoder, NominatimBackend
+from phrugal.grouping import (
+    GROUPING_TAGS,
+    GroupingStrategy,
+    get_wasted_area,
+    group_images,
+)
+from phrugal.image import ImageInfo, PhrugalImage, PhrugalPlaceholder, mm_to_pixels
+from phrugal.manifest import Manifest, ManifestEntry, get_input_key
+from phrugal.metrics import Metrics
+from phrugal.output import DEFAULT_PRINT_DPI
+from phrugal.prefetch import GeocodePrefetcher
+from phrugal.probe import probe_images
 
 logger = logging.getLogger(__name__)
 
@@ -19,78 +49,699 @@ class PaddingStrategy(StrEnum):
     UPSCALE = auto()
 
 
+def get_placeholder(target_aspect_ratio: Fraction | float) -> PhrugalPlaceholder:
+    ph_image_dims = (int(1000 * target_aspect_ratio), 1000)
+    # fixme: read padding image color from border config
+    ph_image = PIL.Image.new("RGB", ph_image_dims, color="white")
+    return PhrugalPlaceholder(ph_image)
+
+
+def _init_process(
+    metadata_cache_path: Path | None,
+    required_tags: set[str],
+    geocode_cache_path: Path | None,
+    gazetteer_path: Path | None,
+    nominatim_url: str | None,
+    nominatim_delay_seconds: float | None,
+    exif_records: ExifRecords | None = None,
+) -> None:
+    """Set up image plugins, geocoding and the persistent caches for this process."""
+    register_image_plugins()
+    PhrugalExifData.REQUIRED_TAGS = frozenset(required_tags)
+    PhrugalExifData.RECORDS = exif_records
+    if gazetteer_path is not None:
+        Geocoder.set_backend(GazetteerBackend(gazetteer_path))
+    elif nominatim_url is not None:
+        Geocoder.set_nominatim_url(nominatim_url, nominatim_delay_seconds)
+    if metadata_cache_path is not None:
+        PhrugalExifData.METADATA_CACHE = MetadataCache(
+            metadata_cache_path, required_tags
+        )
+    if geocode_cache_path is not None:
+        Geocoder.GEOCODE_CACHE = GeocodeCache(geocode_cache_path)
+
+
+def _get_worker_context() -> BaseContext:
+    """Start worker processes without forking this process.
+
+    A process that is forked while another thread holds a lock, e.g. the geocode prefetch
+    thread while it logs, inherits the lock in its locked state and may hang on it.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _get_open_caches() -> List[SqliteCache]:
+    caches = [PhrugalExifData.METADATA_CACHE, Geocoder.GEOCODE_CACHE]
+    return [c for c in caches if c is not None]
+
+
+def _cleanup_process() -> None:
+    for cache in _get_open_caches():
+        cache.close()
+        logger.info(cache.get_statistics())
+    PhrugalExifData.METADATA_CACHE = None
+    PhrugalExifData.REQUIRED_TAGS = None
+    PhrugalExifData.RECORDS = None
+    Geocoder.GEOCODE_CACHE = None
+    if isinstance(Geocoder.BACKEND, GazetteerBackend):
+        Geocoder.BACKEND.close()
+        Geocoder.set_backend(None)  # the next Geocoder uses Nominatim again
+    elif isinstance(Geocoder.BACKEND, NominatimBackend) and (
+        Geocoder.BACKEND.NAME != NominatimBackend.NAME
+    ):
+        Geocoder.set_backend(None)  # the next Geocoder uses the public server again
+
+
+def _open_group(
+    sources: Tuple[Path | None, ...],
+    target_aspect_ratio: Fraction | float,
+    output_long_side: int | None = None,
+) -> ImageComposition:
+    """Open the images of a group, a source of None stands for a placeholder image.
+
+    A source that is in the group more than once is opened once, e.g. for DUPLICATE
+    padding of a group with fewer images than the padding needs.
+    """
+    opened = dict()  # type: dict[Path, PhrugalImage]
+    images = []
+    for s in sources:
+        if s is None:
+            images.append(get_placeholder(target_aspect_ratio))
+            continue
+        if s not in opened:
+            opened[s] = PhrugalImage(s)
+        images.append(opened[s])
+    return ImageComposition(
+        images,
+        target_aspect_ratio=target_aspect_ratio,
+        output_long_side=output_long_side,
+    )
+
+
+def _decode_group(
+    sources: Tuple[Path | None, ...],
+    target_aspect_ratio: Fraction | float,
+    output_long_side: int | None = None,
+) -> ImageComposition:
+    """Open and decode the images of a group, so that it is ready to be rendered."""
+    composition = _open_group(sources, target_aspect_ratio, output_long_side)
+    try:
+        composition.prepare(decode=True)
+    except Exception:
+        composition.close_images()
+        raise
+    return composition
+
+
+def _render_group(
+    sources: Tuple[Path | None, ...],
+    filename: Path,
+    decoration_config: DecorationConfig,
+    target_aspect_ratio: Fraction | float,
+    output_long_side: int | None = None,
+) -> None:
+    """Open the images of a group, write their composition and close them again."""
+    composition = _open_group(sources, target_aspect_ratio, output_long_side)
+    try:
+        composition.write_composition(
+            filename=filename, decoration_config=decoration_config
+        )
+    finally:
+        composition.close_images()
+
+
+def _write_group_composition(
+    sources: Tuple[Path | None, ...],
+    filename: Path,
+    decoration_config: DecorationConfig,
+    target_aspect_ratio: Fraction | float,
+    output_long_side: int | None = None,
+    addresses: dict[str, dict] | None = None,
+) -> Tuple[dict[str, Tuple[int, int]], dict]:
+    """Render and save a single composition, meant to run in a worker process.
+
+    Workers get file paths instead of pickled pillow images. Addresses that were
+    prefetched by the parent process are added to the geocoder. Returns hits and misses
+    of the caches for this group, and the metrics of the group, see Metrics.snapshot().
+    """
+    Metrics.reset()
+    if addresses:
+        Geocoder.add_addresses(addresses)
+    caches = _get_open_caches()
+    stats_before = {c.NAME: (c.hits, c.misses) for c in caches}
+    _render_group(
+        sources, filename, decoration_config, target_aspect_ratio, output_long_side
+    )
+
+    cache_stats = dict()
+    for c in caches:
+        c.flush()  # pool workers are terminated without running any cleanup
+        hits_before, misses_before = stats_before[c.NAME]
+        cache_stats[c.NAME] = c.hits - hits_before, c.misses - misses_before
+    return cache_stats, Metrics.snapshot()
+
+
 class PhrugalComposer:
     DEFAULT_ASPECT_RATIO = Fraction(4, 3)
+    DEFAULT_PRINT_DPI = DEFAULT_PRINT_DPI
+    # a decoded group takes a lot of memory, so by default one group is decoded while
+    # one is rendered and one is encoded
+    DECODE_THREADS = 1
+    ENCODE_THREADS = 1
+    PIPELINE_DEPTH = 1  # groups that may wait between two stages of the pipeline
 
     def __init__(
         self,
         decoration_config: DecorationConfig,
         input_files=None,
         target_aspect_ratio: Fraction | float = DEFAULT_ASPECT_RATIO,
+        print_size_mm: float | None = None,
+        print_dpi: int = DEFAULT_PRINT_DPI,
+        metadata_cache: Path | str | None = None,
+        geocode_cache: Path | str | None = None,
+        gazetteer: Path | str | None = None,
+        nominatim_url: str | None = None,
+        nominatim_delay_seconds: float | None = None,
+        memory_budget_mb: float | None = None,
+        grouping_strategy: GroupingStrategy = GroupingStrategy.ASPECT_RATIO,
     ):
+        """
+        :param decoration_config: configuration of the text on the image borders
+        :param input_files: list of images to compose, see also discover_images()
+        :param target_aspect_ratio: aspect ratio of each decorated image
+        :param print_size_mm: length of the longer side of the print. If given, the compositions
+                              are scaled to this size (at print_dpi), and input images are only
+                              decoded at the resolution that is needed for that.
+        :param print_dpi: resolution of the print in dots per inch
+        :param metadata_cache: path to an SQLite database that caches EXIF data between runs
+        :param geocode_cache: path to an SQLite database that caches geocoding results
+        :param gazetteer: path to a CSV file used for offline geocoding instead of Nominatim
+        :param nominatim_url: URL of a Nominatim server to use instead of the public one
+        :param nominatim_delay_seconds: minimum time between two requests to the server
+                                        at nominatim_url, by default the rate limit of
+                                        the public server
+        :param memory_budget_mb: estimated memory that the groups rendered at the same
+                                 time may use. Limits how many groups are handed to the
+                                 worker processes at once, at least one group is rendered.
+        :param grouping_strategy: which images are composed together, see
+                                  phrugal.grouping
+        """
         self.decoration_config = decoration_config
+        self._input_files: List[Path] | None = None
         self.input_files = input_files
-        self._img_instances: List[PhrugalImage] = []
+        self._img_instances: List[ImageInfo] = []
         self.target_aspect_ratio = Fraction(target_aspect_ratio)
-        self._image_groups: List[Tuple[PhrugalImage, ...]] | None = None
+        self._image_groups: List[Tuple[ImageInfo | PhrugalPlaceholder, ...]] | None = (
+            None
+        )
+        self._group_filenames: List[str] = []
         self._padding_strat: PaddingStrategy | None = None
+        self.failed_groups: List[int] = []
+        self.output_long_side = (
+            mm_to_pixels(print_size_mm, print_dpi) if print_size_mm else None
+        )
+        self.metadata_cache_path = Path(metadata_cache) if metadata_cache else None
+        self.geocode_cache_path = Path(geocode_cache) if geocode_cache else None
+        self.gazetteer_path = Path(gazetteer) if gazetteer else None
+        self.nominatim_url = nominatim_url
+        self.nominatim_delay_seconds = nominatim_delay_seconds
+        self.memory_budget = (
+            int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+        )
+        self._caches_open = False
+        self._exif_records = None  # type: ExifRecords | None
+        self.grouping_strategy = GroupingStrategy(grouping_strategy)
+        # share of each composition that shows no image detail, see get_wasted_area()
+        self.wasted_area: List[float] = []
+
+    @property
+    def input_files(self) -> List[Path] | None:
+        """Images to compose, always as Path so they compare equal to the probed names."""
+        return self._input_files
+
+    @input_files.setter
+    def input_files(self, input_files: Iterable[Path | str] | None) -> None:
+        self._input_files = (
+            None if input_files is None else [Path(p) for p in input_files]
+        )
 
     def create_compositions(
         self,
         output_path: Path | str,
         padding_strategy: PaddingStrategy = PaddingStrategy.UPSCALE,
+        max_workers: int | None = 1,
+        incremental: bool = False,
     ):
+        """Group the input images and write one composition per group.
+
+        Images are sorted and grouped by their header data only. The pixel data is loaded
+        when a group is rendered, and released again once its composition is written.
+
+        A manifest of the compositions is written to the output directory. In incremental
+        mode, compositions whose input files and settings are unchanged are kept as they
+        are, only new images and the images of changed groups are grouped and rendered.
+
+        :param output_path: directory for the compositions
+        :param padding_strategy: how to fill up the last group
+        :param max_workers: number of worker processes, 1 renders all groups in this process,
+                            None uses one process per CPU
+        :param incremental: skip compositions that are up to date
+        """
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        output_path = Path(output_path)
         self._padding_strat = padding_strategy
-        for in_file in self.input_files:
-            img = PhrugalImage(in_file)
-            self._img_instances.append(img)
+        if [img.file_name for img in self._img_instances] != self.input_files:
+            self._img_instances = probe_images(self.input_files)
+        group_len = self.decoration_config.get_image_count()
+        settings_key = self._get_settings_key()
 
-        self._img_instances = sorted(
-            self._img_instances, key=lambda x: x.aspect_ratio_normalized, reverse=False
+        manifest = Manifest.load(output_path) if incremental else Manifest(output_path)
+        kept = self._get_up_to_date_compositions(manifest, settings_key, group_len)
+        grouped = {i for entry in kept for i in entry.inputs}
+        remaining = [
+            img
+            for img in self._img_instances
+            if get_input_key(img.file_name) not in grouped
+        ]
+        close_caches = not self._caches_open
+        if close_caches:
+            _init_process(*self._get_process_settings())
+        cache_stats_before = {c.NAME: (c.hits, c.misses) for c in _get_open_caches()}
+        try:
+            self._extract_exif_records(remaining, max_workers)
+            logger.debug("generate image groups...")
+            if remaining:
+                self._generate_img_groups(remaining, group_len)
+            else:
+                self._image_groups = []
+            self._report_wasted_area()
+            if incremental:
+                logger.info(
+                    f"{len(kept)} compositions are up to date, "
+                    f"{len(self._image_groups)} to render"
+                )
+                self._remove_outdated_compositions(manifest, kept)
+            self._assign_filenames({entry.filename for entry in kept})
+
+            self._process_all_img_groups(output_path, max_workers)
+        finally:
+            for cache in _get_open_caches():
+                hits_before, misses_before = cache_stats_before[cache.NAME]
+                Metrics.count_cache(
+                    cache.NAME, cache.hits - hits_before, cache.misses - misses_before
+                )
+            if close_caches:
+                _cleanup_process()
+            else:
+                for cache in _get_open_caches():
+                    cache.flush()  # visible to other processes, e.g. a one-off run
+
+        manifest.entries = kept
+        for idx, group in enumerate(self._image_groups):
+            if idx not in self.failed_groups:
+                inputs = [get_input_key(s) for s in self._get_sources(group)]
+                manifest.add(self._group_filenames[idx], inputs, settings_key)
+        manifest.save()
+
+        Metrics.add_run(
+            images=sum(
+                s is not None for g in self._image_groups for s in self._get_sources(g)
+            ),
+            groups=len(self._image_groups),
+            failed_groups=len(self.failed_groups),
+            wall_seconds=time.perf_counter() - wall_start,
+            cpu_seconds=time.process_time() - cpu_start,
+            wasted_area=sum(self.wasted_area),
         )
-        logger.debug("generate image groups...")
-        self._generate_img_groups(
-            self._img_instances, self.decoration_config.get_image_count()
+
+    def _get_settings_key(self) -> str:
+        """Everything besides the input files that the compositions depend on."""
+        settings = [
+            self.decoration_config.as_dict(),
+            str(self.target_aspect_ratio),
+            self.output_long_side,
+            str(self._padding_strat),
+            str(self.grouping_strategy),
+        ]
+        return json.dumps(settings, sort_keys=True, ensure_ascii=False)
+
+    def _get_up_to_date_compositions(
+        self, manifest: Manifest, settings_key: str, group_len: int
+    ) -> List[ManifestEntry]:
+        available = {get_input_key(img.file_name) for img in self._img_instances}
+        up_to_date = [
+            entry
+            for entry in manifest.entries
+            if available.issuperset(entry.real_inputs)
+            and manifest.is_up_to_date(entry, settings_key)
+        ]
+        grouped = {i for entry in up_to_date for i in entry.inputs}
+        if available - grouped:
+            # groups that had to be padded are filled up with the new images instead
+            up_to_date = [e for e in up_to_date if e.is_complete(group_len)]
+        return up_to_date
+
+    @staticmethod
+    def _remove_outdated_compositions(
+        manifest: Manifest, kept: List[ManifestEntry]
+    ) -> None:
+        kept_filenames = {entry.filename for entry in kept}
+        for entry in manifest.entries:
+            outdated_file = manifest.output_path / entry.filename
+            if entry.filename not in kept_filenames and outdated_file.exists():
+                logger.info(f"remove outdated composition {entry.filename}")
+                outdated_file.unlink()
+
+    def _report_wasted_area(self) -> None:
+        """Estimate how much of each composition to render shows no image detail.
+
+        Each composition is a print of its own, so the sum is the wasted area in prints.
+        """
+        self.wasted_area = [
+            get_wasted_area(group, self.target_aspect_ratio, self.output_long_side)
+            for group in self._image_groups
+        ]
+        if self.wasted_area:
+            total = sum(self.wasted_area)
+            logger.info(
+                f"wasted area ({self.grouping_strategy} grouping): {total:.2f} of "
+                f"{len(self.wasted_area)} prints ({total / len(self.wasted_area):.0%})"
+            )
+
+    def _assign_filenames(self, used_filenames: set[str]) -> None:
+        """Give each group to render a file name that is not used by another composition."""
+        extension = self.decoration_config.get_output_settings().extension
+        numbers = (
+            n for n in itertools.count() if f"img-{n}{extension}" not in used_filenames
         )
-        self._process_all_img_groups(output_path)
+        self._group_filenames = [
+            f"img-{next(numbers)}{extension}" for _ in self._image_groups
+        ]
 
-    def _process_all_img_groups(self, output_path):
-        for idx, group in enumerate(self._image_groups):
-            logger.info(f"process group {idx + 1}/{len(self._image_groups)}")
-            composition_filename = output_path / self._get_filename(group, idx)
-            composition = ImageComposition(
-                group, target_aspect_ratio=self.target_aspect_ratio
+    def open_caches(self) -> None:
+        """Keep the persistent caches open across calls of create_compositions().
+
+        By default, the caches are opened and closed for every call. Long running callers
+        like the watch mode open them once, so that they stay warm between batches.
+        """
+        _init_process(*self._get_process_settings())
+        self._caches_open = True
+
+    def close_caches(self) -> None:
+        if self._caches_open:
+            _cleanup_process()
+            self._caches_open = False
+
+    def _process_all_img_groups(self, output_path: Path, max_workers: int | None = 1):
+        """Render the groups, the caches are open and the EXIF data is extracted."""
+        self.failed_groups = []
+        prefetcher = self._start_geocode_prefetch()
+        try:
+            if max_workers == 1:
+                self._process_img_groups_sequential(output_path)
+            else:
+                self._process_img_groups_parallel(output_path, max_workers, prefetcher)
+        finally:
+            if prefetcher is not None:
+                prefetcher.stop()
+
+        if self.failed_groups:
+            logger.error(
+                f"{len(self.failed_groups)}/{len(self._image_groups)} groups failed: "
+                f"{sorted(self.failed_groups)}"
             )
-            composition.write_composition(
-                filename=composition_filename, decoration_config=self.decoration_config
+
+    def _get_process_settings(self) -> tuple:
+        return (
+            self.metadata_cache_path,
+            self._get_required_exif_tags(),
+            self.geocode_cache_path,
+            self.gazetteer_path,
+            self.nominatim_url,
+            self.nominatim_delay_seconds,
+            self._exif_records,
+        )
+
+    def _get_required_exif_tags(self) -> set[str]:
+        """Tags needed by the decoration and by the grouping strategy."""
+        grouping_tags = GROUPING_TAGS.get(self.grouping_strategy, frozenset())
+        return self.decoration_config.get_required_exif_tags() | grouping_tags
+
+    def _extract_exif_records(
+        self, images: List[ImageInfo], max_workers: int | None
+    ) -> None:
+        """Read the EXIF data of all images up front, for grouping and decoration.
+
+        Each file is read once per run, or not at all if it is in the metadata cache. The
+        workers get the tags from the records.
+        """
+        self._exif_records = PhrugalExifData.extract_many(
+            [img.file_name for img in images],
+            tag_names=self._get_required_exif_tags(),
+            workers=max_workers,
+            mp_context=_get_worker_context(),
+        )
+        PhrugalExifData.RECORDS = self._exif_records
+
+    def _start_geocode_prefetch(self) -> GeocodePrefetcher | None:
+        """Start resolving the locations of all groups, if the decoration shows them."""
+        geocode_params = self.decoration_config.get_item_params("geocode")
+        if not geocode_params:
+            return None
+        prefetcher = GeocodePrefetcher(
+            [self._get_sources(group) for group in self._image_groups], geocode_params
+        )
+        prefetcher.start()
+        return prefetcher
+
+    @staticmethod
+    def _get_sources(group: Tuple[PhrugalImage, ...]) -> Tuple[Path | None, ...]:
+        return tuple(img.file_name for img in group)
+
+    def _process_img_groups_sequential(self, output_path: Path):
+        """Render all groups in this process, in a pipeline of three stages.
+
+        Decoder threads read and decode the images of the next groups, while the current
+        group is decorated and merged. Encoder threads compress and write the finished
+        compositions. Pillow releases the GIL while it decodes and encodes, so the stages
+        overlap. At most PIPELINE_DEPTH groups wait between two stages.
+        """
+        groups = enumerate(self._image_groups)
+        output_settings = self.decoration_config.get_output_settings()
+        with ThreadPoolExecutor(
+            self.DECODE_THREADS, thread_name_prefix="phrugal-decode"
+        ) as decoders, ThreadPoolExecutor(
+            self.ENCODE_THREADS, thread_name_prefix="phrugal-encode"
+        ) as encoders:
+            decoding = deque()  # type: deque[Tuple[int, Future]]
+            encoding = deque()  # type: deque[Tuple[int, Future]]
+
+            def submit_decode(idx: int, group: tuple) -> None:
+                decoding.append(
+                    (
+                        idx,
+                        decoders.submit(
+                            _decode_group,
+                            self._get_sources(group),
+                            self.target_aspect_ratio,
+                            self.output_long_side,
+                        ),
+                    )
+                )
+
+            for idx, group in itertools.islice(groups, self.PIPELINE_DEPTH):
+                submit_decode(idx, group)
+            while decoding:
+                idx, decoded = decoding.popleft()
+                for next_idx, next_group in itertools.islice(groups, 1):
+                    submit_decode(next_idx, next_group)
+
+                logger.info(f"process group {idx + 1}/{len(self._image_groups)}")
+                try:
+                    composition = decoded.result()
+                    try:
+                        image = composition.render(self.decoration_config)
+                    finally:
+                        composition.close_images()
+                except Exception as e:
+                    self._report_failed_group(idx, e)
+                    continue
+
+                filename = output_path / self._get_filename(
+                    self._image_groups[idx], idx
+                )
+                encoding.append(
+                    (
+                        idx,
+                        encoders.submit(
+                            composition.save, image, filename, output_settings
+                        ),
+                    )
+                )
+                while len(encoding) > self.PIPELINE_DEPTH:
+                    self._wait_for_encoding(*encoding.popleft())
+            while encoding:
+                self._wait_for_encoding(*encoding.popleft())
+
+    def _wait_for_encoding(self, idx: int, encoded: Future) -> None:
+        try:
+            encoded.result()
+        except Exception as e:
+            self._report_failed_group(idx, e)
+
+    def _estimate_group_memory(self, group) -> int:
+        composition = ImageComposition(
+            group,
+            target_aspect_ratio=self.target_aspect_ratio,
+            output_long_side=self.output_long_side,
+        )
+        return composition.estimate_memory()
+
+    def _process_img_groups_parallel(
+        self,
+        output_path: Path,
+        max_workers: int | None,
+        prefetcher: GeocodePrefetcher | None = None,
+    ):
+        caches = {c.NAME: c for c in _get_open_caches()}
+        for cache in caches.values():
+            # the prefetch thread writes to the caches, the workers must not wait for it
+            cache.flush()
+            cache.commit_interval = 1
+        finished = []  # type: List[int]
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=_get_worker_context(),
+            initializer=_init_process,
+            initargs=self._get_process_settings(),
+        ) as executor:
+            in_flight = dict()  # type: dict[Future, Tuple[int, int]]
+            for idx, group in enumerate(self._image_groups):
+                memory = self._estimate_group_memory(group) if self.memory_budget else 0
+                while self._exceeds_memory_budget(in_flight, memory):
+                    done, __ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._collect_group(
+                            future, in_flight.pop(future)[0], caches, finished
+                        )
+                # a group is handed to a worker once its locations are known, so that
+                # the workers do not send lookups of their own
+                addresses = prefetcher.get_group_addresses(idx) if prefetcher else None
+                future = executor.submit(
+                    _write_group_composition,
+                    self._get_sources(group),
+                    output_path / self._get_filename(group, idx),
+                    self.decoration_config,
+                    self.target_aspect_ratio,
+                    self.output_long_side,
+                    addresses,
+                )
+                in_flight[future] = idx, memory
+            for future in as_completed(in_flight):
+                self._collect_group(future, in_flight[future][0], caches, finished)
+        for cache in caches.values():
+            cache.commit_interval = cache.COMMIT_INTERVAL
+
+    def _exceeds_memory_budget(
+        self, in_flight: dict[Future, Tuple[int, int]], memory: int
+    ) -> bool:
+        """Check if a group that needs this much memory must wait for others to finish."""
+        if not self.memory_budget or not in_flight:
+            return False
+        memory_in_flight = sum(m for __, m in in_flight.values())
+        return memory_in_flight + memory > self.memory_budget
+
+    def _collect_group(
+        self,
+        future: Future,
+        idx: int,
+        caches: dict[str, SqliteCache],
+        finished: List[int],
+    ) -> None:
+        finished.append(idx)
+        try:
+            worker_cache_stats, worker_metrics = future.result()
+            for name, (hits, misses) in worker_cache_stats.items():
+                caches[name].hits += hits
+                caches[name].misses += misses
+            Metrics.merge(worker_metrics)
+            logger.info(
+                f"finished group {idx + 1} ({len(finished)}/{len(self._image_groups)})"
             )
+        except Exception as e:
+            self._report_failed_group(idx, e)
+
+    def _report_failed_group(self, idx: int, error: Exception):
+        logger.error(f"failed to process group {idx + 1}: {error!r}")
+        self.failed_groups.append(idx)
 
     def _get_filename(self, group, idx):
-        fn = Path(f"img-{idx}")
-        return fn.with_suffix(".jpg")
+        return Path(self._group_filenames[idx])
+
+    def discover_images(
+        self, path: Path | str, image_filter: ImageFilter | None = None
+    ):
+        """Search a directory tree for input images, see find_images().
 
-    def discover_images(self, path):
-        self.input_files = [p for p in Path(path).glob("**/*.jpg")]
+        The image headers are read while the search is still going on, so that
+        create_compositions() does not need to read them again.
+        """
+        self._img_instances = sorted(
+            probe_images(find_images(path, image_filter)), key=lambda x: x.file_name
+        )
+        self.input_files = [img.file_name for img in self._img_instances]
         logger.info(f"discovered {len(self.input_files)} images in {path}")
 
+    def update_input_files(
+        self, added: Iterable[Path | str], removed: Iterable[Path | str] = ()
+    ) -> None:
+        """Add and remove input files, e.g. the changes that the watch mode found.
+
+        Unlike assigning input_files, only the added files are probed, the headers of the
+        other files are kept from before.
+
+        :param added: new images, files that are input files already are ignored
+        :param removed: input files that are gone
+        """
+        removed = {Path(p) for p in removed}
+        images = [img for img in self._img_instances if img.file_name not in removed]
+        known = {img.file_name for img in images}
+        new_files = [p for p in dict.fromkeys(Path(p) for p in added) if p not in known]
+        images.extend(probe_images(new_files))
+        self._img_instances = sorted(images, key=lambda x: x.file_name)
+        self.input_files = [img.file_name for img in self._img_instances]
+
     def _generate_img_groups(
-        self, input_objects: List[PhrugalImage], group_len: int
+        self, input_objects: List[ImageInfo], group_len: int
     ) -> None:
-        """Split a list into tuples of size n (last remainder tuple can be smaller)."""
-        img_grps = list(zip(*[input_objects[i:] for i in range(group_len)]))
-        remainder = input_objects[len(img_grps) * group_len :]
+        """Split the images into groups of group_len, see group_images().
+
+        The last group can be smaller, it is padded according to the padding strategy.
+        The EXIF data for the grouping strategy is taken from _extract_exif_records().
+        """
+        img_grps = group_images(
+            input_objects,
+            group_len,
+            strategy=self.grouping_strategy,
+            target_aspect_ratio=self.target_aspect_ratio,
+            output_long_side=self.output_long_side,
+            exif_records=self._exif_records,
+        )
+        remainder = []
+        if len(img_grps[-1]) < group_len:
+            remainder = list(img_grps.pop())
 
         padding_images_count = group_len - len(remainder)
 
         if self._padding_strat == PaddingStrategy.UPSCALE:
             pass  # do nothing, upscaling happens automatically
         elif self._padding_strat == PaddingStrategy.PLACEHOLDER:
-            ph_image_dims = (int(1000 * self.target_aspect_ratio), 1000)
-            # fixme: read padding image color from border config
-            ph_image = PIL.Image.new("RGB", ph_image_dims, color="white")
             logger.debug(f"adding {padding_images_count} place holders for padding")
             for placeholder_nr in range(padding_images_count):
-                remainder.append(PhrugalPlaceholder(ph_image))
+                remainder.append(get_placeholder(self.target_aspect_ratio))
         elif self._padding_strat == PaddingStrategy.DUPLICATE:
             logger.debug(f"adding {padding_images_count} duplicates for padding")
             for duplicate_nr in range(padding_images_count):
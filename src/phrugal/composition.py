@@ -1,17 +1,22 @@
 import logging
+import math
 import random
+from collections import Counter
 from dataclasses import dataclass
 from fractions import Fraction
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, Iterator, List, Tuple
 
 import PIL.Image as pill_image
 from PIL.Image import Image, Resampling
 from PIL.ImageDraw import Draw
-from phrugal.decorated_image import DecoratedPhrugalImage
+from phrugal.decorated_image import DecoratedImageCache, DecoratedPhrugalImage
 from phrugal.decoration_config import DecorationConfig
-from phrugal.image import PhrugalImage
-from phrugal.types import Coordinates
+from phrugal.image import PhrugalImage, PhrugalPlaceholder
+from phrugal.layout import LayoutPlanner, merge_pairwise
+from phrugal.metrics import Metrics
+from phrugal.output import OutputSettings
+from phrugal.types import Coordinates, Dimensions
 
 logger = logging.getLogger(__name__)
 
@@ -72,20 +77,215 @@ class ImageMerge:
 
 
 class ImageComposition:
+    BYTES_PER_PIXEL = 3  # RGB
+
     def __init__(
-        self, images: Iterable[PhrugalImage], target_aspect_ratio: Fraction | float
+        self,
+        images: Iterable[PhrugalImage],
+        target_aspect_ratio: Fraction | float,
+        output_long_side: int | None = None,
     ):
+        """
+        :param images: images to compose
+        :param target_aspect_ratio: aspect ratio of each decorated image
+        :param output_long_side: if given, the composition is scaled so that its longer side
+                                 has this many pixels, and images are decoded at reduced
+                                 resolution where possible.
+        """
         self.images = images
         self.target_aspect_ratio = target_aspect_ratio
+        self.output_long_side = output_long_side
+        self._decorated = None  # type: List[DecoratedPhrugalImage] | None
+        self._planner = None  # type: LayoutPlanner | None
+        self._canvas_scale = 1.0
 
     def write_composition(self, filename: Path, decoration_config: DecorationConfig):
-        decorated_images = self._get_decorated_images(decoration_config)
-        composition = self.get_composition(decorated_images)
-        composition.save(filename)
+        """Render the composition and save it.
+
+        The layout is planned from the image headers. Then the images are decoded,
+        decorated and pasted into the canvas one after the other, so that only one of them
+        is held in memory at a time.
+        """
+        self.prepare()
+        self.save(
+            self.render(decoration_config),
+            filename,
+            decoration_config.get_output_settings(),
+        )
+
+    def prepare(self, decode: bool = False) -> None:
+        """Plan the layout and set the resolution the images are decoded at.
+
+        An image that is in the group more than once is decorated once, see
+        DecoratedImageCache.
+
+        :param decode: decode all images now, e.g. in another thread than the one that
+                       renders. Otherwise, each image is decoded when it is rendered.
+        """
+        self._decorated = self._get_decorators()
+        uses = self._get_render_uses()
+        if uses:
+            render_cache = DecoratedImageCache(uses)
+            for dec in self._decorated:
+                dec.render_cache = render_cache
+        self._planner, self._canvas_scale = self._plan_layout(self._decorated)
+        if self.output_long_side:
+            max_dims = self._get_max_image_dimensions(
+                self._decorated, self._planner, self._canvas_scale
+            )
+            # an image that is in the group more than once is decoded once, at the
+            # largest size it is needed in
+            needed = dict()  # type: dict[int, Dimensions]
+            for dec, (x, y) in zip(self._decorated, max_dims):
+                known_x, known_y = needed.get(id(dec.base_image), (0, 0))
+                needed[id(dec.base_image)] = max(x, known_x), max(y, known_y)
+            images = {id(dec.base_image): dec.base_image for dec in self._decorated}
+            for image_id, dims in needed.items():
+                images[image_id].reduce_on_load(dims)
+        if decode:
+            for dec in self._decorated:
+                dec.base_image.load()
+
+    def render(self, decoration_config: DecorationConfig) -> Image:
+        """Decorate the images and merge them into the composition."""
+        if self._planner is None:
+            self.prepare()
+        for dec in self._decorated:
+            dec.config = decoration_config
+        logger.info("compose decorated images in group...")
+        return self._planner.render(
+            self._get_decorated_images(self._decorated), scale=self._canvas_scale
+        )
+
+    @staticmethod
+    def save(
+        composition: Image, filename: Path, settings: OutputSettings | None = None
+    ) -> None:
+        settings = settings if settings is not None else OutputSettings()
+        with Metrics.measure("encode") as stats:
+            composition.save(filename, **settings.get_save_params())
+            stats.bytes_written = Path(filename).stat().st_size
+
+    def estimate_memory(self) -> int:
+        """Estimate how many bytes write_composition() needs at most.
+
+        This is the canvas, plus the largest image while it is decoded and decorated,
+        plus the decorated images that are kept for another use in the group. It only
+        needs the image dimensions, so it works for ImageInfo objects as well.
+        """
+        decorated = self._get_decorators()
+        planner, canvas_scale = self._plan_layout(decorated)
+        if self.output_long_side:
+            max_dims = self._get_max_image_dimensions(decorated, planner, canvas_scale)
+        else:
+            max_dims = [dec.base_image.image_dims for dec in decorated]
+
+        largest_image = 0
+        cached = dict()  # type: dict[str, float]
+        uses = self._get_render_uses()
+        for dec, (max_x, __) in zip(decorated, max_dims):
+            image_x, image_y = dec.base_image.image_dims
+            # draft mode reduces by powers of two, so we may decode up to twice the size
+            decoded_scale = min(1.0, 2.0 * max_x / image_x)
+            padded_x, padded_y = dec.get_padded_dimensions()
+            pixels = (image_x * image_y + padded_x * padded_y) * decoded_scale**2
+            largest_image = max(largest_image, pixels)
+            source = str(dec.base_image.file_name)
+            if source in uses:
+                decorated_pixels = padded_x * padded_y * decoded_scale**2
+                cached[source] = max(cached.get(source, 0.0), decorated_pixels)
+        cached_bytes = min(
+            DecoratedImageCache.DEFAULT_MAX_BYTES,
+            DecoratedImageCache.BYTES_PER_PIXEL * sum(cached.values()),
+        )
+        canvas_x, canvas_y = planner.get_canvas_size(canvas_scale)
+        return int(
+            self.BYTES_PER_PIXEL * (canvas_x * canvas_y + largest_image) + cached_bytes
+        )
+
+    def estimate_wasted_area(self) -> float:
+        """Estimate the share of the canvas that shows no image detail, from 0 to 1.
+
+        This is the border and the padding to the target aspect ratio, placeholders, and
+        the part of the images that is upscaled beyond their resolution. Like
+        estimate_memory(), it only needs the image dimensions.
+        """
+        decorated = self._get_decorators()
+        planner, canvas_scale = self._plan_layout(decorated)
+        max_dims = self._get_max_image_dimensions(decorated, planner, canvas_scale)
+        # an image shows detail on at most as many pixels as it has
+        detail = sum(
+            x * y
+            for dec, (x, y) in zip(decorated, max_dims)
+            if not isinstance(dec.base_image, PhrugalPlaceholder)
+        )
+        canvas_x, canvas_y = planner.get_canvas_size(canvas_scale)
+        return max(0.0, 1.0 - detail / (canvas_x * canvas_y))
+
+    def _get_render_uses(self) -> dict[str, int]:
+        """Return the input files that are in the group more than once, and how often."""
+        uses = Counter(
+            str(img.file_name) for img in self.images if img.file_name is not None
+        )
+        return {source: n for source, n in uses.items() if n > 1}
+
+    def _get_decorators(self) -> List[DecoratedPhrugalImage]:
+        return [
+            DecoratedPhrugalImage(img, target_aspect_ratio=self.target_aspect_ratio)
+            for img in self.images
+        ]
+
+    def _plan_layout(
+        self, decorated: List[DecoratedPhrugalImage]
+    ) -> Tuple[LayoutPlanner, float]:
+        """Plan the layout from the image headers, return planner and scale of the canvas.
+
+        The layout only depends on the dimensions of the decorated images, and the border
+        of an image is proportional to its size. So we can work this out before any pixel
+        data is decoded.
+        """
+        planner = LayoutPlanner([d.get_padded_dimensions() for d in decorated])
+        canvas_scale = 1.0
+        if self.output_long_side:
+            canvas_scale = self.output_long_side / max(planner.size)
+        return planner, canvas_scale
+
+    @staticmethod
+    def _get_max_image_dimensions(
+        decorated: List[DecoratedPhrugalImage],
+        planner: LayoutPlanner,
+        canvas_scale: float,
+    ) -> List[Dimensions]:
+        """Return the largest size in pixel that each image takes in the final composition."""
+        max_dims = []
+        for dec, placement in zip(decorated, planner.placements):
+            x0, y0, x1, y1 = placement.box
+            placed_long_side = max(x1 - x0, y1 - y0) * canvas_scale
+            scale = min(1.0, placed_long_side / max(dec.get_padded_dimensions()))
+            image_x, image_y = dec.base_image.image_dims
+            max_dims.append(
+                (max(1, math.ceil(image_x * scale)), max(1, math.ceil(image_y * scale)))
+            )
+        return max_dims
 
     def get_composition(
-        self, decorated_images: Iterable[Image], draw_separator: bool = True
+        self,
+        decorated_images: Iterable[Image],
+        draw_separator: bool = True,
+        single_pass: bool = True,
     ) -> Image:
+        """Merge the decorated images into one image.
+
+        :param decorated_images: images to merge
+        :param draw_separator: draw a line between the images
+        :param single_pass: plan the layout first and resample each image only once. If not set,
+                            merge the images pairwise, which resamples intermediate images.
+        """
+        decorated_images = list(decorated_images)
+        if single_pass:
+            logger.info("compose decorated images in group...")
+            planner = LayoutPlanner([im.size for im in decorated_images])
+            return planner.render(decorated_images, draw_separator=draw_separator)
         img_list_to_compose = [ImageMerge(image=im, count=1) for im in decorated_images]
         logger.info("merge decorated images in group...")
         composition = self._merge_image_list(img_list_to_compose, draw_separator)
@@ -95,19 +295,15 @@ class ImageComposition:
     def _merge_image_list(
         image_data: List[ImageMerge], draw_separator: bool
     ) -> ImageMerge | None:
-        """Recursively merge a list of images until only 1 survives"""
-        if not image_data:
-            return None
-        if len(image_data) == 1:
-            logger.debug("done merging images!")
-            return image_data[0]
-        logger.debug(f"remaining images for merge: {len(image_data)}")
-        image_data.sort(key=lambda i: i.count)
-        new_merged = ImageComposition._merge_two_images(
-            image_data.pop(0), image_data.pop(0)
+        """Merge a list of images pairwise until only 1 survives"""
+        logger.debug(f"images to merge: {len(image_data)}")
+        return merge_pairwise(
+            image_data,
+            merge=lambda a, b: ImageComposition._merge_two_images(
+                a, b, draw_separator=draw_separator
+            ),
+            get_count=lambda i: i.count,
         )
-        image_data.append(new_merged)
-        return ImageComposition._merge_image_list(image_data, draw_separator)
 
     @staticmethod
     def _merge_two_images(
@@ -166,16 +362,17 @@ class ImageComposition:
         draw = Draw(img)
         draw.line([start, end], fill="black", width=1)
 
-    def _get_decorated_images(self, config: DecorationConfig) -> Iterable[Image]:
-        decorated_images = []
-        for image in self.images:
-            logger.info(f"decorating image {image}")
-            img_decorated = DecoratedPhrugalImage(
-                image, target_aspect_ratio=self.target_aspect_ratio
-            )
-            img_decorated.config = config
-            decorated_images.append(img_decorated.get_decorated_image())
-        return decorated_images
+    @staticmethod
+    def _get_decorated_images(
+        decorated: List[DecoratedPhrugalImage],
+    ) -> Iterator[Image]:
+        """Decorate the images one at a time, each base image is closed after its last use."""
+        last_use = {id(dec.base_image): i for i, dec in enumerate(decorated)}
+        for i, img_decorated in enumerate(decorated):
+            logger.info(f"decorating image {img_decorated.base_image}")
+            yield img_decorated.get_decorated_image()
+            if last_use[id(img_decorated.base_image)] == i:
+                img_decorated.base_image.close_image()
 
     def close_images(self):
         for image in self.images:
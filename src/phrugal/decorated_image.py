@@ -1,14 +1,18 @@
 import logging
+from collections import OrderedDict
 from fractions import Fraction
+from pathlib import Path
 
 import PIL.Image as PilImage
+from PIL.Image import Transpose
 from PIL.ImageColor import getrgb
 from PIL.ImageDraw import Draw
 from PIL.ImageFont import truetype, FreeTypeFont, load_default
 
-from .decoration_config import DecorationConfig
+from .decoration_config import CORNER_NAMES, DecorationConfig
 from .exif import PhrugalExifData
 from .image import PhrugalImage
+from .metrics import Metrics
 from .types import ColorTuple, Dimensions, Coordinates
 
 logger = logging.getLogger(__name__)
@@ -34,6 +38,69 @@ def scale_dimensions(d: Dimensions, scale: float) -> Dimensions:
     return new_dim
 
 
+class DecoratedImageCache:
+    """Decorated images of a group that are used more than once, e.g. for DUPLICATE padding.
+
+    Each ImageComposition has a cache of its own, with the uses of the images in its
+    group. So images are not kept across groups, and the memory they take is part of
+    ImageComposition.estimate_memory(). The images are keyed by source file and
+    decoration parameters, see DecoratedPhrugalImage.get_cache_key(). An image is kept
+    from its first to its last use, images that are used only once are not kept at all.
+    The cached images are shared, they must not be changed.
+    """
+
+    NAME = "render cache"
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+    BYTES_PER_PIXEL = 3  # RGB
+
+    def __init__(self, uses: dict[Path | str, int], max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param uses: how often each input file is decorated in the group
+        :param max_bytes: memory the cached images may take, the oldest ones are dropped
+        """
+        self._remaining_uses = {str(p): n for p, n in uses.items() if n > 1}
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()  # type: OrderedDict[tuple, PilImage.Image]
+        self._bytes = 0
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._images
+
+    def get(self, key: tuple) -> PilImage.Image | None:
+        """Return the decorated image, and count this as a use of the source file."""
+        source = key[0]
+        if source not in self._remaining_uses:
+            return None  # used once, not worth caching
+        image = self._images.get(key)
+        self._remaining_uses[source] -= 1
+        if self._remaining_uses[source] <= 0:
+            del self._remaining_uses[source]
+            for k in [k for k in self._images if k[0] == source]:
+                self._remove(k)
+        Metrics.count_cache(
+            self.NAME, hits=int(image is not None), misses=int(image is None)
+        )
+        return image
+
+    def put(self, key: tuple, image: PilImage.Image) -> None:
+        """Keep the image if its source file is used again."""
+        size = self.BYTES_PER_PIXEL * image.size[0] * image.size[1]
+        if (
+            key[0] not in self._remaining_uses
+            or key in self._images
+            or size > self.max_bytes
+        ):
+            return
+        while self._bytes + size > self.max_bytes:
+            self._remove(next(iter(self._images)))
+        self._images[key] = image
+        self._bytes += size
+
+    def _remove(self, key: tuple) -> None:
+        image = self._images.pop(key)
+        self._bytes -= self.BYTES_PER_PIXEL * image.size[0] * image.size[1]
+
+
 class DecoratedPhrugalImage:
     """Represents geometry of an image border and the text written on it"""
 
@@ -42,7 +109,7 @@ class DecoratedPhrugalImage:
     BORDER_MULTIPLIER = 1.0
     NOMINAL_LEN_LARGER_SIDE_MM = 130.0
     DESIRED_BORDER_WIDTH_BASE_MM = 5.0
-    CORNER_NAMES = ["bottom_left", "bottom_right", "top_left", "top_right"]
+    CORNER_NAMES = CORNER_NAMES
 
     def __init__(
         self,
@@ -59,32 +126,83 @@ class DecoratedPhrugalImage:
             target_aspect_ratio if target_aspect_ratio else Fraction(3, 2)
         )
         self.config = decoration_config
+        # decorated images that are used again in the group, see ImageComposition
+        self.render_cache = None  # type: DecoratedImageCache | None
         self._exif = None  # type: PhrugalExifData | None
 
     @property
     def exif(self):
         if self._exif is None:
-            self._exif = PhrugalExifData(self.base_image.file_name)
+            self._exif = PhrugalExifData(
+                self.base_image.file_name, file_data=self.base_image.get_file_data()
+            )
         return self._exif
 
+    @property
+    def needs_rotation(self) -> bool:
+        return self.base_image.aspect_ratio < 1.0
+
+    @property
+    def image_dims(self) -> Dimensions:
+        """Dimensions of the base image in the orientation it will be decorated in.
+
+        This allows to calculate the geometry before the base image is rotated (or loaded).
+        """
+        x_dim, y_dim = self.base_image.image_dims
+        return (y_dim, x_dim) if self.needs_rotation else (x_dim, y_dim)
+
+    def get_cache_key(self) -> tuple | None:
+        """Everything the decorated image depends on, None if it can not be cached.
+
+        The images of a group are drafted once per source file, so the dimensions are
+        the same for all uses of a source in a group.
+        """
+        if self.base_image.file_name is None or self.config is None:
+            return None  # placeholders are cheap to decorate
+        return (
+            str(self.base_image.file_name),
+            self.base_image.image_dims,  # after reduce_on_load()
+            self.target_aspect_ratio,
+            self.background_color,
+            self.text_color,
+            self.config.plan,
+            self.config.get_font_name(),
+        )
+
     def get_decorated_image(self) -> PilImage.Image:
+        """Return the image with its border and text.
+
+        The base image is not changed, so it can be decorated again. With a render_cache,
+        an image that is used more than once in a group is decorated only once, the
+        returned image is then shared and must not be changed.
+        """
+        cache = self.render_cache
+        key = self.get_cache_key() if cache is not None else None
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                logger.debug(f"reuse decorated image {self}")
+                return cached
+
         logger.debug(f"creating decorated image {self}")
-        needs_rotation = self.base_image.aspect_ratio < 1.0
-        if needs_rotation:
-            logger.debug("rotating image...")
-            self.base_image.rotate_90_deg_ccw()
-
-        image_dimensions_padded = self.get_padded_dimensions()
-        decorated_img = PilImage.new(
-            "RGB", image_dimensions_padded, color=self.background_color
-        )
-        x_border, y_border = self.get_border_dimensions()
-        decorated_img.paste(
-            self.base_image.pillow_image,
-            scale_dimensions(self.get_border_dimensions(), 0.5),
-        )
+        self.base_image.load()
+        with Metrics.measure("decorate"):
+            pixels = self.base_image.pillow_image
+            if self.needs_rotation:
+                logger.debug("rotating image...")
+                pixels = pixels.transpose(Transpose.ROTATE_90)  # counter-clockwise
+
+            image_dimensions_padded = self.get_padded_dimensions()
+            decorated_img = PilImage.new(
+                "RGB", image_dimensions_padded, color=self.background_color
+            )
+            decorated_img.paste(
+                pixels, scale_dimensions(self.get_border_dimensions(), 0.5)
+            )
         logger.debug("drawing text on border...")
         self.draw_text_items(decorated_img)
+        if key is not None:
+            cache.put(key, decorated_img)
         return decorated_img
 
     def draw_text_items(self, image_w_border) -> None:
@@ -92,22 +210,24 @@ class DecoratedPhrugalImage:
 
         This modification is in-place.
         """
-        draw = Draw(image_w_border)
-        font = self._get_font(self.config.get_font_name())
-        for corner in self.CORNER_NAMES:
-            text_on_right_side = corner.endswith("_right")
-            # see https://pillow.readthedocs.io/en/stable/handbook/text-anchors.html#specifying-an-anchor
-            text_anchor = "rd" if text_on_right_side else "ld"
-
-            string_to_draw = self.config.get_string_at_corner(self.exif, corner)
-            coordindates_for_draw = self._get_text_origin(corner)
-            draw.text(
-                coordindates_for_draw,
-                string_to_draw,
-                fill=self.text_color,
-                font=font,
-                anchor=text_anchor,
-            )
+        # get the strings first, reading EXIF data and geocoding are stages of their own
+        strings_to_draw = self.config.plan.get_strings(self.exif)
+        with Metrics.measure("text"):
+            draw = Draw(image_w_border)
+            font = self._get_font(self.config.get_font_name())
+            for corner, string_to_draw in zip(self.CORNER_NAMES, strings_to_draw):
+                text_on_right_side = corner.endswith("_right")
+                # see https://pillow.readthedocs.io/en/stable/handbook/text-anchors.html#specifying-an-anchor
+                text_anchor = "rd" if text_on_right_side else "ld"
+
+                coordindates_for_draw = self._get_text_origin(corner)
+                draw.text(
+                    coordindates_for_draw,
+                    string_to_draw,
+                    fill=self.text_color,
+                    font=font,
+                    anchor=text_anchor,
+                )
 
     def _get_text_origin(self, corner: str) -> Coordinates:
         font_size = self.get_font_size()
@@ -115,7 +235,7 @@ class DecoratedPhrugalImage:
         single_x_border, single_y_border = single_border_dims
 
         border_text_to_edge = (min(*single_border_dims) - font_size) / 2
-        image_x_dim, image_y_dim = self.base_image.image_dims
+        image_x_dim, image_y_dim = self.image_dims
 
         if corner == "bottom_left":
             x_pos = single_x_border + border_text_to_edge
@@ -136,7 +256,7 @@ class DecoratedPhrugalImage:
         return x_pos, y_pos
 
     def _get_minimal_border_dimensions(self) -> Dimensions:
-        x_dim_original, y_dim_original = self.base_image.image_dims
+        x_dim_original, y_dim_original = self.image_dims
 
         # we target a 5mm border on each side a 13cm x 9cm print as a reference size
         # factor 2: we want the border on both sides of the image
@@ -161,7 +281,7 @@ class DecoratedPhrugalImage:
         """
         minimal_border_dimensions = self._get_minimal_border_dimensions()
         min_size_x, min_size_y = add_dimensions(
-            minimal_border_dimensions, self.base_image.image_dims
+            minimal_border_dimensions, self.image_dims
         )
         current_aspect_ratio = min_size_x / min_size_y
 
@@ -180,9 +300,7 @@ class DecoratedPhrugalImage:
         return add_dimensions(extra_border_padding, minimal_border_dimensions)
 
     def get_padded_dimensions(self) -> Dimensions:
-        padded = add_dimensions(
-            self.get_border_dimensions(), self.base_image.image_dims
-        )
+        padded = add_dimensions(self.get_border_dimensions(), self.image_dims)
         padded = int(padded[0]), int(padded[1])  # ensure int as values
         return padded
 
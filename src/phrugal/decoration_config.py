@@ -1,11 +1,99 @@
+import copy
+import inspect
 import json
 import logging
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Tuple
 
-from .exif import PhrugalExifData
+from .output import OutputSettings
+
+if TYPE_CHECKING:
+    # reading EXIF data needs exifread, which is not needed to e.g. write a config
+    from .exif import PhrugalExifData
 
 logger = logging.getLogger(__name__)
 
+CORNER_NAMES = ("bottom_left", "bottom_right", "top_left", "top_right")
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedItem:
+    """An item of a corner, with the getter of PhrugalExifData and its parameters."""
+
+    name: str
+    getter: Callable[..., str | None]
+    params: Tuple[Tuple[str, Any], ...]
+    tags: frozenset[str]  # EXIF tags read by the getter
+
+    def evaluate(self, exif: "PhrugalExifData") -> str | None:
+        return self.getter(exif, **dict(self.params))
+
+
+@dataclass(frozen=True, slots=True)
+class DecorationPlan:
+    """The corner texts of a config, checked and resolved once when it is loaded.
+
+    The plan is immutable, it can be shared by threads and sent to worker processes.
+    """
+
+    corners: Tuple[Tuple[str, Tuple[PlannedItem, ...]], ...]  # in CORNER_NAMES order
+    item_separator: str
+    required_tags: frozenset[str]
+
+    @classmethod
+    def compile(cls, config: dict, item_separator: str) -> "DecorationPlan":
+        """Resolve the items of all corners, raise ValueError for invalid items."""
+        corners = tuple(
+            (corner, tuple(_plan_item(n, p) for n, p in config.get(corner, {}).items()))
+            for corner in CORNER_NAMES
+        )
+        required_tags = frozenset(
+            tag for __, items in corners for item in items for tag in item.tags
+        )
+        return cls(corners, item_separator, required_tags)
+
+    def get_string_at_corner(self, exif: "PhrugalExifData", corner: str) -> str:
+        for name, items in self.corners:
+            if name == corner:
+                return self._join(item.evaluate(exif) for item in items)
+        raise ValueError(f"{corner} is not one of {CORNER_NAMES}")
+
+    def get_strings(self, exif: "PhrugalExifData") -> list[str]:
+        """Return the strings of all corners, in the order of CORNER_NAMES."""
+        return [
+            self._join(item.evaluate(exif) for item in items)
+            for __, items in self.corners
+        ]
+
+    def _join(self, fragments) -> str:
+        return self.item_separator.join(x for x in fragments if x)
+
+
+def _plan_item(item_name: str, params: dict | None) -> PlannedItem:
+    from .exif import PhrugalExifData
+
+    getter = getattr(PhrugalExifData, f"get_{item_name}", None)
+    if item_name not in PhrugalExifData.TAGS_BY_ITEM or getter is None:
+        raise ValueError(f"item {item_name} not implemented")
+    params = params or dict()
+    try:
+        inspect.signature(getter).bind(None, **params)
+    except TypeError as e:
+        raise ValueError(f"invalid parameters for item {item_name}: {e}") from e
+    return PlannedItem(
+        name=item_name,
+        getter=getter,
+        params=tuple((k, _freeze(v)) for k, v in params.items()),
+        tags=frozenset(PhrugalExifData.TAGS_BY_ITEM[item_name]),
+    )
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
 
 class DecorationConfig:
     DEFAULT_CONFIG = {
@@ -34,11 +122,20 @@ class DecorationConfig:
 
     def __init__(self, item_separator: str = " | "):
         self.item_separator = item_separator
-        self._config = dict()
+        self._set_config(dict())
+
+    @property
+    def plan(self) -> DecorationPlan:
+        return self._plan
+
+    def _set_config(self, config: dict) -> None:
+        # compile first, so that an invalid config does not replace a valid one
+        self._plan = DecorationPlan.compile(config, self.item_separator)
+        self._config = config
 
     def load_from_file(self, config_file: Path | str):
         with open(config_file, "r") as cf:
-            self._config = json.load(cf)
+            self._set_config(json.load(cf))
 
     def write_default_config(self, config_file: Path | str):
         self._write_config(config_file, self.DEFAULT_CONFIG)
@@ -50,7 +147,10 @@ class DecorationConfig:
 
     def load_default_config(self):
         """Some default values, created mostly for debug purposes."""
-        self._config = self.DEFAULT_CONFIG
+        self._set_config(self.DEFAULT_CONFIG)
+
+    def as_dict(self) -> dict:
+        return copy.deepcopy(self._config)
 
     def get_image_count(self) -> int:
         try:
@@ -62,25 +162,28 @@ class DecorationConfig:
     def get_font_name(self) -> str:
         return self._config.get("font_name")
 
-    def get_string_at_corner(self, exif: PhrugalExifData, corner: str) -> str:
-        valid_corners = ["bottom_left", "bottom_right", "top_left", "top_right"]
-        assert corner in valid_corners
-        result_string = self._build_configured_string(exif, self._config.get(corner))
-        return result_string
-
-    def _build_configured_string(
-        self, exif: PhrugalExifData, configured_items: dict
-    ) -> str:
-        result_fragments = []
-        for item in configured_items.items():
-            item_name, item_config_params = item
-            exif_getter_name = f"get_{item_name}"
-            if not hasattr(exif, exif_getter_name):
-                raise ValueError(f"item {item_name} not implemented")
-            getter = getattr(exif, exif_getter_name)
-            if item_config_params:
-                single_fragment = getter(**item_config_params)
-            else:
-                single_fragment = getter()
-            result_fragments.append(single_fragment)
-        return self.item_separator.join((x for x in result_fragments if x))
+    def get_output_settings(self) -> OutputSettings:
+        return OutputSettings.from_dict(self._config.get("output", dict()))
+
+    def set_output_params(self, **params) -> None:
+        """Override output parameters, e.g. from the command line. None values are ignored."""
+        output = dict(self._config.get("output", dict()))
+        output.update({k: v for k, v in params.items() if v is not None})
+        OutputSettings.from_dict(output)  # fail early on invalid values
+        self._config = {**self._config, "output": output}
+
+    def get_required_exif_tags(self) -> set[str]:
+        """Return the names of all EXIF tags that are needed for the configured items."""
+        return set(self._plan.required_tags)
+
+    def get_item_params(self, item_name: str) -> list[dict]:
+        """Return the parameters of every corner that shows the given item."""
+        return [
+            dict(item.params)
+            for __, items in self._plan.corners
+            for item in items
+            if item.name == item_name
+        ]
+
+    def get_string_at_corner(self, exif: "PhrugalExifData", corner: str) -> str:
+        return self._plan.get_string_at_corner(exif, corner)
@@ -0,0 +1,138 @@
+import fnmatch
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".webp")
+# only searched for if pillow can open them, e.g. with the pillow-heif plugin installed
+PLUGIN_EXTENSIONS = (".heic", ".heif", ".avif")
+# listing directories is waiting for the file system, so more threads than CPUs help,
+# especially on network shares
+DISCOVERY_THREADS = 8
+
+
+def register_image_plugins() -> None:
+    """Let pillow open HEIF files, if the optional package pillow-heif is installed."""
+    try:
+        from pillow_heif import register_heif_opener
+    except ImportError:
+        return
+    register_heif_opener()
+
+
+def get_default_extensions() -> frozenset[str]:
+    import PIL.Image
+
+    register_image_plugins()
+    registered = PIL.Image.registered_extensions()
+    plugin_extensions = {e for e in PLUGIN_EXTENSIONS if e in registered}
+    return frozenset(IMAGE_EXTENSIONS) | plugin_extensions
+
+
+@dataclass(frozen=True)
+class ImageFilter:
+    """Decide which files of a directory tree are input images.
+
+    Extensions are compared case-insensitively. The glob patterns are matched against the
+    path relative to the searched directory (with "/" as separator) and against the file
+    name, so "*.tmp.jpg" and "drafts/*" both work. A directory that matches an exclude
+    pattern is not searched at all.
+    """
+
+    extensions: frozenset[str] = field(default_factory=get_default_extensions)
+    include: Tuple[str, ...] = ()  # if given, a file must match one of these patterns
+    exclude: Tuple[str, ...] = ()  # files and directories to skip
+    max_depth: int | None = None  # 0 only searches the directory itself
+
+    def __post_init__(self):
+        extensions = {
+            e.lower() if e.startswith(".") else f".{e.lower()}" for e in self.extensions
+        }
+        object.__setattr__(self, "extensions", frozenset(extensions))
+        object.__setattr__(self, "include", tuple(self.include))
+        object.__setattr__(self, "exclude", tuple(self.exclude))
+
+    def accepts_file(self, relative_path: str) -> bool:
+        if os.path.splitext(relative_path)[1].lower() not in self.extensions:
+            return False
+        if self.include and not self._matches(relative_path, self.include):
+            return False
+        return not self._matches(relative_path, self.exclude)
+
+    def accepts_directory(self, relative_path: str) -> bool:
+        """Check if a subdirectory is searched, relative_path must not be empty."""
+        depth = relative_path.count("/") + 1
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        return not self._matches(relative_path, self.exclude)
+
+    @staticmethod
+    def _matches(relative_path: str, patterns: Tuple[str, ...]) -> bool:
+        name = relative_path.rsplit("/", 1)[-1]
+        return any(
+            fnmatch.fnmatch(relative_path, p) or fnmatch.fnmatch(name, p)
+            for p in patterns
+        )
+
+
+def find_images(
+    root: Path | str,
+    image_filter: ImageFilter | None = None,
+    max_workers: int = DISCOVERY_THREADS,
+) -> Iterator[Path]:
+    """Search a directory tree for images, yielding them while the search goes on.
+
+    Directories are listed by a pool of threads with os.scandir, so the files of one
+    directory are yielded as soon as it is listed. The order of the files is not defined.
+    Like Path.glob("**"), symbolic links to directories are not followed.
+
+    :param root: directory to search
+    :param image_filter: which files are images, by default all files with an extension
+                         of the image formats pillow can read
+    :param max_workers: number of threads that list directories
+    """
+    root = Path(root)
+    image_filter = image_filter or ImageFilter()
+    executor = ThreadPoolExecutor(max_workers, thread_name_prefix="phrugal-discover")
+    try:
+        pending = {executor.submit(_scan_directory, root, "", image_filter)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, directories = future.result()
+                yield from files
+                for directory, relative_path in directories:
+                    pending.add(
+                        executor.submit(
+                            _scan_directory, directory, relative_path, image_filter
+                        )
+                    )
+    finally:
+        # the caller may stop early, then the directories not listed yet are skipped
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _scan_directory(
+    directory: Path, relative_path: str, image_filter: ImageFilter
+) -> Tuple[List[Path], List[Tuple[Path, str]]]:
+    """List a directory, return its images and the subdirectories to search."""
+    files = []
+    directories = []
+    prefix = f"{relative_path}/" if relative_path else ""
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                entry_path = prefix + entry.name
+                if entry.is_dir() and not entry.is_symlink():
+                    if image_filter.accepts_directory(entry_path):
+                        directories.append((Path(entry.path), entry_path))
+                elif image_filter.accepts_file(entry_path) and entry.is_file():
+                    files.append(Path(entry.path))
+    except OSError as e:
+        logger.warning(f"could not search {directory}: {e}")
+    return files, directories
@@ -1,20 +1,40 @@
 import datetime
+import io
+import itertools
 import logging
+import os
+import struct
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing.context import BaseContext
 from pathlib import Path
-from typing import Optional, Tuple, Iterable
+from typing import TYPE_CHECKING, BinaryIO, Optional, Tuple, Iterable, Iterator
 
 import exifread
 from exifread.classes import IfdTag
 from exifread.utils import Ratio
-from geopy import Point
 
+from .cache import CachedExifTag
+from .exif_reader import ExifTagReader, can_read_tags
 from .geocode import Geocoder
+from .metrics import CountingFileIO, Metrics
+
+if TYPE_CHECKING:
+    from .cache import MetadataCache
 
 logger = logging.getLogger(__name__)
 
 GpsData = namedtuple("GpsData", ["lat", "lat_ref", "lon", "lon_ref", "altitude"])
 
+GPS_TAGS = [
+    "GPS GPSLatitude",
+    "GPS GPSLatitudeRef",
+    "GPS GPSLongitude",
+    "GPS GPSLongitudeRef",
+    "GPS GPSAltitude",
+]
+
 
 def get_common_values() -> list[float]:
     """Provide a sequence of commonly used values.
@@ -33,6 +53,42 @@ def get_common_values() -> list[float]:
     return retval
 
 
+@dataclass(frozen=True)
+class ExifRecords:
+    """EXIF tags of many images, see PhrugalExifData.extract_many().
+
+    The tags are stored in columns, one per tag name, with None for the images that do
+    not have the tag. The records are compact enough to be sent to worker processes.
+    """
+
+    paths: Tuple[Path, ...]
+    columns: dict[str, Tuple[CachedExifTag | None, ...]]
+    _index: dict[Path, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_index", {p: i for i, p in enumerate(self.paths)})
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __contains__(self, image_path: Path | str) -> bool:
+        return Path(image_path) in self._index
+
+    def column(self, tag_name: str) -> Tuple[CachedExifTag | None, ...]:
+        return self.columns[tag_name]
+
+    def get_tags(self, image_path: Path | str) -> dict[str, CachedExifTag] | None:
+        """Return the tags of an image like exifread does, None for unknown images."""
+        idx = self._index.get(Path(image_path))
+        if idx is None:
+            return None
+        return {
+            name: column[idx]
+            for name, column in self.columns.items()
+            if column[idx] is not None
+        }
+
+
 class PhrugalExifData:
     COMMON_DIVIDEND_VALUES = get_common_values()
     THRESHOLD_COMMON_DISPLAY = (
@@ -44,20 +100,158 @@ class PhrugalExifData:
     THRESHOLD_APERTURE_INF = 1e8  # bigger values are considered infinite/tiny
     INF_APERTURE_REPRESENTATION = "inf"  # represent tiny apertures like this
     EXTRACT_APPLICATION_NOTES = False  # needed, once we implement get_title()
-
-    def __init__(self, image_path: Path | str) -> None:
+    # which EXIF tags are read by get_<item>()
+    TAGS_BY_ITEM = {
+        "focal_length": ["EXIF FocalLength"],
+        "aperture": ["EXIF ApertureValue"],
+        "shutter_speed": ["EXIF ShutterSpeedValue"],
+        "iso": ["EXIF ISOSpeedRatings"],
+        "title": [],
+        "description": ["Image ImageDescription"],
+        "image_xp_title": ["Image XPTitle"],
+        "image_xp_description": ["Image XPSubject"],
+        "image_xp_subject": ["Image XPSubject"],
+        "timestamp": ["EXIF DateTimeOriginal"],
+        "gps_coordinates": GPS_TAGS,
+        "geocode": GPS_TAGS,
+        "camera_model": ["Image Model"],
+        "lens_model": ["EXIF LensModel"],
+    }
+    METADATA_CACHE: "MetadataCache | None" = None
+    # if set, only these tags are read, see exif_reader; otherwise exifread parses all
+    REQUIRED_TAGS = None  # type: frozenset[str] | None
+    # tags of the images extracted in advance, see extract_many()
+    RECORDS = None  # type: ExifRecords | None
+    MIN_IMAGES_PER_WORKER = 32  # fewer images are not worth starting a process
+
+    def __init__(
+        self, image_path: Path | str, file_data: BinaryIO | None = None
+    ) -> None:
+        """
+        :param image_path: image to read the EXIF data from
+        :param file_data: content of the image file, if it was read already; then the
+                          file is not read again
+        """
         self.image_path = image_path
-        self.geocoder = Geocoder()
-        self._parse_exif()
-
-    def _parse_exif(self):
-        if self.image_path:
-            with open(self.image_path, "rb") as fp:
-                self.exif_data = exifread.process_file(
-                    fp, debug=self.EXTRACT_APPLICATION_NOTES  # type: ignore
-                )
-        else:
+        self._geocoder = None  # type: Geocoder | None
+        self._parse_exif(file_data)
+
+    @classmethod
+    def from_tags(
+        cls, image_path: Path | str, exif_data: dict[str, CachedExifTag]
+    ) -> "PhrugalExifData":
+        """Create the EXIF data of an image from tags that were read already."""
+        exif = cls.__new__(cls)
+        exif.image_path = image_path
+        exif._geocoder = None
+        exif.exif_data = exif_data
+        return exif
+
+    @property
+    def geocoder(self) -> Geocoder:
+        # created on first use, so that geopy is only imported if locations are shown
+        if self._geocoder is None:
+            self._geocoder = Geocoder()
+        return self._geocoder
+
+    def _parse_exif(self, file_data: BinaryIO | None = None):
+        if not self.image_path:
             self.exif_data = dict()
+            return
+
+        if self.RECORDS is not None:
+            tags = self.RECORDS.get_tags(self.image_path)
+            if tags is not None:
+                self.exif_data = tags
+                return
+
+        cache = self.METADATA_CACHE
+        if cache is not None:
+            cached_tags = cache.get(self.image_path)
+            if cached_tags is not None:
+                self.exif_data = cached_tags
+                return
+
+        if file_data is not None:
+            with Metrics.measure("exif"):
+                self.exif_data = self._read_tags(file_data, self.REQUIRED_TAGS)
+        else:
+            with Metrics.measure("exif") as stats:
+                self.exif_data, stats.bytes_read = _read_exif_file(
+                    self.image_path, self.REQUIRED_TAGS
+                )
+        if cache is not None:
+            cache.put(self.image_path, self.exif_data)
+
+    @classmethod
+    def extract_many(
+        cls,
+        image_paths: Iterable[Path | str],
+        tag_names: Iterable[str] | None = None,
+        workers: int | None = None,
+        mp_context: BaseContext | None = None,
+    ) -> ExifRecords:
+        """Read the EXIF tags of many images at once, in parallel worker processes.
+
+        Images that are in the metadata cache are not read again, the others are added
+        to it. Set the result as RECORDS, then PhrugalExifData takes the tags from it
+        instead of reading the files. Images that can not be read are left out of the
+        records, they are read again (and fail) when they are rendered.
+
+        :param image_paths: images to read
+        :param tag_names: tags to extract, by default REQUIRED_TAGS; if both are None,
+                          all tags that exifread finds
+        :param workers: number of processes, 1 reads the files in this process. None
+                        uses one process per CPU.
+        :param mp_context: how the worker processes are started, see ProcessPoolExecutor
+        """
+        paths = list(dict.fromkeys(Path(p) for p in image_paths))
+        if tag_names is None:
+            tag_names = cls.REQUIRED_TAGS
+        tag_names = frozenset(tag_names) if tag_names is not None else None
+        tags_by_path = dict()  # type: dict[Path, dict]
+        cache = cls.METADATA_CACHE
+        if cache is not None and cache.tag_names != tag_names:
+            cache = None  # its entries hold other tags than the ones asked for
+        if cache is not None:
+            for path in paths:
+                cached_tags = cache.get(path)
+                if cached_tags is not None:
+                    tags_by_path[path] = cached_tags
+        to_read = [p for p in paths if p not in tags_by_path]
+
+        with Metrics.measure("exif") as stats:
+            read = _read_exif_files(to_read, tag_names, workers, mp_context)
+            for path, (tags, bytes_read) in zip(to_read, read):
+                stats.bytes_read += bytes_read
+                if tags is None:
+                    continue
+                tags_by_path[path] = tags
+                if cache is not None:
+                    cache.put(path, tags)
+
+        paths = [p for p in paths if p in tags_by_path]
+        if tag_names is None:
+            tag_names = {name for tags in tags_by_path.values() for name in tags}
+        columns = {
+            name: tuple(tags_by_path[p].get(name) for p in paths)
+            for name in sorted(tag_names)
+        }
+        return ExifRecords(tuple(paths), columns)
+
+    @classmethod
+    def _read_tags(cls, fp: BinaryIO, tag_names: frozenset[str] | None) -> dict:
+        if tag_names is not None and can_read_tags(tag_names):
+            tags = ExifTagReader(fp, tag_names).read()
+            if tags is not None:
+                return tags
+            logger.debug("file format not supported by ExifTagReader, use exifread")
+        # the MakerNote and the thumbnail are only parsed if all tags are wanted
+        return exifread.process_file(
+            fp,
+            details=tag_names is None,
+            debug=cls.EXTRACT_APPLICATION_NOTES,  # type: ignore
+        )
 
     def __repr__(self):
         return f"exif: {Path(self.image_path).name}"
@@ -173,17 +367,34 @@ class PhrugalExifData:
             return None
         return gps_formatted
 
-    def get_geocode(self, zoom=12, name_parts=Geocoder.DEFAULT_LOCATION_NAME_PARTS):
-        gps_coordinates_formatted = self.get_gps_coordinates(include_altitude=False)
-        if gps_coordinates_formatted:
-            location = Point(gps_coordinates_formatted)  # type: ignore
-            location_geocoded = self.geocoder.get_location_name_from_point(
-                location, zoom=zoom, name_parts=name_parts
+    def get_geocode(
+        self,
+        zoom=12,
+        name_parts=Geocoder.DEFAULT_LOCATION_NAME_PARTS,
+        precision: int | None = None,
+    ):
+        lat_lon = self.get_gps_decimal()
+        if lat_lon:
+            location_geocoded = self.geocoder.get_location_name(
+                *lat_lon, zoom=zoom, name_parts=name_parts, precision=precision
             )
         else:
             location_geocoded = None
         return location_geocoded
 
+    def get_gps_decimal(self) -> Tuple[float, float] | None:
+        """Return latitude and longitude in decimal degrees, or None without a GPS fix."""
+        gps_data = self._get_gps_raw()
+        if not all([gps_data.lat, gps_data.lat_ref, gps_data.lon, gps_data.lon_ref]):
+            return None
+        lat = sum(v / 60**i for i, v in enumerate(gps_data.lat))
+        lon = sum(v / 60**i for i, v in enumerate(gps_data.lon))
+        if str(gps_data.lat_ref).strip().upper() == "S":
+            lat = -lat
+        if str(gps_data.lon_ref).strip().upper() == "W":
+            lon = -lon
+        return lat, lon
+
     def get_camera_model(self):
         raw = self.exif_data.get("Image Model", None)  # type: Optional[IfdTag]
         return str(raw.values) if raw else None
@@ -265,3 +476,58 @@ class PhrugalExifData:
             lon_ref,
             alt,
         )
+
+
+def _read_exif_file(
+    image_path: Path | str, tag_names: frozenset[str] | None
+) -> Tuple[dict, int]:
+    """Read the tags of an image file, return them and the bytes read from the file."""
+    raw_file = CountingFileIO(image_path, "rb")
+    with io.BufferedReader(raw_file) as fp:
+        tags = PhrugalExifData._read_tags(fp, tag_names)
+    return tags, raw_file.bytes_read
+
+
+def _read_exif_record(
+    image_path: Path, tag_names: frozenset[str] | None
+) -> Tuple[dict[str, CachedExifTag] | None, int]:
+    """Read the record of an image, None if the file can not be read."""
+    try:
+        tags, bytes_read = _read_exif_file(image_path, tag_names)
+    except (OSError, struct.error, ValueError) as e:
+        # only the groups with this image fail, when they read it again
+        logger.warning(f"unable to read EXIF data of {image_path}: {e!r}")
+        return None, 0
+    # e.g. the thumbnail of exifread is no tag, it is not stored in the records
+    record = {
+        name: CachedExifTag.from_tag(tag)
+        for name, tag in tags.items()
+        if isinstance(tag, (IfdTag, CachedExifTag))
+        and (tag_names is None or name in tag_names)
+    }
+    return record, bytes_read
+
+
+def _read_exif_files(
+    image_paths: list[Path],
+    tag_names: frozenset[str] | None,
+    workers: int | None,
+    mp_context: BaseContext | None,
+) -> Iterator[Tuple[dict[str, CachedExifTag] | None, int]]:
+    """Read the records of the images, in the order of image_paths.
+
+    The record of an image that can not be read is None, see _read_exif_record().
+    """
+    max_workers = workers if workers is not None else os.cpu_count() or 1
+    max_workers = min(
+        max_workers, len(image_paths) // PhrugalExifData.MIN_IMAGES_PER_WORKER
+    )
+    tag_names_repeated = itertools.repeat(tag_names)
+    if max_workers <= 1:
+        yield from map(_read_exif_record, image_paths, tag_names_repeated)
+        return
+    chunksize = max(1, len(image_paths) // (4 * max_workers))
+    with ProcessPoolExecutor(max_workers, mp_context=mp_context) as executor:
+        yield from executor.map(
+            _read_exif_record, image_paths, tag_names_repeated, chunksize=chunksize
+        )
@@ -0,0 +1,216 @@
+"""Read selected EXIF tags, without parsing the rest of the metadata.
+
+exifread parses every IFD of a file, including the MakerNote (byte by byte) and the
+thumbnail. phrugal only shows a dozen tags, so this module reads the entries of the IFDs
+that hold them and stops as soon as all of them are found. The tags are returned with
+the same names, values and printable representation as exifread gives them.
+"""
+
+import logging
+import os
+import struct
+from typing import BinaryIO, Iterable
+
+from exifread.utils import Ratio
+
+from .cache import CachedExifTag
+from .probe import APP1, END_OF_IMAGE, EXIF_HEADER, START_OF_SCAN, STANDALONE_MARKERS
+
+logger = logging.getLogger(__name__)
+
+# tags that can be read, by the name exifread gives them
+TAG_IDS = {
+    "Image ImageDescription": 0x010E,
+    "Image Model": 0x0110,
+    "Image XPTitle": 0x9C9B,
+    "Image XPSubject": 0x9C9F,
+    "EXIF ISOSpeedRatings": 0x8827,
+    "EXIF DateTimeOriginal": 0x9003,
+    "EXIF ShutterSpeedValue": 0x9201,
+    "EXIF ApertureValue": 0x9202,
+    "EXIF FocalLength": 0x920A,
+    "EXIF LensModel": 0xA434,
+    "GPS GPSLatitudeRef": 0x0001,
+    "GPS GPSLatitude": 0x0002,
+    "GPS GPSLongitudeRef": 0x0003,
+    "GPS GPSLongitude": 0x0004,
+    "GPS GPSAltitude": 0x0006,
+}
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+# field type: (size of a value, struct format without byte order)
+FIELD_TYPES = {
+    1: (1, "B"),  # byte
+    2: (1, "s"),  # ASCII
+    3: (2, "H"),  # short
+    4: (4, "I"),  # long
+    5: (8, "II"),  # rational
+    6: (1, "b"),  # signed byte
+    7: (1, "B"),  # undefined
+    8: (2, "h"),  # signed short
+    9: (4, "i"),  # signed long
+    10: (8, "ii"),  # signed rational
+    11: (4, "f"),  # float
+    12: (8, "d"),  # double
+}
+MAX_VALUE_COUNT = 1000  # like exifread, longer values are left empty
+
+
+def can_read_tags(tag_names: Iterable[str]) -> bool:
+    return all(name in TAG_IDS for name in tag_names)
+
+
+class ExifTagReader:
+    """Read the given tags from the EXIF data of a JPEG or TIFF file.
+
+    Only the IFD entries and values that are needed are read from the file, bytes_read
+    counts them. Reading a tag that is not in TAG_IDS raises ValueError, see also
+    can_read_tags().
+    """
+
+    def __init__(self, fp: BinaryIO, tag_names: Iterable[str]):
+        self.fp = fp
+        self.tag_names = frozenset(tag_names)
+        if not can_read_tags(self.tag_names):
+            unknown = sorted(self.tag_names - TAG_IDS.keys())
+            raise ValueError(f"tags {unknown} can not be read selectively")
+        self.bytes_read = 0
+        self._tiff_offset = 0
+        self._byte_order = "<"
+
+    def read(self) -> dict[str, CachedExifTag] | None:
+        """Return the tags found in a JPEG or TIFF file, None for other file formats.
+
+        Tags that the file does not have are missing in the result, like with exifread.
+        """
+        start = self._read_at(0, 12)
+        if start[:2] in (b"II", b"MM"):
+            tiff_offset = 0
+        elif start[:2] == b"\xff\xd8":
+            tiff_offset = self._find_jpeg_exif_segment()
+        else:
+            return None
+        tags = dict()
+        if tiff_offset is None or not self.tag_names:
+            return tags
+        self._tiff_offset = tiff_offset
+        self._byte_order = {b"II": "<", b"MM": ">"}.get(self._read(0, 2))
+        if self._byte_order is None:
+            logger.warning("EXIF data with unknown byte order")
+            return tags
+        try:
+            first_ifd = self._unpack(4, "I")[0]
+            pointers = self._read_ifd(first_ifd, "Image", tags)
+            for ifd_name, pointer_tag in [
+                ("EXIF", EXIF_IFD_POINTER),
+                ("GPS", GPS_IFD_POINTER),
+            ]:
+                if self._is_complete(tags):
+                    break
+                if pointer_tag in pointers and self._needs_ifd(ifd_name):
+                    self._read_ifd(pointers[pointer_tag], ifd_name, tags)
+        except (struct.error, ValueError) as e:
+            logger.warning(f"corrupted EXIF data, some tags may be missing: {e}")
+        return tags
+
+    def _needs_ifd(self, ifd_name: str) -> bool:
+        return any(name.startswith(ifd_name + " ") for name in self.tag_names)
+
+    def _is_complete(self, tags: dict) -> bool:
+        return len(tags) == len(self.tag_names)
+
+    def _find_jpeg_exif_segment(self) -> int | None:
+        """Return the file offset of the TIFF header in the APP1 segment, if there is one."""
+        position = 2
+        while True:
+            marker = self._read_at(position, 2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            if marker[1] == 0xFF:  # fill byte
+                position += 1
+                continue
+            marker_id = marker[1]
+            if marker_id in STANDALONE_MARKERS:
+                position += 2
+                continue
+            if marker_id in (START_OF_SCAN, END_OF_IMAGE):
+                return None
+            segment_header = self._read_at(position + 2, 2 + len(EXIF_HEADER))
+            if len(segment_header) < 2:
+                return None
+            (length,) = struct.unpack(">H", segment_header[:2])
+            if marker_id == APP1 and segment_header[2:] == EXIF_HEADER:
+                return position + 4 + len(EXIF_HEADER)
+            position += 2 + length
+
+    def _read_ifd(self, ifd_offset: int, ifd_name: str, tags: dict) -> dict[int, int]:
+        """Add the wanted tags of an IFD, return the offsets of the sub IFDs it points to."""
+        (entry_count,) = self._unpack(ifd_offset, "H")
+        entries = self._read(ifd_offset + 2, 12 * entry_count)
+        wanted = {
+            TAG_IDS[name]: name
+            for name in self.tag_names
+            if name.startswith(ifd_name + " ") and name not in tags
+        }
+        pointers = dict()
+        for i in range(entry_count):
+            entry = entries[12 * i : 12 * (i + 1)]
+            if len(entry) < 12:
+                break  # truncated IFD
+            tag, field_type, count = struct.unpack(self._byte_order + "HHI", entry[:8])
+            if tag in (EXIF_IFD_POINTER, GPS_IFD_POINTER) and ifd_name == "Image":
+                pointers[tag] = struct.unpack(self._byte_order + "I", entry[8:])[0]
+            elif tag in wanted and field_type in FIELD_TYPES:
+                tags[wanted[tag]] = self._read_tag(field_type, count, entry[8:])
+        return pointers
+
+    def _read_tag(
+        self, field_type: int, count: int, value_field: bytes
+    ) -> CachedExifTag:
+        value_size, value_format = FIELD_TYPES[field_type]
+        if count >= MAX_VALUE_COUNT and field_type != 2:
+            return CachedExifTag([], "[]")
+        size = value_size * count
+        if size > 4:
+            (value_offset,) = struct.unpack(self._byte_order + "I", value_field)
+            data = self._read(value_offset, size)
+        else:
+            data = value_field[:size]
+
+        if field_type == 2:
+            values = data.split(b"\x00", 1)[0]
+            try:
+                values = values.decode("utf-8")
+            except UnicodeDecodeError:
+                logger.warning("possibly corrupted ASCII field in EXIF data")
+            return CachedExifTag(values, str(values))
+
+        raw = struct.unpack(self._byte_order + value_format * count, data)
+        if field_type in (5, 10):
+            values = [Ratio(n, d) for n, d in zip(raw[::2], raw[1::2])]
+        else:
+            values = list(raw)
+        # the printable representation of exifread, for tags without a lookup table
+        if count == 1:
+            printable = str(values[0])
+        elif count > 50 and len(values) > 20:
+            printable = str(values[0:20])[0:-1] + ", ... ]"
+        else:
+            printable = str(values)
+        return CachedExifTag(values, printable)
+
+    def _unpack(self, offset: int, value_format: str) -> tuple:
+        value_format = self._byte_order + value_format
+        return struct.unpack(
+            value_format, self._read(offset, struct.calcsize(value_format))
+        )
+
+    def _read(self, offset: int, length: int) -> bytes:
+        """Read from an offset relative to the TIFF header."""
+        return self._read_at(self._tiff_offset + offset, length)
+
+    def _read_at(self, position: int, length: int) -> bytes:
+        self.fp.seek(position, os.SEEK_SET)
+        data = self.fp.read(length)
+        self.bytes_read += len(data)
+        return data
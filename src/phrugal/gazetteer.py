@@ -0,0 +1,304 @@
+import bisect
+import csv
+import hashlib
+import io
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class _RecordView:
+    """Sequence of the cell keys in the index, so that we can use bisect on the mmap."""
+
+    def __init__(self, index: "GazetteerIndex"):
+        self.index = index
+
+    def __len__(self):
+        return self.index.count
+
+    def __getitem__(self, item: int) -> int:
+        return self.index.get_record(item)[0]
+
+
+class GazetteerIndex:
+    """Grid index over the locations of a gazetteer file, stored in a memory-mapped file.
+
+    The locations are sorted by the grid cell they are in, so all locations of a cell are
+    stored next to each other and can be found with a binary search. Each record holds the
+    cell key, the coordinates and the byte offset of the line in the gazetteer file.
+    """
+
+    MAGIC = b"PHRUGAL1"
+    # magic, cell size, count, source size, source mtime
+    HEADER = struct.Struct("<8sdqqq")
+    # cell key, lat, lon, offset of the line in the source
+    RECORD = struct.Struct("<qddq")
+    CELLS_PER_ROW_LON = 4096  # upper bound for 360° / cell size
+
+    def __init__(self, index_path: Path, cell_size_deg: float):
+        self.index_path = index_path
+        self.cell_size_deg = cell_size_deg
+        self.count = 0
+        self._file = None
+        self._mmap = None  # type: mmap.mmap | None
+
+    def get_cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return (
+            math.floor((lat + 90.0) / self.cell_size_deg),
+            math.floor((lon + 180.0) / self.cell_size_deg),
+        )
+
+    def get_cell_key(self, lat_cell: int, lon_cell: int) -> int:
+        lon_cells = math.ceil(360.0 / self.cell_size_deg)
+        return lat_cell * self.CELLS_PER_ROW_LON + (lon_cell % lon_cells)
+
+    def is_valid_for(self, source_path: Path) -> bool:
+        if not self.index_path.exists():
+            return False
+        with open(self.index_path, "rb") as fp:
+            header = fp.read(self.HEADER.size)
+        if len(header) < self.HEADER.size:
+            return False
+        magic, cell_size, __, source_size, source_mtime = self.HEADER.unpack(header)
+        stat = os.stat(source_path)
+        return (magic, cell_size, source_size, source_mtime) == (
+            self.MAGIC,
+            self.cell_size_deg,
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+
+    def build(self, source_path: Path, locations: list[tuple[float, float, int]]):
+        """Write the index for the given list of (lat, lon, offset) tuples.
+
+        The index is written to a temporary file first and then replaces the index
+        file, so that other processes never map a partly written index.
+        """
+        records = sorted(
+            (self.get_cell_key(*self.get_cell(lat, lon)), lat, lon, offset)
+            for lat, lon, offset in locations
+        )
+        stat = os.stat(source_path)
+        fd, temp_path = tempfile.mkstemp(
+            dir=self.index_path.parent, prefix=self.index_path.name, suffix=".tmp"
+        )
+        try:
+            with open(fd, "wb") as fp:
+                fp.write(
+                    self.HEADER.pack(
+                        self.MAGIC,
+                        self.cell_size_deg,
+                        len(records),
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    )
+                )
+                for record in records:
+                    fp.write(self.RECORD.pack(*record))
+            os.replace(temp_path, self.index_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        logger.info(f"wrote gazetteer index with {len(records)} locations")
+
+    def open(self) -> None:
+        self._file = open(self.index_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        __, __, self.count, __, __ = self.HEADER.unpack_from(self._mmap, 0)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+
+    def get_record(self, idx: int) -> tuple[int, float, float, int]:
+        offset = self.HEADER.size + idx * self.RECORD.size
+        return self.RECORD.unpack_from(self._mmap, offset)
+
+    def get_cell_records(self, lat_cell: int, lon_cell: int):
+        cell_key = self.get_cell_key(lat_cell, lon_cell)
+        keys = _RecordView(self)
+        start = bisect.bisect_left(keys, cell_key)
+        end = bisect.bisect_right(keys, cell_key, lo=start)
+        return (self.get_record(i) for i in range(start, end))
+
+
+class GazetteerBackend:
+    """Offline reverse geocoding from a local gazetteer file.
+
+    The gazetteer is a CSV file with a header row. It needs the columns "lat" and "lon"
+    ("latitude" and "longitude" are accepted as well), all columns that are named like a
+    location name part (e.g. "city", "county", "state", "country") are returned as the
+    address of the nearest location. Fields must not contain line breaks.
+
+    On first use, a grid index is written next to the gazetteer file. Later runs
+    memory-map this index, it is rebuilt if the gazetteer file changes. A backend can
+    be used from several threads, e.g. the geocode prefetch thread and the renderer.
+    """
+
+    NAME = "gazetteer"
+    INDEX_SUFFIX = ".phrugal-index"
+    CELL_SIZE_DEG = 0.5
+    MAX_DISTANCE_DEG = 5.0  # locations further away than this are not considered
+    # like Nominatim, smaller zoom levels return less detailed addresses
+    MIN_ZOOM_FOR_PART = {
+        "country": 0,
+        "country_code": 0,
+        "state": 5,
+        "ISO3166-2-lvl4": 5,
+        "county": 8,
+        "city": 10,
+        "postcode": 10,
+        "suburb": 13,
+        "neighbourhood": 14,
+        "road": 16,
+        "historic": 18,
+        "house_number": 18,
+    }
+    COLUMN_ALIASES = {"latitude": "lat", "longitude": "lon"}
+
+    def __init__(
+        self, gazetteer_path: Path | str, index_path: Path | str | None = None
+    ):
+        self.gazetteer_path = Path(gazetteer_path)
+        # results of another gazetteer file, or of an older version of this one, must
+        # not be served from the caches
+        self.NAME = f"{self.NAME}@{self._get_source_digest()}"
+        if index_path is None:
+            index_path = self.gazetteer_path.with_name(
+                self.gazetteer_path.name + self.INDEX_SUFFIX
+            )
+        self.index = GazetteerIndex(Path(index_path), self.CELL_SIZE_DEG)
+        self._source = None
+        self._source_mmap = None  # type: mmap.mmap | None
+        self._dialect = None
+        self._columns = []  # type: list[str]
+        self._lock = threading.Lock()  # the index is opened (and built) only once
+
+    def __getstate__(self):
+        # file handles and memory maps can not be sent to worker processes, the worker
+        # opens them again on first use
+        return {"gazetteer_path": self.gazetteer_path, "index": self.index.index_path}
+
+    def __setstate__(self, state):
+        self.__init__(state["gazetteer_path"], state["index"])
+
+    def _get_source_digest(self) -> str:
+        """Identify the gazetteer file by its path, size and modification time."""
+        identity = str(self.gazetteer_path.resolve())
+        try:
+            stat = os.stat(self.gazetteer_path)
+            identity += f":{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            pass  # opening the file fails later on, with a better error message
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+    def _open(self) -> None:
+        with open(self.gazetteer_path, "r", encoding="utf-8", newline="") as fp:
+            header_line = fp.readline()
+        self._dialect = csv.Sniffer().sniff(header_line, delimiters=",;\t")
+        header = next(csv.reader([header_line], self._dialect))
+        self._columns = [self.COLUMN_ALIASES.get(c.strip(), c.strip()) for c in header]
+        if "lat" not in self._columns or "lon" not in self._columns:
+            raise ValueError(
+                f"gazetteer {self.gazetteer_path} needs lat and lon columns"
+            )
+
+        if not self.index.is_valid_for(self.gazetteer_path):
+            logger.info(f"building index for gazetteer {self.gazetteer_path}...")
+            self.index.build(self.gazetteer_path, self._read_locations())
+        self.index.open()
+        self._source = open(self.gazetteer_path, "rb")
+        self._source_mmap = mmap.mmap(self._source.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._source_mmap is not None:
+                self._source_mmap.close()
+                self._source.close()
+                self._source_mmap = None
+            self.index.close()
+
+    def _read_locations(self) -> list[tuple[float, float, int]]:
+        lat_column, lon_column = self._columns.index("lat"), self._columns.index("lon")
+        locations = []
+        with open(self.gazetteer_path, "rb") as fp:
+            offset = len(fp.readline())  # skip header
+            for line_number, line in enumerate(fp, start=2):
+                row = self._parse_line(line)
+                if len(row) > max(lat_column, lon_column):
+                    try:
+                        lat, lon = float(row[lat_column]), float(row[lon_column])
+                    except ValueError:
+                        lat = lon = math.nan
+                    if math.isfinite(lat) and math.isfinite(lon):
+                        locations.append((lat, lon, offset))
+                    else:
+                        logger.warning(
+                            f"skip line {line_number} of gazetteer "
+                            f"{self.gazetteer_path}, it has no valid coordinates"
+                        )
+                offset += len(line)
+        return locations
+
+    def _parse_line(self, line: bytes) -> list[str]:
+        text = line.decode("utf-8").rstrip("\r\n")
+        return next(csv.reader(io.StringIO(text), self._dialect), [])
+
+    def _read_row(self, offset: int) -> dict[str, str]:
+        end = self._source_mmap.find(b"\n", offset)
+        line = self._source_mmap[offset : end if end >= 0 else len(self._source_mmap)]
+        return dict(zip(self._columns, self._parse_line(line)))
+
+    def find_nearest(self, lat: float, lon: float) -> int | None:
+        """Return the offset of the nearest location in the gazetteer file."""
+        if self._source_mmap is None:
+            with self._lock:
+                if self._source_mmap is None:
+                    self._open()
+        lat_cell, lon_cell = self.index.get_cell(lat, lon)
+        cos_lat = math.cos(math.radians(lat))
+        best_distance, best_offset = math.inf, None
+        max_ring = math.ceil(self.MAX_DISTANCE_DEG / self.CELL_SIZE_DEG)
+        for ring in range(max_ring + 1):
+            # any location in this ring is at least this far away
+            ring_distance = max(0, ring - 1) * self.CELL_SIZE_DEG * min(1.0, cos_lat)
+            if ring_distance > best_distance:
+                break
+            for d_lat in range(-ring, ring + 1):
+                for d_lon in range(-ring, ring + 1):
+                    if max(abs(d_lat), abs(d_lon)) != ring:
+                        continue  # inner cells were searched already
+                    cell = lat_cell + d_lat, lon_cell + d_lon
+                    for __, loc_lat, loc_lon, offset in self.index.get_cell_records(
+                        *cell
+                    ):
+                        d_lon_deg = (loc_lon - lon + 180.0) % 360.0 - 180.0
+                        distance = math.hypot(loc_lat - lat, d_lon_deg * cos_lat)
+                        if distance < best_distance:
+                            best_distance, best_offset = distance, offset
+        if best_distance > self.MAX_DISTANCE_DEG:
+            return None
+        return best_offset
+
+    def reverse(self, lat: float, lon: float, zoom: int) -> dict | None:
+        """Return the address of the nearest location, with the same keys as Nominatim."""
+        offset = self.find_nearest(lat, lon)
+        if offset is None:
+            return None
+        row = self._read_row(offset)
+        return {
+            part: value
+            for part, value in row.items()
+            if part in self.MIN_ZOOM_FOR_PART
+            and value
+            and zoom >= self.MIN_ZOOM_FOR_PART[part]
+        }
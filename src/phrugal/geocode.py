@@ -1,22 +1,110 @@
 import logging
-from functools import cache
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
 
 import phrugal
-from geopy import Point
-from geopy.extra.rate_limiter import RateLimiter
-from geopy.geocoders import Nominatim
+
+from .metrics import Metrics
+
+if TYPE_CHECKING:
+    # geopy takes long to import, it is imported once a Nominatim backend is created
+    from geopy import Point
+    from geopy.geocoders import Nominatim
+
+    from .cache import GeocodeCache
+    from .gazetteer import GazetteerBackend
 
 logger = logging.getLogger(__name__)
 
-USER_AGENT = f"phrugal/{phrugal.__version__} (+https://github.com/0x6d64/phrugal)"
+DEFAULT_DOMAIN = "nominatim.openstreetmap.org"
+
+
+def get_user_agent() -> str:
+    return f"phrugal/{phrugal.__version__} (+https://github.com/0x6d64/phrugal)"
+
+
+def get_geocoder(domain: str = DEFAULT_DOMAIN, scheme: str = "https") -> "Nominatim":
+    from geopy.geocoders import Nominatim
+
+    return Nominatim(user_agent=get_user_agent(), domain=domain, scheme=scheme)
+
+
+class NominatimBackend:
+    """Reverse geocoding with the Nominatim web service, honoring its rate limit.
+
+    By default, the public server of OpenStreetMap is used. Another server, e.g. an own
+    Nominatim instance or the local stand-in of phrugal.nominatim_stub, is given by its
+    domain (which may include a port and a path) and scheme.
+    """
+
+    NAME = "nominatim"
 
+    def __init__(
+        self,
+        min_delay_seconds: float,
+        max_retries: int,
+        error_wait_seconds: float,
+        domain: str = DEFAULT_DOMAIN,
+        scheme: str = "https",
+    ):
+        from geopy.extra.rate_limiter import RateLimiter
+
+        self.domain = domain
+        self.scheme = scheme
+        if domain != DEFAULT_DOMAIN:
+            # another server may give other results, they must not mix in the caches
+            self.NAME = f"{self.NAME}@{domain}"
+        self.min_delay_seconds = min_delay_seconds
+        self.geocoder = get_geocoder(domain, scheme)
+        self._reverse_rate_limited = RateLimiter(
+            self.geocoder.reverse,
+            min_delay_seconds=min_delay_seconds,
+            max_retries=max_retries,
+            error_wait_seconds=error_wait_seconds,
+        )
+
+    @classmethod
+    def from_url(
+        cls,
+        url: str,
+        min_delay_seconds: float,
+        max_retries: int,
+        error_wait_seconds: float,
+    ) -> "NominatimBackend":
+        """Create a backend for the server at a URL like http://localhost:8080."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            raise ValueError(f"not a http(s) URL of a Nominatim server: {url}")
+        return cls(
+            min_delay_seconds=min_delay_seconds,
+            max_retries=max_retries,
+            error_wait_seconds=error_wait_seconds,
+            domain=parts.netloc + parts.path.rstrip("/"),
+            scheme=parts.scheme,
+        )
 
-def get_geocoder() -> Nominatim:
-    return Nominatim(user_agent=USER_AGENT)
+    def reverse(self, lat: float, lon: float, zoom: int) -> dict | None:
+        """Return the address dict for the coordinates, or None if nothing was found."""
+        answer = self._reverse_rate_limited((lat, lon), exactly_one=True, zoom=zoom)
+        return answer.raw["address"] if answer else None
 
 
 class Geocoder:
-    GEOCODER = None
+    """Reverse geocoding of coordinates into location names.
+
+    All instances share the backend (by default the Nominatim web service, including its
+    rate limit) and the cached results, so creating a Geocoder per image is cheap. Lookups
+    can run in several threads, a lookup that is already running in another thread is
+    awaited instead of being sent to the backend a second time.
+    """
+
+    BACKEND: "NominatimBackend | GazetteerBackend | None" = None
+    _ADDRESS_CACHE = dict()  # type: dict[str, dict]
+    _PENDING = dict()  # type: dict[str, Future]
+    _LOCK = threading.Lock()
+    GEOCODE_CACHE: "GeocodeCache | None" = None
     _CALLS_MADE = 0
     MIN_DELAY_SECONDS = 1.1
     ERROR_WAIT_SECONDS = 7
@@ -37,16 +125,67 @@ class Geocoder:
         "country",
         "country_code",
     ]
+    # number of decimal places the coordinates are rounded to before a lookup, by
+    # maximum zoom level. 2 decimal places are about 1km, 5 decimal places about 1m.
+    ZOOM_PRECISION = [(10, 2), (14, 3), (16, 4)]
+    MAX_PRECISION = 5
 
     def __init__(self):
-        if self.GEOCODER is None:
-            self.GEOCODER = get_geocoder()
-            self._reverse_rate_limited = RateLimiter(
-                self.GEOCODER.reverse,
-                min_delay_seconds=self.MIN_DELAY_SECONDS,
-                max_retries=self.MAX_RETRIES,
-                error_wait_seconds=self.ERROR_WAIT_SECONDS,
+        with Geocoder._LOCK:
+            if Geocoder.BACKEND is None:
+                Geocoder.BACKEND = NominatimBackend(
+                    min_delay_seconds=self.MIN_DELAY_SECONDS,
+                    max_retries=self.MAX_RETRIES,
+                    error_wait_seconds=self.ERROR_WAIT_SECONDS,
+                )
+
+    @classmethod
+    def set_backend(cls, backend) -> None:
+        """Replace the backend that answers the lookups, e.g. with a GazetteerBackend.
+
+        Results are cached per backend, so results of different backends do not mix.
+        """
+        cls.BACKEND = backend
+
+    @classmethod
+    def set_nominatim_url(
+        cls, url: str, min_delay_seconds: float | None = None
+    ) -> None:
+        """Send the lookups to another Nominatim server instead of the public one.
+
+        :param url: URL of the server, e.g. http://localhost:8080
+        :param min_delay_seconds: rate limit of the server, by default the one of the
+                                  public server
+        """
+        cls.set_backend(
+            NominatimBackend.from_url(
+                url,
+                min_delay_seconds=(
+                    cls.MIN_DELAY_SECONDS
+                    if min_delay_seconds is None
+                    else min_delay_seconds
+                ),
+                max_retries=cls.MAX_RETRIES,
+                error_wait_seconds=cls.ERROR_WAIT_SECONDS,
             )
+        )
+
+    @classmethod
+    def add_addresses(cls, addresses: dict[str, dict]) -> None:
+        """Add addresses that were resolved elsewhere, e.g. in the parent process."""
+        with cls._LOCK:
+            cls._ADDRESS_CACHE.update(addresses)
+
+    def prefetch(
+        self, lat: float, lon: float, zoom: int, precision: int | None = None
+    ) -> tuple[str, dict]:
+        """Resolve the address of the coordinates, return cache key and address.
+
+        Later calls of get_location_name() for the same location use the cached result.
+        """
+        lat, lon = self.quantize(lat, lon, zoom, precision)
+        key = self._get_cache_key(lat, lon, zoom)
+        return key, self._get_address(lat, lon, zoom, precision)
 
     def get_location_name(
         self,
@@ -54,6 +193,7 @@ class Geocoder:
         lon: float,
         zoom: int = DEFAULT_ZOOM,
         name_parts: list[str] = DEFAULT_LOCATION_NAME_PARTS,  # noqa
+        precision: int | None = None,
     ) -> str:
         """Returns a name for given coordinates
 
@@ -64,36 +204,108 @@ class Geocoder:
         :param lat: latitude
         :param lon: longitude
         :param zoom: zoom level, see https://nominatim.org/release-docs/develop/api/Reverse/#result-restriction
+        :param precision: decimal places the coordinates are rounded to, so that nearby
+                          locations share one lookup. If None, derive it from the zoom level.
         :return: formatted location name
         """
-        loc = Point(lat, lon)
-        return self.get_location_name_from_point(loc, zoom=zoom, name_parts=name_parts)
-
-    def get_location_name_from_point(
-        self,
-        loc: Point,
-        zoom: int = DEFAULT_ZOOM,
-        name_parts: list[str] = DEFAULT_LOCATION_NAME_PARTS,  # noqa
-    ) -> str:
         for p in name_parts:
             if p not in self.ALLOWED_LOCATION_NAME_PARTS:
                 raise RuntimeError(f"configured location name part {p} is not known!")
-        # call API endpoint, pass lat and lon since Point is not hashable
-        answer = self._call_reverse_api(lat=loc.latitude, lon=loc.longitude, zoom=zoom)
-        self._CALLS_MADE += 1
-        address_dict = answer.raw["address"]
+        address_dict = self._get_address(lat, lon, zoom=zoom, precision=precision)
         name_parts_from_server = [address_dict.get(x) for x in name_parts]
         name_formatted = ", ".join(x for x in name_parts_from_server if x)
 
         return name_formatted
 
-    @cache
-    def _call_reverse_api(self, lat, lon, zoom: int):
-        """Call the reverse api end point.
+    def get_location_name_from_point(
+        self,
+        loc: "Point",
+        zoom: int = DEFAULT_ZOOM,
+        name_parts: list[str] = DEFAULT_LOCATION_NAME_PARTS,  # noqa
+        precision: int | None = None,
+    ) -> str:
+        return self.get_location_name(
+            loc.latitude,
+            loc.longitude,
+            zoom=zoom,
+            name_parts=name_parts,
+            precision=precision,
+        )
+
+    @classmethod
+    def get_precision(cls, zoom: int) -> int:
+        for max_zoom, precision in cls.ZOOM_PRECISION:
+            if zoom <= max_zoom:
+                return precision
+        return cls.MAX_PRECISION
+
+    @classmethod
+    def quantize(
+        cls, lat: float, lon: float, zoom: int, precision: int | None = None
+    ) -> tuple[float, float]:
+        if precision is None:
+            precision = cls.get_precision(zoom)
+        return round(lat, precision), round(lon, precision)
+
+    def _get_cache_key(self, lat: float, lon: float, zoom: int) -> str:
+        return f"{self.BACKEND.NAME}:{lat!r},{lon!r},{zoom}"
 
-        We isolate this into its own method to make it cacheable. We pass lat and lon instead of Point
-        since Point instances are not hashable.
+    def _get_address(
+        self, lat: float, lon: float, zoom: int, precision: int | None = None
+    ) -> dict:
+        """Return the address dict for the coordinates, from a cache if possible.
+
+        Coordinates are quantized first, so that e.g. a series of images taken at the same
+        place needs one lookup only. The lookup itself uses the quantized coordinates as
+        well, this keeps the result independent of which image was looked up first.
         """
-        loc = Point(lat, lon)
-        answer = self._reverse_rate_limited(loc, exactly_one=True, zoom=zoom)
-        return answer
+        lat, lon = self.quantize(lat, lon, zoom, precision)
+        key = self._get_cache_key(lat, lon, zoom)
+        with Geocoder._LOCK:
+            address = self._ADDRESS_CACHE.get(key)
+            if address is not None:
+                Metrics.count_cache("address cache", hits=1)
+                return address
+            pending = self._PENDING.get(key)
+            is_running_elsewhere = pending is not None
+            if not is_running_elsewhere:
+                pending = self._PENDING[key] = Future()
+        # a lookup that is running already counts as hit, it is done only once
+        Metrics.count_cache(
+            "address cache",
+            hits=int(is_running_elsewhere),
+            misses=int(not is_running_elsewhere),
+        )
+        if is_running_elsewhere:
+            return pending.result()  # raises the error if the other lookup failed
+
+        try:
+            address = self._lookup(key, lat, lon, zoom)
+        except Exception as e:
+            with Geocoder._LOCK:
+                del self._PENDING[key]
+            pending.set_exception(e)
+            raise
+        with Geocoder._LOCK:
+            self._ADDRESS_CACHE[key] = address
+            del self._PENDING[key]
+        pending.set_result(address)
+        return address
+
+    def _lookup(self, key: str, lat: float, lon: float, zoom: int) -> dict:
+        address = None
+        persistent_cache = self.GEOCODE_CACHE
+        if persistent_cache is not None:
+            address = persistent_cache.get(key)
+        if address is None:
+            address = self._call_reverse_api(lat=lat, lon=lon, zoom=zoom) or dict()
+            if persistent_cache is not None:
+                persistent_cache.put(key, address)
+        return address
+
+    def _call_reverse_api(self, lat: float, lon: float, zoom: int) -> dict | None:
+        """Ask the backend for the address of the coordinates."""
+        with Metrics.measure("geocode"):
+            address = self.BACKEND.reverse(lat, lon, zoom)
+        self._CALLS_MADE += 1
+        return address
@@ -0,0 +1,280 @@
+"""Split the input images into the groups that are composed together.
+
+Every composition is printed on a sheet of its own, so the number of groups is the
+number of prints. How the images are grouped decides which of them share a sheet, and
+how much of the sheet shows no image detail, see ImageComposition.estimate_wasted_area().
+"""
+
+import itertools
+import logging
+import math
+from enum import StrEnum, auto, unique
+from fractions import Fraction
+from typing import TYPE_CHECKING, Callable, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    # pillow and exifread are imported when images are grouped, not with the CLI
+    from phrugal.exif import ExifRecords, PhrugalExifData
+    from phrugal.image import ImageInfo, PhrugalImage
+
+logger = logging.getLogger(__name__)
+
+Group = Tuple["ImageInfo | PhrugalImage", ...]
+
+
+@unique
+class GroupingStrategy(StrEnum):
+    ASPECT_RATIO = auto()  # images with similar aspect ratios
+    AREA = auto()  # the least wasted area over all compositions
+    TIME = auto()  # images taken one after the other
+    LOCATION = auto()  # images taken close to each other
+    ORDER = auto()  # in the order of the input files
+
+
+# EXIF tags that a strategy needs, see PhrugalExifData.extract_many()
+GROUPING_TAGS = {
+    GroupingStrategy.TIME: frozenset(["EXIF DateTimeOriginal"]),
+    GroupingStrategy.LOCATION: frozenset(
+        [
+            "GPS GPSLatitude",
+            "GPS GPSLatitudeRef",
+            "GPS GPSLongitude",
+            "GPS GPSLongitudeRef",
+        ]
+    ),
+}
+HILBERT_ORDER = 16  # bits per coordinate, cells of some 300 m at the equator
+SWAP_PASSES = 2  # passes over the groups that look for better pairs of groups
+
+
+def group_images(
+    images: Sequence["ImageInfo | PhrugalImage"],
+    group_len: int,
+    strategy: GroupingStrategy = GroupingStrategy.ASPECT_RATIO,
+    target_aspect_ratio: Fraction | float = Fraction(4, 3),
+    output_long_side: int | None = None,
+    exif_records: "ExifRecords | None" = None,
+) -> List[Group]:
+    """Split the images into groups of group_len, one group may be smaller.
+
+    The smaller group is the last one, it is up to the caller to pad it. Each image is
+    in exactly one group.
+
+    :param images: images to group, in the order of the input files
+    :param group_len: number of images in a composition
+    :param strategy: which images are grouped together
+    :param target_aspect_ratio: aspect ratio of each decorated image
+    :param output_long_side: longer side of the compositions in pixel, if they are scaled
+    :param exif_records: tags of the images, needed for the strategies of GROUPING_TAGS
+    """
+    if group_len < 1:
+        raise ValueError(f"a group needs at least one image, not {group_len}")
+    if strategy in GROUPING_TAGS and exif_records is None:
+        raise ValueError(f"grouping by {strategy} needs the EXIF data of the images")
+
+    if strategy == GroupingStrategy.AREA:
+        get_waste = _memoize_waste(
+            lambda group: get_wasted_area(group, target_aspect_ratio, output_long_side)
+        )
+        groups = _split_least_waste(
+            images,
+            group_len,
+            get_waste,
+            key=lambda img: _get_padded_long_side(img, target_aspect_ratio),
+        )
+        groups = _swap_images(groups, get_waste)
+        # the smaller group is padded by the caller, it has to be the last one
+        groups.sort(key=lambda g: len(g) != group_len)
+        return groups
+    if strategy == GroupingStrategy.ASPECT_RATIO:
+        ordered = sorted(images, key=lambda x: x.aspect_ratio_normalized)
+    elif strategy == GroupingStrategy.TIME:
+        ordered = _sort_by_tag_value(images, exif_records, _get_timestamp)
+    elif strategy == GroupingStrategy.LOCATION:
+        ordered = _sort_by_tag_value(images, exif_records, _get_hilbert_index)
+    elif strategy == GroupingStrategy.ORDER:
+        ordered = list(images)
+    else:
+        raise RuntimeError("unknown strategy!")
+    return [
+        tuple(ordered[i : i + group_len]) for i in range(0, len(ordered), group_len)
+    ]
+
+
+def get_wasted_area(
+    group: Group,
+    target_aspect_ratio: Fraction | float,
+    output_long_side: int | None = None,
+) -> float:
+    """Share of the composition of a group that shows no image detail, from 0 to 1."""
+    from phrugal.composition import ImageComposition
+
+    composition = ImageComposition(
+        group,
+        target_aspect_ratio=target_aspect_ratio,
+        output_long_side=output_long_side,
+    )
+    return composition.estimate_wasted_area()
+
+
+def _split_least_waste(
+    images: Sequence["ImageInfo | PhrugalImage"],
+    group_len: int,
+    get_waste: Callable[[Group], float],
+    key: Callable[["ImageInfo | PhrugalImage"], float],
+) -> List[Group]:
+    """Split the images, sorted by key, into consecutive groups with the least waste.
+
+    Images whose cells in the composition differ in size are scaled to the same size,
+    the smaller ones are upscaled. So the images are sorted by size first, then the
+    sorted list is split into consecutive groups. Dynamic programming finds where the
+    smaller group (if any) goes, so that the sum of get_waste() over all groups is
+    minimal. This evaluates O(n / group_len) groups, each one only once. The groups are
+    returned in the order of the sorted list, see _swap_images().
+    """
+    ordered = sorted(images, key=key)
+    count = len(ordered)
+    remainder = count % group_len
+    sizes = [group_len, remainder] if remainder else [group_len]
+    # best[i][short]: waste of grouping ordered[:i], with or without the smaller group
+    best = [[math.inf, math.inf] for _ in range(count + 1)]
+    previous = [[None, None] for _ in range(count + 1)]
+    best[0][0] = 0.0
+    for start in range(count):
+        for short in (0, 1):
+            if best[start][short] == math.inf:
+                continue
+            for size in sizes:
+                end = start + size
+                short_after = short + int(size != group_len)
+                if end > count or short_after > 1:
+                    continue
+                waste = best[start][short] + get_waste(tuple(ordered[start:end]))
+                if waste < best[end][short_after]:
+                    best[end][short_after] = waste
+                    previous[end][short_after] = start
+
+    groups = []
+    end, short = count, int(remainder > 0)
+    while end > 0:
+        start = previous[end][short]
+        groups.append(tuple(ordered[start:end]))
+        short -= int(end - start != group_len)
+        end = start
+    groups.reverse()
+    return groups
+
+
+def _swap_images(
+    groups: List[Group],
+    get_waste: Callable[[Group], float],
+    passes: int = SWAP_PASSES,
+) -> List[Group]:
+    """Swap images between neighbouring groups, as long as this lowers the waste.
+
+    The size of a cell is not all that matters: an image whose aspect ratio is far from
+    the target one shows less detail in a cell of the same size, and is better placed
+    in a group of larger images than one that fills its cell. The groups of
+    _split_least_waste() are a local search away from that. For each pair of
+    neighbouring groups, the swap of two images that lowers the sum of get_waste() the
+    most is made, images of the same dimensions are not swapped.
+    """
+    groups = [list(g) for g in groups]
+    for __ in range(passes):
+        improved = False
+        for k in range(len(groups) - 1):
+            a, b = groups[k], groups[k + 1]
+            best_waste = get_waste(tuple(a)) + get_waste(tuple(b))
+            best_swap = None
+            for i, j in itertools.product(range(len(a)), range(len(b))):
+                if sorted(a[i].image_dims) == sorted(b[j].image_dims):
+                    continue  # the same cells and detail, nothing changes
+                swapped_a = a[:i] + [b[j]] + a[i + 1 :]
+                swapped_b = b[:j] + [a[i]] + b[j + 1 :]
+                waste = get_waste(tuple(swapped_a)) + get_waste(tuple(swapped_b))
+                if waste < best_waste - 1e-9:
+                    best_waste, best_swap = waste, (swapped_a, swapped_b)
+            if best_swap is not None:
+                groups[k], groups[k + 1] = best_swap
+                improved = True
+        if not improved:
+            break
+    return [tuple(g) for g in groups]
+
+
+def _memoize_waste(get_waste: Callable[[Group], float]) -> Callable[[Group], float]:
+    """Evaluate each group once, a group is identified by its images in any order."""
+    known = dict()  # type: dict[tuple[int, ...], float]
+
+    def get_known_waste(group: Group) -> float:
+        key = tuple(sorted(id(img) for img in group))
+        if key not in known:
+            known[key] = get_waste(group)
+        return known[key]
+
+    return get_known_waste
+
+
+def _get_padded_long_side(
+    image: "ImageInfo | PhrugalImage", target_aspect_ratio: Fraction | float
+) -> int:
+    from phrugal.decorated_image import DecoratedPhrugalImage
+
+    decorated = DecoratedPhrugalImage(image, target_aspect_ratio=target_aspect_ratio)
+    return max(decorated.get_padded_dimensions())
+
+
+def _sort_by_tag_value(
+    images: Sequence["ImageInfo | PhrugalImage"],
+    exif_records: "ExifRecords",
+    get_value: Callable[["PhrugalExifData"], str | int | None],
+) -> List["ImageInfo | PhrugalImage"]:
+    """Sort the images by a value of their EXIF data, images without it go last."""
+    from phrugal.exif import PhrugalExifData
+
+    values = []
+    for image in images:
+        tags = exif_records.get_tags(image.file_name) or dict()
+        values.append(get_value(PhrugalExifData.from_tags(image.file_name, tags)))
+    order = sorted(
+        range(len(images)),
+        key=lambda i: (values[i] is None, values[i] if values[i] is not None else 0),
+    )
+    return [images[i] for i in order]
+
+
+def _get_timestamp(exif: "PhrugalExifData") -> str | None:
+    try:
+        # parsed and formatted again, so that invalid timestamps sort last
+        return exif.get_timestamp("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None  # e.g. "0000:00:00 00:00:00" of cameras without a clock
+
+
+def _get_hilbert_index(exif: "PhrugalExifData") -> int | None:
+    """Position on a Hilbert curve over the globe, close positions are close on Earth."""
+    lat_lon = exif.get_gps_decimal()
+    if lat_lon is None:
+        return None
+    lat, lon = lat_lon
+    side = 1 << HILBERT_ORDER
+    x = min(side - 1, int((lon + 180.0) / 360.0 * side))
+    y = min(side - 1, int((lat + 90.0) / 180.0 * side))
+    return _hilbert_index(side, x, y)
+
+
+def _hilbert_index(side: int, x: int, y: int) -> int:
+    """Distance of the cell (x, y) along the Hilbert curve through a grid of side²."""
+    index = 0
+    s = side // 2
+    while s > 0:
+        rx = int(x & s > 0)
+        ry = int(y & s > 0)
+        index += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant, so that the curve continues in the next one
+        if ry == 0:
+            if rx == 1:
+                x, y = side - 1 - x, side - 1 - y
+            x, y = y, x
+        s //= 2
+    return index
@@ -1,9 +1,13 @@
+import io
 import logging
+import mmap
+import os
 from dataclasses import dataclass
 from pathlib import Path
 
 from PIL import Image
 
+from .metrics import Metrics
 from .types import Dimensions
 
 logger = logging.getLogger(__name__)
@@ -11,16 +15,70 @@ logger = logging.getLogger(__name__)
 MM_PER_INCH = 25.4
 
 
-@dataclass
-class PhrugalImage:
-    def __init__(self, file_name: Path | str) -> None:
-        self.file_name = Path(file_name)
-        self.pillow_image = Image.open(self.file_name, mode="r")
-        self.rotation_degrees = 0
+def mm_to_pixels(length_mm: float, dpi: int) -> int:
+    return int(round(length_mm / MM_PER_INCH * dpi))
 
-    @property
-    def image_dims(self) -> Dimensions:
-        return self.pillow_image.size
+
+def map_file(file_name: Path) -> mmap.mmap | bytes:
+    """Map a whole file with a single open, so that pillow and EXIF parsing share it.
+
+    The pages are read from the file on first access and are not copied, the page cache
+    holds them. The file must not be truncated while it is mapped.
+    """
+    with Metrics.measure("read") as stats:
+        with open(file_name, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if size:
+                data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = b""  # an empty file can not be mapped
+        stats.bytes_read = size
+    return data
+
+
+class _MappedFileReader(io.RawIOBase):
+    """Stream over a mapped file, with a position of its own.
+
+    Several readers can share one mapping, e.g. pillow, which reads the pixel data
+    lazily, and the EXIF parser.
+    """
+
+    def __init__(self, data: mmap.mmap | bytes):
+        super().__init__()
+        self._data = data
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._data[self._position : self._position + len(buffer)]
+        buffer[: len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._data)
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+
+class _ImageGeometry:
+    """Aspect ratios for classes that provide the image dimensions."""
+
+    __slots__ = ()
+    image_dims: Dimensions
 
     @property
     def aspect_ratio(self) -> float:
@@ -33,6 +91,63 @@ class PhrugalImage:
         """Same as aspect ratio, but assume that we rotate portrait orientation to landscape always"""
         return self.aspect_ratio if self.aspect_ratio > 1 else 1 / self.aspect_ratio
 
+
+@dataclass(frozen=True, slots=True)
+class ImageInfo(_ImageGeometry):
+    """Header data of an image file, enough to group images and plan their layout.
+
+    Unlike PhrugalImage, this keeps no file open and holds no pixel data, so it can be
+    created for any number of files, see also phrugal.probe.
+    """
+
+    file_name: Path
+    image_dims: Dimensions  # as stored in the file, the EXIF orientation is not applied
+
+    def __repr__(self):
+        return f"{self.file_name.name}"
+
+
+@dataclass
+class PhrugalImage(_ImageGeometry):
+    def __init__(self, file_name: Path | str) -> None:
+        self.file_name = Path(file_name)
+        self.file_data = map_file(self.file_name)  # type: mmap.mmap | bytes | None
+        # the mapping is shared with the EXIF parser, see also get_file_data()
+        self.pillow_image = Image.open(_MappedFileReader(self.file_data), mode="r")
+        self.rotation_degrees = 0
+        self._loaded = False
+
+    @property
+    def image_dims(self) -> Dimensions:
+        return self.pillow_image.size
+
+    def reduce_on_load(self, min_dims: Dimensions) -> None:
+        """Let the JPEG decoder skip pixels that will be scaled away anyway.
+
+        Pillow's draft mode decodes at 1/2, 1/4 or 1/8 scale in the DCT domain, it picks
+        the smallest scale where both dimensions are still at least min_dims. This only
+        has an effect before the pixel data is loaded, and only for JPEG files.
+        """
+        self.pillow_image.draft("RGB", min_dims)
+
+    def load(self) -> None:
+        """Decode the pixel data, unless this happened already."""
+        if self._loaded:
+            return
+        with Metrics.measure("decode"):
+            self.pillow_image.load()
+        self._loaded = True
+
+    def get_file_data(self) -> io.RawIOBase | None:
+        """Return the content of the image file, e.g. to read its EXIF data.
+
+        The file was mapped once when the image was opened, every call gives a new stream
+        over the same mapping. None once the image is closed.
+        """
+        if self.file_data is None:
+            return None
+        return _MappedFileReader(self.file_data)
+
     def rotate_90_deg_ccw(self):
         rotated_img = self.pillow_image.rotate(90, expand=True)
         self.rotation_degrees += 90
@@ -40,6 +155,9 @@ class PhrugalImage:
 
     def close_image(self):
         self.pillow_image.close()
+        if isinstance(self.file_data, mmap.mmap):
+            self.file_data.close()
+        self.file_data = None
 
     def __repr__(self):
         return f"{self.file_name.name}"
@@ -48,7 +166,7 @@ class PhrugalImage:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.pillow_image.close()
+        self.close_image()
         return False
 
     def __del__(self):
@@ -61,5 +179,10 @@ class PhrugalImage:
 class PhrugalPlaceholder(PhrugalImage):
     def __init__(self, img: Image) -> None:
         self.file_name = None
+        self.file_data = None
         self.pillow_image = img
         self.rotation_degrees = 0
+        self._loaded = True
+
+    def __repr__(self):
+        return "placeholder"
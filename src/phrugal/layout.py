@@ -0,0 +1,248 @@
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Sequence, Tuple, TypeVar
+
+import PIL.Image as pill_image
+from PIL.Image import Image, Resampling, Transpose
+from PIL.ImageDraw import Draw
+
+from .metrics import Metrics
+from .types import Dimensions
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[float, float, float, float]  # x0, y0, x1, y1
+T = TypeVar("T")
+
+ROTATION_TRANSPOSE = {
+    90: Transpose.ROTATE_90,
+    180: Transpose.ROTATE_180,
+    270: Transpose.ROTATE_270,
+}
+
+
+def _rotate_point(
+    x: float, y: float, size: Tuple[float, float], ccw: bool
+) -> Tuple[float, float]:
+    """Map a point into the coordinates of the canvas rotated by 90° (like pillow's rotate)."""
+    width, height = size
+    return (y, width - x) if ccw else (height - y, x)
+
+
+def _rotate_box(box: Box, size: Tuple[float, float], ccw: bool) -> Box:
+    ax, ay = _rotate_point(box[0], box[1], size, ccw)
+    bx, by = _rotate_point(box[2], box[3], size, ccw)
+    return min(ax, bx), min(ay, by), max(ax, bx), max(ay, by)
+
+
+def _scale_box(box: Box, scale: float) -> Box:
+    return box[0] * scale, box[1] * scale, box[2] * scale, box[3] * scale
+
+
+def merge_pairwise(
+    items: Iterable[T], merge: Callable[[T, T], T], get_count: Callable[[T], int]
+) -> T | None:
+    """Merge items two at a time until one is left, return it (None for no items).
+
+    The two items with the smallest count are merged first. Ties are broken by the order
+    the items were added in, a merged item is added after all existing ones. This is the
+    order of sorting the list by count (sort is stable) and merging the first two items,
+    repeated until one item is left, but takes O(n log n) instead of O(n² log n).
+    """
+    sequence = itertools.count()
+    heap = [(get_count(item), next(sequence), item) for item in items]
+    heapq.heapify(heap)
+    while len(heap) > 1:
+        __, __, item_a = heapq.heappop(heap)
+        __, __, item_b = heapq.heappop(heap)
+        merged = merge(item_a, item_b)
+        heapq.heappush(heap, (get_count(merged), next(sequence), merged))
+    return heap[0][2] if heap else None
+
+
+@dataclass
+class Placement:
+    """Where a single image ends up in the layout"""
+
+    index: int  # position of the image in the list that was planned
+    box: Box
+    rotation: int = 0  # counter-clockwise, in degrees
+
+    @property
+    def int_box(self) -> Tuple[int, int, int, int]:
+        # neighbouring images share the same float coordinates, so they stay adjacent
+        x0, y0, x1, y1 = self.box
+        return round(x0), round(y0), round(x1), round(y1)
+
+    def scaled(self, scale: float) -> "Placement":
+        return Placement(self.index, _scale_box(self.box, scale), self.rotation)
+
+
+@dataclass
+class LayoutNode:
+    """Geometry of a (partially) merged image, the equivalent of ImageMerge without pixels.
+
+    Sizes are kept as integers, rounded like the pillow operations they replace, so the
+    final canvas has the same size as the one created by merging the actual images.
+    """
+
+    x: int
+    y: int
+    count: int
+    placements: List[Placement] = field(default_factory=list)
+    separators: List[Box] = field(default_factory=list)
+
+    @classmethod
+    def for_image(cls, index: int, dims: Dimensions) -> "LayoutNode":
+        x, y = dims
+        return cls(x=x, y=y, count=1, placements=[Placement(index, (0, 0, x, y))])
+
+    @property
+    def aspect_ratio(self) -> float:
+        return float(self.x) / float(self.y)
+
+    def ensure_landscape_orientation(self, rotate_ccw=True):
+        if self.aspect_ratio < 1:
+            self.rotate_90_deg(ccw=rotate_ccw)
+
+    def rotate_90_deg(self, ccw=True):
+        size = self.x, self.y
+        for p in self.placements:
+            p.box = _rotate_box(p.box, size, ccw)
+            p.rotation = (p.rotation + (90 if ccw else 270)) % 360
+        self.separators = [_rotate_box(s, size, ccw) for s in self.separators]
+        self.x, self.y = self.y, self.x
+
+    def scale_to_x(self, x_target: int) -> None:
+        factor = float(x_target) / float(self.x)
+        if abs(factor - 1) < 1e-5:
+            return
+        new_x, new_y = int(x_target), int(self.y * factor)
+        x_factor, y_factor = new_x / self.x, new_y / self.y
+
+        def scale(b: Box) -> Box:
+            return b[0] * x_factor, b[1] * y_factor, b[2] * x_factor, b[3] * y_factor
+
+        for p in self.placements:
+            p.box = scale(p.box)
+        self.separators = [scale(s) for s in self.separators]
+        self.x, self.y = new_x, new_y
+
+    def translate(self, dx: float, dy: float) -> None:
+        def move(b: Box) -> Box:
+            return b[0] + dx, b[1] + dy, b[2] + dx, b[3] + dy
+
+        for p in self.placements:
+            p.box = move(p.box)
+        self.separators = [move(s) for s in self.separators]
+
+
+class LayoutPlanner:
+    """Compute the final geometry of a composition from image dimensions alone.
+
+    The planner follows the same merge tree as ImageComposition._merge_image_list, but
+    only tracks where every image ends up. This allows to resize each image exactly once
+    and paste it directly into the final canvas.
+    """
+
+    def __init__(self, dims: Sequence[Dimensions]):
+        self.dims = list(dims)
+        self.root = self._plan() if self.dims else None
+
+    @property
+    def size(self) -> Dimensions:
+        return self.root.x, self.root.y
+
+    @property
+    def placements(self) -> List[Placement]:
+        return sorted(self.root.placements, key=lambda p: p.index)
+
+    @property
+    def separators(self) -> List[Box]:
+        return self.root.separators
+
+    def get_canvas_size(self, scale: float = 1.0) -> Dimensions:
+        x, y = self.size
+        return max(1, round(x * scale)), max(1, round(y * scale))
+
+    def _plan(self) -> LayoutNode:
+        return merge_pairwise(
+            (LayoutNode.for_image(i, d) for i, d in enumerate(self.dims)),
+            merge=self._merge_two_nodes,
+            get_count=lambda n: n.count,
+        )
+
+    @staticmethod
+    def _merge_two_nodes(node_a: LayoutNode, node_b: LayoutNode) -> LayoutNode:
+        node_a.ensure_landscape_orientation()
+        node_b.ensure_landscape_orientation()
+
+        bigger_x_dim = int(max(node_a.x, node_b.x))
+        node_a.scale_to_x(bigger_x_dim)
+        node_b.scale_to_x(bigger_x_dim)
+        node_a.translate(int((bigger_x_dim - node_a.x) / 2), 0)
+        node_b.translate(int((bigger_x_dim - node_b.x) / 2), node_a.y)
+
+        new_count = node_a.count + node_b.count
+        merged = LayoutNode(
+            x=bigger_x_dim,
+            y=node_a.y + node_b.y,
+            count=new_count,
+            placements=node_a.placements + node_b.placements,
+            separators=node_a.separators
+            + node_b.separators
+            + [(0, node_a.y, bigger_x_dim, node_a.y)],
+        )
+        merged.ensure_landscape_orientation(
+            rotate_ccw=(new_count / 2) % 2 == 0  # rotate cw and ccw every 2 merges
+        )
+        return merged
+
+    def render(
+        self,
+        images: Iterable[Image],
+        draw_separator: bool = True,
+        background_color: str = "white",
+        resample_method: Resampling = Resampling.LANCZOS,
+        scale: float = 1.0,
+    ) -> Image:
+        """Paste the images into a single canvas, each of them is resampled only once.
+
+        :param images: the images in the order they were planned. Each image is pasted
+                       before the next one is requested, so this can be a generator that
+                       keeps only one image in memory.
+        :param scale: size of the canvas relative to the planned size
+        """
+        canvas = pill_image.new(
+            "RGB", self.get_canvas_size(scale), color=background_color
+        )
+        for p, image in zip(self.placements, images):
+            p = p.scaled(scale)
+            with Metrics.measure("resize"):
+                image = self._fit_to_placement(image, p, resample_method)
+            canvas.paste(image, p.int_box[:2])
+        if draw_separator:
+            draw = Draw(canvas)
+            for x0, y0, x1, y1 in (_scale_box(s, scale) for s in self.separators):
+                draw.line(
+                    [(round(x0), round(y0)), (round(x1), round(y1))],
+                    fill="black",
+                    width=1,
+                )
+        return canvas
+
+    @staticmethod
+    def _fit_to_placement(
+        image: Image, placement: Placement, resample_method: Resampling
+    ) -> Image:
+        x0, y0, x1, y1 = placement.int_box
+        target = max(1, x1 - x0), max(1, y1 - y0)
+        if placement.rotation in (90, 270):
+            target = target[1], target[0]  # resize before rotating, it's cheaper
+        if image.size != target:
+            image = image.resize(target, resample=resample_method, reducing_gap=4.0)
+        if placement.rotation:
+            image = image.transpose(ROTATION_TRANSPOSE[placement.rotation])
+        return image
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def get_input_key(source: Path | None) -> str | None:
+    """Identify an input file independent of the working directory, None for placeholders."""
+    return str(Path(source).resolve()) if source is not None else None
+
+
+@dataclass
+class ManifestEntry:
+    """A composition that was written, and what it was created from."""
+
+    filename: str
+    inputs: List[str | None]  # see get_input_key()
+    digest: str  # of the input files and the settings, see Manifest.get_digest()
+
+    @property
+    def real_inputs(self) -> List[str]:
+        return [i for i in self.inputs if i is not None]
+
+    def is_complete(self, group_len: int) -> bool:
+        """Check if the group consists of distinct images only, without padding."""
+        return len(self.inputs) == group_len == len(set(self.real_inputs))
+
+
+class Manifest:
+    """Record of the compositions in an output directory, used to skip unchanged groups.
+
+    For every composition, the manifest holds a digest of its input files (path, size and
+    modification time) and of the settings that affect the result. A composition is up
+    to date as long as the digest is unchanged and the file exists.
+    """
+
+    FILE_NAME = "phrugal-manifest.json"
+    VERSION = 1
+
+    def __init__(self, output_path: Path | str):
+        self.output_path = Path(output_path)
+        self.entries = []  # type: List[ManifestEntry]
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.output_path / self.FILE_NAME
+
+    @classmethod
+    def load(cls, output_path: Path | str) -> "Manifest":
+        """Read the manifest of a directory, it is empty if there is no (usable) one."""
+        manifest = cls(output_path)
+        try:
+            with open(manifest.manifest_path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return manifest
+        except (OSError, ValueError) as e:
+            logger.warning(
+                f"ignoring unreadable manifest {manifest.manifest_path}: {e}"
+            )
+            return manifest
+        if data.get("version") != cls.VERSION:
+            logger.info(f"ignoring manifest of version {data.get('version')}")
+            return manifest
+        manifest.entries = [ManifestEntry(**e) for e in data["compositions"]]
+        return manifest
+
+    def save(self) -> None:
+        data = {
+            "version": self.VERSION,
+            "compositions": [vars(e) for e in self.entries],
+        }
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as fp:
+            json.dump(data, fp, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)  # never leave a partial manifest
+
+    @staticmethod
+    def get_digest(inputs: Sequence[str | None], settings_key: str) -> str | None:
+        """Return the digest of the input files and settings, None if a file is missing."""
+        records = []
+        for input_key in inputs:
+            if input_key is None:
+                records.append(None)
+                continue
+            try:
+                stat = os.stat(input_key)
+            except OSError:
+                return None
+            records.append([input_key, stat.st_size, stat.st_mtime_ns])
+        content = json.dumps([settings_key, records], ensure_ascii=False)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def is_up_to_date(self, entry: ManifestEntry, settings_key: str) -> bool:
+        return (self.output_path / entry.filename).exists() and entry.digest == (
+            self.get_digest(entry.inputs, settings_key)
+        )
+
+    def add(self, filename: str, inputs: List[str | None], settings_key: str) -> None:
+        digest = self.get_digest(inputs, settings_key)
+        if digest is not None:
+            self.entries.append(ManifestEntry(filename, inputs, digest))
@@ -0,0 +1,198 @@
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0  # of the thread that ran the stage
+    bytes_read: int = 0
+    bytes_written: int = 0
+
+    def add(self, other: "StageStats") -> None:
+        self.calls += other.calls
+        self.wall_seconds += other.wall_seconds
+        self.cpu_seconds += other.cpu_seconds
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+
+
+class CountingFileIO(io.FileIO):
+    """A raw file that counts the bytes read from the operating system.
+
+    Wrap it in an io.BufferedReader, then small reads cost nothing extra, only refilling
+    the buffer is counted.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bytes_read = 0
+
+    def readinto(self, buffer) -> int | None:
+        count = super().readinto(buffer)
+        if count:
+            self.bytes_read += count
+        return count
+
+
+class Metrics:
+    """Time and data volume per stage of the processing, and cache hit rates.
+
+    The numbers are collected per process in class attributes, like the caches. Worker
+    processes send a snapshot() back with every group, which is merged into the numbers
+    of the main process. The stages do not overlap, e.g. reading EXIF data is not part
+    of the "text" stage, so their times add up.
+    """
+
+    STAGES = dict()  # type: dict[str, StageStats]
+    CACHES = dict()  # type: dict[str, list[int]]  # name: [hits, misses]
+    RUNS = dict()  # type: dict[str, float]  # totals of create_compositions() calls
+    _LOCK = threading.Lock()
+
+    @classmethod
+    @contextmanager
+    def measure(cls, stage: str) -> Iterator[StageStats]:
+        """Measure the wall and CPU time of a stage.
+
+        The context manager gives the stats of this call, so that the bytes read or written
+        can be added to them.
+        """
+        call = StageStats(calls=1)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield call
+        finally:
+            call.wall_seconds = time.perf_counter() - wall_start
+            call.cpu_seconds = time.thread_time() - cpu_start
+            with cls._LOCK:
+                cls.STAGES.setdefault(stage, StageStats()).add(call)
+
+    @classmethod
+    def count_cache(cls, name: str, hits: int = 0, misses: int = 0) -> None:
+        with cls._LOCK:
+            counts = cls.CACHES.setdefault(name, [0, 0])
+            counts[0] += hits
+            counts[1] += misses
+
+    @classmethod
+    def add_run(
+        cls,
+        images: int,
+        groups: int,
+        failed_groups: int,
+        wall_seconds: float,
+        cpu_seconds: float,
+        wasted_area: float = 0.0,
+    ) -> None:
+        """Add the totals of a run, cpu_seconds is the CPU time of the main process.
+
+        wasted_area is the area of the compositions that shows no image detail, in
+        prints, see PhrugalComposer.wasted_area.
+        """
+        with cls._LOCK:
+            for name, value in [
+                ("runs", 1),
+                ("images", images),
+                ("groups", groups),
+                ("failed_groups", failed_groups),
+                ("wall_seconds", wall_seconds),
+                ("cpu_seconds", cpu_seconds),
+                ("wasted_area", wasted_area),
+            ]:
+                cls.RUNS[name] = cls.RUNS.get(name, 0) + value
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._LOCK:
+            cls.STAGES = dict()
+            cls.CACHES = dict()
+            cls.RUNS = dict()
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        with cls._LOCK:
+            return {
+                "stages": {name: asdict(s) for name, s in cls.STAGES.items()},
+                "caches": {name: list(c) for name, c in cls.CACHES.items()},
+            }
+
+    @classmethod
+    def merge(cls, snapshot: dict) -> None:
+        """Add the numbers of another process, see snapshot()."""
+        with cls._LOCK:
+            for name, stats in snapshot["stages"].items():
+                cls.STAGES.setdefault(name, StageStats()).add(StageStats(**stats))
+        for name, (hits, misses) in snapshot["caches"].items():
+            cls.count_cache(name, hits, misses)
+
+    @classmethod
+    def get_report(cls) -> dict:
+        with cls._LOCK:
+            runs = dict(cls.RUNS)
+            stages = {name: asdict(s) for name, s in sorted(cls.STAGES.items())}
+            caches = {name: list(c) for name, c in sorted(cls.CACHES.items())}
+        wall_seconds = runs.get("wall_seconds", 0.0)
+        images = int(runs.get("images", 0))
+        for stats in stages.values():
+            seconds = stats["wall_seconds"]
+            stats["calls_per_second"] = stats["calls"] / seconds if seconds else None
+        return {
+            "runs": int(runs.get("runs", 0)),
+            "images": images,
+            "groups": int(runs.get("groups", 0)),
+            "failed_groups": int(runs.get("failed_groups", 0)),
+            "wall_seconds": wall_seconds,
+            "cpu_seconds": runs.get("cpu_seconds", 0.0),
+            "wasted_area": runs.get("wasted_area", 0.0),
+            "images_per_second": images / wall_seconds if wall_seconds else None,
+            "stages": stages,
+            "caches": {
+                name: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else None,
+                }
+                for name, (hits, misses) in caches.items()
+            },
+        }
+
+    @classmethod
+    def write_report(cls, path: Path | str) -> None:
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(cls.get_report(), fp, indent=2)
+
+    @classmethod
+    def get_summary(cls) -> str:
+        """Return the report as a table for humans."""
+        report = cls.get_report()
+        per_second = report["images_per_second"] or 0.0
+        groups = report["groups"]
+        wasted_share = report["wasted_area"] / groups if groups else 0.0
+        lines = [
+            f"{report['images']} images in {groups} groups "
+            f"({wasted_share:.0%} wasted area), "
+            f"{report['wall_seconds']:.2f} s ({per_second:.2f} images/s)",
+            f"{'stage':<10} {'calls':>6} {'wall [s]':>9} {'cpu [s]':>8} "
+            f"{'read [MB]':>10} {'written [MB]':>13}",
+        ]
+        for name, s in report["stages"].items():
+            lines.append(
+                f"{name:<10} {s['calls']:>6} {s['wall_seconds']:>9.2f} "
+                f"{s['cpu_seconds']:>8.2f} {s['bytes_read'] / 1e6:>10.1f} "
+                f"{s['bytes_written'] / 1e6:>13.1f}"
+            )
+        for name, c in report["caches"].items():
+            hit_rate = c["hit_rate"] or 0.0
+            lines.append(
+                f"{name}: {c['hits']} hits, {c['misses']} misses "
+                f"({hit_rate:.0%} hit rate)"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,218 @@
+"""A local stand-in for the reverse geocoding API of a Nominatim server.
+
+It answers /reverse requests from a fixture file, so that geocoding can be tested and
+benchmarked without network access. Latency and server errors can be simulated. Start
+it e.g. with:
+
+    python -m phrugal.nominatim_stub places.json --port 8080 --latency-ms 200
+
+and run phrugal with ``--nominatim-url http://localhost:8080``.
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from .gazetteer import GazetteerBackend
+
+logger = logging.getLogger(__name__)
+
+
+def load_fixture(fixture_path: Path | str) -> list[dict]:
+    """Read the places of a fixture file.
+
+    The file holds a JSON list of places as Nominatim returns them, each with "lat",
+    "lon" and the "address" at the highest zoom level. Other keys, e.g. "display_name",
+    are passed on as they are.
+    """
+    with open(fixture_path, "r", encoding="utf-8") as fp:
+        places = json.load(fp)
+    for place in places:
+        if "lat" not in place or "lon" not in place or "address" not in place:
+            raise ValueError(f"place without lat, lon or address in {fixture_path}")
+    return places
+
+
+class NominatimStub:
+    """HTTP server with the /reverse endpoint of Nominatim, answered from a list of places.
+
+    A request is answered with the nearest place. Like Nominatim, smaller zoom levels
+    return less detailed addresses, and there is no result far away from all places.
+    Requests are handled in threads, each one waits for the configured latency. A share
+    of the requests, chosen at random, fails with 503 Service Unavailable.
+    """
+
+    MAX_DISTANCE_DEG = GazetteerBackend.MAX_DISTANCE_DEG
+    MIN_ZOOM_FOR_PART = GazetteerBackend.MIN_ZOOM_FOR_PART
+    DEFAULT_ZOOM = 18
+
+    def __init__(
+        self,
+        places: list[dict],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_seconds: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        """
+        :param places: places to answer with, see load_fixture()
+        :param host: address to listen on
+        :param port: port to listen on, 0 picks a free one
+        :param latency_seconds: time every request takes
+        :param error_rate: share of the requests that fail, from 0 to 1
+        :param seed: seed of the random errors, for reproducible runs
+        """
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError(f"error rate must be between 0 and 1, not {error_rate}")
+        self.places = places
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.request_count = 0
+        self.error_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _StubRequestHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None  # type: threading.Thread | None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "NominatimStub":
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="nominatim-stub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests in this thread, until the process is interrupted."""
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def reverse(self, lat: float, lon: float, zoom: int) -> dict:
+        """Return the answer to a reverse geocoding request, like Nominatim does."""
+        place = self._find_nearest(lat, lon)
+        if place is None:
+            return {"error": "Unable to geocode"}
+        address = {
+            part: value
+            for part, value in place["address"].items()
+            if zoom >= self.MIN_ZOOM_FOR_PART.get(part, 0)
+        }
+        return dict(place, address=address)
+
+    def is_failing(self) -> bool:
+        """Count a request and decide if it fails."""
+        with self._lock:
+            self.request_count += 1
+            failing = self._random.random() < self.error_rate
+            self.error_count += int(failing)
+        return failing
+
+    def _find_nearest(self, lat: float, lon: float) -> dict | None:
+        cos_lat = math.cos(math.radians(lat))
+        best_distance, best_place = math.inf, None
+        for place in self.places:
+            d_lon_deg = (float(place["lon"]) - lon + 180.0) % 360.0 - 180.0
+            distance = math.hypot(float(place["lat"]) - lat, d_lon_deg * cos_lat)
+            if distance < best_distance:
+                best_distance, best_place = distance, place
+        return best_place if best_distance <= self.MAX_DISTANCE_DEG else None
+
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    server_version = "NominatimStub"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") not in ("/reverse", "/reverse.php"):
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "unknown endpoint"})
+            return
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        stub = self.server.stub  # type: NominatimStub
+        time.sleep(stub.latency_seconds)
+        if stub.is_failing():
+            self._send_json(
+                HTTPStatus.SERVICE_UNAVAILABLE, {"error": "simulated error"}
+            )
+            return
+        try:
+            lat, lon = float(params["lat"]), float(params["lon"])
+            zoom = int(params.get("zoom", stub.DEFAULT_ZOOM))
+        except (KeyError, ValueError):
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": "need lat and lon"})
+            return
+        self._send_json(HTTPStatus.OK, stub.reverse(lat, lon, zoom))
+
+    def _send_json(self, status: HTTPStatus, content: dict) -> None:
+        body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("fixture", help="JSON file with the places, see load_fixture()")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stub = NominatimStub(
+        load_fixture(args.fixture),
+        host=args.host,
+        port=args.port,
+        latency_seconds=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    logger.info(f"serving {len(stub.places)} places at {stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.stop()
+    logger.info(f"{stub.request_count} requests, {stub.error_count} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import dataclasses
+from dataclasses import dataclass
+from enum import StrEnum, auto, unique
+
+# resolution of the print, together with the print size it gives the output dimensions
+DEFAULT_PRINT_DPI = 300
+
+
+@unique
+class OutputFormat(StrEnum):
+    JPEG = auto()
+    WEBP = auto()
+    PNG = auto()
+    TIFF = auto()
+
+
+@dataclass(frozen=True)
+class OutputSettings:
+    """How the compositions are encoded.
+
+    Values that are None keep the default of pillow, so the default settings give the
+    same files as before these settings existed. Settings that do not apply to the
+    format are ignored, e.g. subsampling for PNG.
+    """
+
+    EXTENSIONS = {
+        OutputFormat.JPEG: ".jpg",
+        OutputFormat.WEBP: ".webp",
+        OutputFormat.PNG: ".png",
+        OutputFormat.TIFF: ".tif",
+    }
+    SUBSAMPLING_VALUES = ["4:4:4", "4:2:2", "4:2:0"]
+
+    format: OutputFormat = OutputFormat.JPEG
+    quality: int | None = None  # JPEG and WebP, 1 (worst) to 100 (best)
+    subsampling: str | None = None  # JPEG chroma subsampling, e.g. "4:2:0"
+    progressive: bool = False  # JPEG only
+    optimize: bool = False  # smaller files, slower encoding (JPEG, PNG, TIFF)
+
+    def __post_init__(self):
+        # the format is a plain string when it comes from a config file
+        object.__setattr__(self, "format", OutputFormat(self.format))
+        if self.quality is not None and not 1 <= self.quality <= 100:
+            raise ValueError(f"quality must be between 1 and 100, not {self.quality}")
+        if (
+            self.subsampling is not None
+            and self.subsampling not in self.SUBSAMPLING_VALUES
+        ):
+            raise ValueError(
+                f"subsampling must be one of {self.SUBSAMPLING_VALUES}, "
+                f"not {self.subsampling}"
+            )
+
+    @classmethod
+    def from_dict(cls, params: dict) -> "OutputSettings":
+        known_params = {f.name for f in dataclasses.fields(cls)}
+        for name in params:
+            if name not in known_params:
+                raise ValueError(f"unknown output parameter {name}")
+        return cls(**params)
+
+    @property
+    def extension(self) -> str:
+        return self.EXTENSIONS[self.format]
+
+    def get_save_params(self) -> dict:
+        """Return the keyword arguments for pillow's Image.save()."""
+        params = {"format": self.format.value.upper()}
+        if self.format in (OutputFormat.JPEG, OutputFormat.WEBP):
+            if self.quality is not None:
+                params["quality"] = self.quality
+        if self.format == OutputFormat.JPEG:
+            if self.subsampling is not None:
+                params["subsampling"] = self.subsampling
+            params["progressive"] = self.progressive
+            params["optimize"] = self.optimize
+        elif self.format == OutputFormat.PNG:
+            params["optimize"] = self.optimize
+        elif self.format == OutputFormat.TIFF and self.optimize:
+            params["compression"] = "tiff_lzw"
+        return params
@@ -0,0 +1,96 @@
+import logging
+import threading
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from .exif import PhrugalExifData
+from .geocode import Geocoder
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodePrefetcher:
+    """Resolve the locations of all images in a background thread, ahead of rendering.
+
+    The images are visited group by group in the order they are rendered. Every location
+    is looked up once per configured zoom level and precision, locations that are cached
+    already or shared by several images cost no extra lookup. Lookups go through Geocoder,
+    so the rate limit of the backend holds for the prefetch thread and the rendering
+    together, and rendering only waits for lookups that are not finished yet.
+    """
+
+    def __init__(
+        self,
+        image_groups: Sequence[Tuple[Path | None, ...]],
+        geocode_params: List[dict],
+    ):
+        """
+        :param image_groups: paths of the images per group, None stands for a placeholder
+        :param geocode_params: parameters of the configured geocode items, see
+                               DecorationConfig.get_item_params()
+        """
+        self.image_groups = image_groups
+        self.lookups = list(
+            dict.fromkeys(
+                (p.get("zoom", Geocoder.DEFAULT_ZOOM), p.get("precision"))
+                for p in geocode_params
+            )
+        )
+        self._group_addresses = [dict() for _ in image_groups]  # type: list[dict]
+        self._group_done = [threading.Event() for _ in image_groups]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="geocode-prefetch", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop after the current lookup and wait for the thread."""
+        self._stop.set()
+        self._thread.join()
+
+    def get_group_addresses(self, group_idx: int) -> dict[str, dict]:
+        """Wait until all locations of a group are resolved and return them by cache key.
+
+        Locations that could not be resolved are missing, they are looked up again while
+        rendering.
+        """
+        self._group_done[group_idx].wait()
+        return self._group_addresses[group_idx]
+
+    def _run(self) -> None:
+        geocoder = Geocoder()
+        try:
+            for idx, group in enumerate(self.image_groups):
+                for source in group:
+                    if self._stop.is_set():
+                        return
+                    if source is not None:
+                        self._prefetch_image(
+                            geocoder, source, self._group_addresses[idx]
+                        )
+                self._group_done[idx].set()
+            logger.debug("geocode prefetch finished")
+        finally:
+            for done in self._group_done:
+                done.set()  # nobody must wait forever if we stopped early
+
+    def _prefetch_image(
+        self, geocoder: Geocoder, source: Path, addresses: dict[str, dict]
+    ) -> None:
+        try:
+            lat_lon = PhrugalExifData(source).get_gps_decimal()
+        except Exception as e:
+            logger.warning(f"could not read GPS position of {source}: {e!r}")
+            return
+        if lat_lon is None:
+            return
+        for zoom, precision in self.lookups:
+            try:
+                key, address = geocoder.prefetch(*lat_lon, zoom, precision)
+            except Exception as e:
+                logger.warning(f"could not prefetch location of {source}: {e!r}")
+                continue
+            addresses[key] = address
@@ -0,0 +1,84 @@
+import logging
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterable, List
+
+from PIL import Image
+
+from .image import ImageInfo
+from .types import Dimensions
+
+logger = logging.getLogger(__name__)
+
+# start of frame markers, the others in this range are DHT, JPG and DAC
+SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# markers without a length field
+STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+START_OF_SCAN = 0xDA
+END_OF_IMAGE = 0xD9
+APP1 = 0xE1
+EXIF_HEADER = b"Exif\x00\x00"
+
+
+def probe_image(file_name: Path | str) -> ImageInfo:
+    """Read the dimensions of an image without decoding it.
+
+    The EXIF orientation is not read: images are rendered as stored and rotated to
+    landscape, so it would not change grouping or layout.
+
+    For JPEG files, only the segment headers up to the start of frame marker are read.
+    Other formats are read by pillow, which also only parses the header.
+    """
+    with open(file_name, "rb") as fp:
+        dims = _probe_jpeg(fp)
+    if dims is not None:
+        return ImageInfo(Path(file_name), dims)
+
+    logger.debug(f"{file_name} is no JPEG file we can probe, use pillow")
+    with Image.open(file_name, mode="r") as img:
+        return ImageInfo(Path(file_name), img.size)
+
+
+def probe_images(
+    file_names: Iterable[Path | str], max_workers: int | None = None
+) -> List[ImageInfo]:
+    """Probe many images with a thread pool, the result is in the order of file_names.
+
+    :param file_names: images to probe
+    :param max_workers: number of threads, see ThreadPoolExecutor for the default
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(probe_image, file_names))
+
+
+def _probe_jpeg(fp: BinaryIO) -> Dimensions | None:
+    """Return the dimensions from the JPEG headers, None if this fails."""
+    if fp.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        if fp.read(1) != b"\xff":
+            return None
+        marker = fp.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = fp.read(1)
+        if not marker:
+            return None
+        marker_id = marker[0]
+        if marker_id in STANDALONE_MARKERS:
+            continue
+        if marker_id in (START_OF_SCAN, END_OF_IMAGE):
+            return None  # there was no frame header
+
+        length_bytes = fp.read(2)
+        if len(length_bytes) < 2:
+            return None
+        (length,) = struct.unpack(">H", length_bytes)
+        if marker_id in SOF_MARKERS:
+            frame_header = fp.read(5)
+            if len(frame_header) < 5:
+                return None
+            __, height, width = struct.unpack(">BHH", frame_header)
+            return width, height
+        fp.seek(length - 2, os.SEEK_CUR)
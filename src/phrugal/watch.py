@@ -0,0 +1,248 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .cache import SqliteCache
+from .discovery import ImageFilter
+
+if TYPE_CHECKING:
+    # the composer imports pillow, the CLI only needs the defaults of this module
+    from .composer import PhrugalComposer
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryPoller:
+    """Find the image files that appear in a directory tree, by polling it.
+
+    A poll only checks the modification time of the known directories, a directory is
+    listed (with os.scandir) only if its modification time changed. This is the case when
+    entries are added, removed or renamed. A new file is reported once its size and
+    modification time did not change between two polls, so that files that are still
+    being copied are not picked up too early.
+    """
+
+    # on file systems with coarse timestamps, the modification time of a directory may
+    # not change if it is modified again shortly after we listed it, so recently modified
+    # directories are listed again in the next poll
+    RACY_SECONDS = 2.0
+
+    def __init__(self, root: Path | str, image_filter: ImageFilter | None = None):
+        """
+        :param root: directory to watch
+        :param image_filter: which files are images, see find_images()
+        """
+        self.root = Path(root)
+        self.image_filter = image_filter or ImageFilter()
+        self.known_files: set[Path] = set()
+        self._dir_mtimes: dict[Path, int | None] = dict()
+        self._dir_files: dict[Path, set[Path]] = dict()
+        self._unstable: dict[Path, tuple[int, int] | None] = dict()
+
+    def scan(self) -> None:
+        """List the whole tree, the files found are known and not reported by poll()."""
+        self._dir_mtimes = {self.root: None}
+        self._check_directory(self.root, report=False)
+
+    def poll(self) -> list[Path]:
+        """Return the files that appeared since the last poll and are complete by now."""
+        for directory in list(self._dir_mtimes):
+            self._check_directory(directory)
+        return self._get_stable_files()
+
+    def _check_directory(self, directory: Path, report: bool = True) -> None:
+        if directory not in self._dir_mtimes:
+            return  # removed while we listed its parent
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            self._forget_directory(directory)
+            return
+        if mtime != self._dir_mtimes[directory]:
+            self._list_directory(directory, mtime, report)
+
+    def _list_directory(self, directory: Path, mtime: int, report: bool) -> None:
+        files = set()
+        new_directories = []
+        relative_path = directory.relative_to(self.root).as_posix()
+        prefix = "" if relative_path == "." else f"{relative_path}/"
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    path = Path(entry.path)
+                    entry_path = prefix + entry.name
+                    if entry.is_dir() and not entry.is_symlink():
+                        if path not in self._dir_mtimes and (
+                            self.image_filter.accepts_directory(entry_path)
+                        ):
+                            new_directories.append(path)
+                    elif self.image_filter.accepts_file(entry_path) and entry.is_file():
+                        files.add(path)
+        except OSError:
+            self._forget_directory(directory)
+            return
+        is_racy = time.time() - mtime / 1e9 < self.RACY_SECONDS
+        self._dir_mtimes[directory] = None if is_racy else mtime
+
+        previous_files = self._dir_files.get(directory, set())
+        for removed in previous_files - files:
+            self._forget_file(removed)
+        for added in files - previous_files:
+            if report:
+                self._unstable[added] = None
+            else:
+                self.known_files.add(added)
+        self._dir_files[directory] = files
+
+        for new_directory in new_directories:
+            self._dir_mtimes[new_directory] = None
+            self._check_directory(new_directory, report)
+
+    def _forget_directory(self, directory: Path) -> None:
+        self._dir_mtimes.pop(directory, None)
+        for removed in self._dir_files.pop(directory, set()):
+            self._forget_file(removed)
+
+    def _forget_file(self, path: Path) -> None:
+        self.known_files.discard(path)
+        self._unstable.pop(path, None)
+
+    def _get_stable_files(self) -> list[Path]:
+        stable = []
+        for path, last_seen in list(self._unstable.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._unstable[path]
+                continue
+            current = stat.st_size, stat.st_mtime_ns
+            if current == last_seen:
+                del self._unstable[path]
+                self.known_files.add(path)
+                stable.append(path)
+            else:
+                self._unstable[path] = current
+        return sorted(stable)
+
+
+class PhrugalWatcher:
+    """Compose the images in an input directory, and then the new ones as they arrive.
+
+    New images are collected until there are enough to fill a group (image_count in the
+    config), or until the oldest of them waited for batch_timeout seconds. Each batch is
+    rendered in incremental mode, so a group that had to be padded is composed again once
+    more images arrived. The composer and its caches (fonts, geocoding results and EXIF
+    data) are kept between batches, only the headers of new images are read.
+    """
+
+    DEFAULT_POLL_INTERVAL_SECONDS = 5.0
+    DEFAULT_BATCH_TIMEOUT_SECONDS = 300.0
+
+    def __init__(
+        self,
+        composer: "PhrugalComposer",
+        input_path: Path | str,
+        output_path: Path | str,
+        poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+        batch_timeout: float = DEFAULT_BATCH_TIMEOUT_SECONDS,
+        max_workers: int | None = 1,
+        image_filter: ImageFilter | None = None,
+    ):
+        """
+        :param composer: composer used for all batches
+        :param input_path: directory to watch, including its subdirectories
+        :param output_path: directory for the compositions
+        :param poll_interval: seconds between two polls of the input directory
+        :param batch_timeout: seconds after which new images are composed, even if there
+                              are not enough of them to fill a group
+        :param max_workers: see PhrugalComposer.create_compositions()
+        :param image_filter: which files are images, see find_images()
+        """
+        self.composer = composer
+        self.input_path = Path(input_path)
+        self.output_path = Path(output_path)
+        self.poll_interval = poll_interval
+        self.batch_timeout = batch_timeout
+        self.max_workers = max_workers
+        self.image_filter = image_filter
+        self.poller = DirectoryPoller(self.input_path, image_filter)
+        self.batch_count = 0
+        # new images and their arrival times
+        self._pending: list[tuple[Path, float]] = []
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        """Compose the existing images, then watch the input until stop() is called."""
+        if self.composer.metadata_cache_path is None:
+            # EXIF data of images in padded groups is needed again in a later batch
+            self.composer.metadata_cache_path = Path(SqliteCache.IN_MEMORY)
+        self.composer.open_caches()
+        try:
+            self.start()
+            logger.info(f"watching {self.input_path} for new images...")
+            while not self._stop.wait(self.poll_interval):
+                self.poll_once()
+        finally:
+            self.composer.close_caches()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def start(self) -> None:
+        """Compose the images that are in the input directory already."""
+        self.poller.scan()
+        self.composer.discover_images(self.input_path, self.image_filter)
+        self._compose()
+
+    def poll_once(self, now: float | None = None) -> bool:
+        """Look for new images and compose them if a batch is complete.
+
+        :param now: current time as returned by time.monotonic()
+        :return: True if a batch was composed
+        """
+        now = time.monotonic() if now is None else now
+        new_images = self.poller.poll()
+        if new_images:
+            logger.info(f"found {len(new_images)} new image(s)")
+        self._pending.extend((image, now) for image in new_images)
+
+        batch_len = self._get_batch_len(now)
+        if not batch_len:
+            return False
+        del self._pending[:batch_len]
+        pending = {image for image, __ in self._pending}
+        inputs = self.poller.known_files - pending
+        self._compose(inputs)
+        return True
+
+    def _get_batch_len(self, now: float) -> int:
+        if not self._pending:
+            return 0
+        oldest_arrival = self._pending[0][1]
+        if now - oldest_arrival >= self.batch_timeout:
+            return len(self._pending)
+        image_count = self.composer.decoration_config.get_image_count()
+        return len(self._pending) // image_count * image_count
+
+    def _compose(self, inputs: set[Path] | None = None) -> None:
+        """Compose a batch.
+
+        :param inputs: all images that are complete by now, only the ones that are new to
+                       the composer are probed. If None, the input files are kept.
+        """
+        self.batch_count += 1
+        try:
+            if inputs is not None:
+                current = set(self.composer.input_files or ())
+                self.composer.update_input_files(
+                    sorted(inputs - current), current - inputs
+                )
+            self.composer.create_compositions(
+                self.output_path, max_workers=self.max_workers, incremental=True
+            )
+        except Exception as e:
+            # the images are tried again with the next batch, they are not in the manifest
+            logger.error(f"failed to compose batch {self.batch_count}: {e!r}")
@@ -5,6 +5,7 @@ from tempfile import TemporaryDirectory
 from unittest import TestCase
 
 from phrugal.decorated_image import DecoratedPhrugalImage
+from phrugal.decoration_config import DecorationConfig
 from phrugal.image import PhrugalImage
 
 
@@ -29,6 +30,19 @@ class TestBorderDecorator(TestCase):
         base_img = PhrugalImage(self.img_path_portrait_extreme)
         __ = DecoratedPhrugalImage(base_img)
 
+    def test_get_decorated_image(self):
+        config = DecorationConfig()
+        config.load_default_config()
+        base_img = PhrugalImage(self.img_path_portrait_regular)
+        decorator = DecoratedPhrugalImage(base_img, decoration_config=config)
+        first = decorator.get_decorated_image()
+        # the base image is not rotated in place, so it can be decorated again
+        self.assertEqual((400, 600), base_img.image_dims)
+        self.assertEqual((400, 600), base_img.pillow_image.size)
+        second = decorator.get_decorated_image()
+        self.assertEqual(decorator.get_padded_dimensions(), first.size)
+        self.assertEqual(first.tobytes(), second.tobytes())
+
     def test_get_padded_dimensions(self):
         base_images = [
             self.img_path_square,
@@ -0,0 +1,102 @@
+import os
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from phrugal.cache import MetadataCache
+from phrugal.decoration_config import DecorationConfig
+from phrugal.exif import PhrugalExifData
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        self.test_images = sorted(
+            Path(f"{current_dir}/img/exif-data-testdata").glob("*.jpg")
+        )
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.temp_path = Path(self._temp_dir.name)
+        self.db_path = self.temp_path / "metadata.sqlite"
+        config = DecorationConfig()
+        config.load_default_config()
+        self.tag_names = config.get_required_exif_tags()
+
+    def tearDown(self):
+        PhrugalExifData.METADATA_CACHE = None
+        self._temp_dir.cleanup()
+
+    def _get_all_items(self, exif: PhrugalExifData) -> list:
+        return [
+            exif.get_focal_length(),
+            exif.get_aperture(),
+            exif.get_shutter_speed(),
+            exif.get_iso(),
+            exif.get_description(),
+            exif.get_image_xp_title(),
+            exif.get_image_xp_description(),
+            exif.get_timestamp(),
+            exif.get_gps_coordinates(),
+            exif.get_camera_model(),
+            exif.get_lens_model(),
+        ]
+
+    def test_required_tags(self):
+        self.assertIn("EXIF FocalLength", self.tag_names)
+        self.assertIn("GPS GPSLatitude", self.tag_names)
+        self.assertNotIn("Image Model", self.tag_names)
+
+    def test_cached_values_are_equal(self):
+        all_tags = set().union(*PhrugalExifData.TAGS_BY_ITEM.values())
+        for image in self.test_images:
+            with self.subTest(f"image {image.name}"):
+                expected = self._get_all_items(PhrugalExifData(image))
+
+                PhrugalExifData.METADATA_CACHE = MetadataCache(self.db_path, all_tags)
+                __ = PhrugalExifData(image)  # fill cache
+                from_cache = PhrugalExifData(image)
+                self.assertEqual(1, PhrugalExifData.METADATA_CACHE.hits)
+                PhrugalExifData.METADATA_CACHE.close()
+                PhrugalExifData.METADATA_CACHE = None
+
+                self.assertListEqual(expected, self._get_all_items(from_cache))
+
+    def test_persistent(self):
+        cache = MetadataCache(self.db_path, self.tag_names)
+        exif = PhrugalExifData(self.test_images[0])
+        cache.put(self.test_images[0], exif.exif_data)
+        cache.close()
+
+        cache = MetadataCache(self.db_path, self.tag_names)
+        self.assertIsNotNone(cache.get(self.test_images[0]))
+        self.assertIsNone(cache.get(self.test_images[1]))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertEqual(
+            "metadata cache: 1 hits, 1 misses (50% hit rate)", cache.get_statistics()
+        )
+        cache.close()
+
+    def test_invalidate_on_change(self):
+        image = self.temp_path / "image.jpg"
+        shutil.copy(self.test_images[0], image)
+        cache = MetadataCache(self.db_path, self.tag_names)
+        cache.put(image, PhrugalExifData(image).exif_data)
+        self.assertIsNotNone(cache.get(image))
+
+        stat = os.stat(image)
+        os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertIsNone(cache.get(image))
+        cache.close()
+
+    def test_invalidate_on_new_tags(self):
+        cache = MetadataCache(self.db_path, ["EXIF FocalLength"])
+        cache.put(self.test_images[0], PhrugalExifData(self.test_images[0]).exif_data)
+        cache.close()
+
+        cache = MetadataCache(self.db_path, ["EXIF FocalLength", "Image Model"])
+        self.assertIsNone(cache.get(self.test_images[0]))
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
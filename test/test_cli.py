@@ -1,13 +1,18 @@
 import argparse
 import contextlib
+import io
 import json
 import os
 import shutil
+import subprocess
+import sys
 import tempfile
 from pathlib import Path
 from unittest import mock, TestCase
 
-from phrugal.cli import run_cli
+from phrugal.cli import _get_parser, run_cli
+from phrugal.decoration_config import DecorationConfig
+from phrugal.watch import PhrugalWatcher
 
 
 @contextlib.contextmanager
@@ -62,3 +67,92 @@ class TestCli(TestCase):
                 content = json.load(fp)
                 expected_subset = {"top_left": {"description": {}}}
                 self.assertDictEqual(content, content | expected_subset)
+
+    def test_watch_arguments(self):
+        parser = _get_parser()
+        defaults = vars(parser.parse_args([]))
+        for arguments, expected in [
+            (["-i", "in", "-o", "out", "-j", "2", "watch"], ("in", "out", 2)),
+            (["watch", "-i", "in", "-o", "out", "-j", "2"], ("in", "out", 2)),
+            (["-i", "in", "watch", "-o", "out"], ("in", "out", 1)),
+            (["-i", "in", "watch", "-i", "other"], ("other", None, 1)),
+        ]:
+            with self.subTest(" ".join(arguments)):
+                args = parser.parse_args(arguments)
+                self.assertEqual("watch", args.command)
+                self.assertTupleEqual(
+                    expected, (args.input_dir, args.output_dir, args.jobs)
+                )
+                # the defaults are the same as without the subcommand
+                for name, default in defaults.items():
+                    if name not in ("command", "input_dir", "output_dir", "jobs"):
+                        self.assertEqual(default, getattr(args, name), msg=name)
+                self.assertEqual(
+                    PhrugalWatcher.DEFAULT_POLL_INTERVAL_SECONDS, args.poll_interval
+                )
+        self.assertListEqual([], defaults["include"])
+        self.assertIsNone(defaults["progressive"])
+        self.assertEqual("aspect_ratio", defaults["grouping"])
+
+
+class TestLazyImports(TestCase):
+    HEAVY_MODULES = ["PIL", "exifread", "geopy", "phrugal._version"]
+
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tempdir)
+
+    def _get_imported(self, code: str) -> list[str]:
+        """Run the code in a fresh interpreter, return the heavy modules it imported."""
+        code = (
+            "import json, sys\n"
+            + code
+            + f"\nprint(json.dumps([m for m in {self.HEAVY_MODULES!r} if m in sys.modules]))"
+        )
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent.parent,
+        )
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def test_import_cli(self):
+        self.assertListEqual([], self._get_imported("import phrugal.cli"))
+
+    def test_version_only_if_given(self):
+        # computing the version runs git
+        code = "import phrugal.cli\nphrugal.cli._get_parser().parse_args([])"
+        self.assertNotIn("phrugal._version", self._get_imported(code))
+        with mock.patch("sys.stdout", new=io.StringIO()) as stdout:
+            with self.assertRaises(SystemExit):
+                _get_parser().parse_args(["--version"])
+        self.assertRegex(stdout.getvalue(), r"^phrugal \S+\n$")
+
+    def test_geopy_only_for_geocode_item(self):
+        code = (
+            "from pathlib import Path\n"
+            "from tempfile import TemporaryDirectory\n"
+            "from phrugal.composer import PhrugalComposer\n"
+            "from phrugal.decoration_config import DecorationConfig\n"
+            "config = DecorationConfig()\n"
+            "config.load_from_file({config!r})\n"
+            "images = sorted(Path('test/img/exif-data-testdata').glob('*.jpg'))[:2]\n"
+            "with TemporaryDirectory() as temp_dir:\n"
+            "    composer = PhrugalComposer(config, input_files=images)\n"
+            "    composer.create_compositions(temp_dir, max_workers=1)\n"
+        )
+        config = DecorationConfig.DEFAULT_CONFIG | {"top_right": {"timestamp": {}}}
+        config_file = Path(self.tempdir) / "no-geocode.json"
+        with open(config_file, "w") as fp:
+            json.dump(config, fp)
+        imported = self._get_imported(code.format(config=str(config_file)))
+        self.assertListEqual(["PIL", "exifread"], imported)
@@ -1,11 +1,23 @@
 import os
 import platform
+import re
+import shutil
 import unittest
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from unittest import mock
 
-from phrugal.composer import PhrugalComposer
+import PIL.Image
+
+from phrugal.composer import PaddingStrategy, PhrugalComposer
+from phrugal.composition import ImageComposition
+from phrugal.decorated_image import DecoratedPhrugalImage
 from phrugal.decoration_config import DecorationConfig
+from phrugal.exif import PhrugalExifData, _read_exif_file
+from phrugal.grouping import GroupingStrategy
+from phrugal.image import ImageInfo
+from phrugal.metrics import Metrics
+from phrugal.probe import probe_images
 
 
 def platform_is_windows() -> bool:
@@ -55,7 +67,264 @@ class TestPhrugalComposer(unittest.TestCase):
             with self.subTest(f"check expected {exp_input}"):
                 self.assertIn(exp_input, found_input_files)
 
+    def test_input_files_as_str(self):
+        images = sorted(str(p) for p in self.test_data_path.glob("*.jpg"))
+        composer = PhrugalComposer(self.deco_config, input_files=images)
+        self.assertListEqual([Path(p) for p in images], composer.input_files)
+        with mock.patch(
+            "phrugal.composer.probe_images", wraps=probe_images
+        ) as probe_mock:
+            composer.create_compositions(output_path=self.temp_path)
+            composer.create_compositions(output_path=self.temp_path)
+            # as watch mode does, assign the same files again
+            composer.input_files = images
+            composer.create_compositions(output_path=self.temp_path)
+        probe_mock.assert_called_once()
+
     def test_create_composition(self):
         composer = PhrugalComposer(decoration_config=self.deco_config)
         composer.discover_images(self.test_data_path)
         composer.create_compositions(output_path=self.temp_path)
+
+    def test_create_composition_grouping(self):
+        for strategy in GroupingStrategy:
+            with self.subTest(strategy):
+                out_path = self.temp_path / strategy
+                out_path.mkdir()
+                composer = PhrugalComposer(
+                    decoration_config=self.deco_config, grouping_strategy=strategy
+                )
+                composer.discover_images(self.test_data_path)
+                composer.create_compositions(
+                    output_path=out_path, padding_strategy=PaddingStrategy.PLACEHOLDER
+                )
+                self.assertListEqual([], composer.failed_groups)
+                # 10 images in groups of 4, the last group is padded with placeholders
+                groups = composer._image_groups
+                self.assertListEqual([4, 4, 4], [len(g) for g in groups])
+                sources = [s for g in groups for s in composer._get_sources(g)]
+                self.assertCountEqual(composer.input_files + [None] * 2, sources)
+                self.assertEqual(3, len(list(out_path.glob("*.jpg"))))
+                self.assertEqual(3, len(composer.wasted_area))
+                # half of the last composition are placeholders
+                self.assertGreater(composer.wasted_area[-1], 0.5)
+
+    def test_padding_full_last_group(self):
+        # as before the grouping strategies, a full last group is followed by a group
+        # of padding images
+        images = sorted(self.test_data_path.glob("*.jpg"))[:8]
+        for strategy in PaddingStrategy:
+            with self.subTest(strategy):
+                out_path = self.temp_path / strategy
+                out_path.mkdir()
+                composer = PhrugalComposer(self.deco_config, input_files=images)
+                composer.create_compositions(out_path, padding_strategy=strategy)
+                expected = 2 if strategy == PaddingStrategy.UPSCALE else 3
+                self.assertEqual(expected, len(composer._image_groups))
+                self.assertEqual(expected, len(list(out_path.glob("*.jpg"))))
+                if strategy == PaddingStrategy.PLACEHOLDER:
+                    last_group = composer._get_sources(composer._image_groups[-1])
+                    self.assertTupleEqual((None,) * 4, last_group)
+
+    def test_create_composition_duplicates(self):
+        single_path = self.temp_path / "single"
+        single_path.mkdir()
+        shutil.copy(self.test_data_path / "300x450.jpg", single_path)
+        for input_path, workers in [
+            (self.test_data_path, 1),
+            (single_path, 1),
+            (single_path, 2),
+        ]:
+            with self.subTest(f"{input_path.name}, {workers} workers"):
+                Metrics.reset()
+                composer = PhrugalComposer(decoration_config=self.deco_config)
+                composer.discover_images(input_path)
+                composer.create_compositions(
+                    output_path=self.temp_path,
+                    padding_strategy=PaddingStrategy.DUPLICATE,
+                    max_workers=workers,
+                )
+                self.assertListEqual([], composer.failed_groups)
+                # an input file is decorated once per group, its duplicates in the
+                # group are reused
+                groups = [composer._get_sources(g) for g in composer._image_groups]
+                decorated = sum(len(set(g)) for g in groups)
+                self.assertEqual(decorated, Metrics.STAGES["decorate"].calls)
+                hits, __ = Metrics.CACHES.get("render cache", (0, 0))
+                self.assertEqual(sum(len(g) for g in groups) - decorated, hits)
+        self.assertEqual((1, 4), (decorated, sum(len(g) for g in groups)))
+        Metrics.reset()
+
+    def test_estimate_memory_duplicates(self):
+        image = ImageInfo(Path("a.jpg"), (4000, 3000))
+        others = [ImageInfo(Path(f"{i}.jpg"), (4000, 3000)) for i in range(3)]
+        duplicates = ImageComposition([image] * 4, target_aspect_ratio=4 / 3)
+        distinct = ImageComposition([image] + others, target_aspect_ratio=4 / 3)
+        # the decorated image is kept for its other uses in the group
+        decorated_x, decorated_y = DecoratedPhrugalImage(
+            image, target_aspect_ratio=4 / 3
+        ).get_padded_dimensions()
+        self.assertEqual(
+            distinct.estimate_memory() + 3 * decorated_x * decorated_y,
+            duplicates.estimate_memory(),
+        )
+
+    def test_create_composition_print_size(self):
+        composer = PhrugalComposer(
+            decoration_config=self.deco_config, print_size_mm=50.8, print_dpi=100
+        )
+        self.assertEqual(200, composer.output_long_side)
+        composer.discover_images(self.test_data_path)
+        composer.create_compositions(output_path=self.temp_path)
+
+        for composition_file in self.temp_path.glob("*.jpg"):
+            with self.subTest(f"composition {composition_file.name}"):
+                with PIL.Image.open(composition_file) as composition:
+                    self.assertEqual(200, max(composition.size))
+
+    def test_create_composition_metadata_cache(self):
+        cache_file = self.temp_path / "cache.sqlite"
+        for run, workers in enumerate([1, 2]):
+            composer = PhrugalComposer(
+                decoration_config=self.deco_config, metadata_cache=cache_file
+            )
+            composer.discover_images(self.test_data_path)
+            with self.assertLogs("phrugal.composer") as logs:
+                composer.create_compositions(
+                    output_path=self.temp_path, max_workers=workers
+                )
+            self.assertIsNone(PhrugalExifData.METADATA_CACHE)
+            cache_statistics = [x for x in logs.output if "metadata cache" in x]
+            misses = int(re.search(r"(\d+) misses", cache_statistics[0]).group(1))
+            # every image is parsed in the first run (the geocode prefetch may parse an
+            # image at the same time as the rendering), never in the second
+            if run:
+                self.assertEqual(0, misses)
+            else:
+                self.assertGreaterEqual(misses, 9)
+
+    def test_exif_read_once(self):
+        cache_file = self.temp_path / "cache.sqlite"
+        for strategy in [GroupingStrategy.TIME, GroupingStrategy.LOCATION]:
+            with self.subTest(strategy):
+                for run in range(2):
+                    composer = PhrugalComposer(
+                        decoration_config=self.deco_config,
+                        metadata_cache=cache_file,
+                        grouping_strategy=strategy,
+                    )
+                    composer.discover_images(self.test_data_path)
+                    with mock.patch(
+                        "phrugal.exif._read_exif_file", wraps=_read_exif_file
+                    ) as read_mock:
+                        composer.create_compositions(output_path=self.temp_path)
+                    self.assertListEqual([], composer.failed_groups)
+                    # for grouping and decoration at once, later runs use the cache
+                    read_paths = [c.args[0] for c in read_mock.call_args_list]
+                    expected = [] if run else composer.input_files
+                    self.assertCountEqual(expected, read_paths)
+            cache_file.unlink()  # each strategy starts without cached tags
+
+    def test_create_composition_parallel(self):
+        sequential_path = self.temp_path / "sequential"
+        parallel_path = self.temp_path / "parallel"
+        for out_path, workers in [(sequential_path, 1), (parallel_path, 2)]:
+            out_path.mkdir()
+            composer = PhrugalComposer(decoration_config=self.deco_config)
+            composer.discover_images(self.test_data_path)
+            composer.create_compositions(output_path=out_path, max_workers=workers)
+            self.assertListEqual([], composer.failed_groups)
+
+        expected_files = sorted(x.name for x in sequential_path.glob("*.jpg"))
+        actual_files = sorted(x.name for x in parallel_path.glob("*.jpg"))
+        self.assertTrue(expected_files)
+        self.assertListEqual(expected_files, actual_files)
+
+    def test_create_composition_memory_budget(self):
+        composer = PhrugalComposer(
+            decoration_config=self.deco_config, memory_budget_mb=1
+        )
+        composer.discover_images(self.test_data_path)
+        with mock.patch.object(
+            PhrugalComposer,
+            "_exceeds_memory_budget",
+            autospec=True,
+            side_effect=PhrugalComposer._exceeds_memory_budget,
+        ) as budget_check:
+            composer.create_compositions(output_path=self.temp_path, max_workers=2)
+        self.assertListEqual([], composer.failed_groups)
+        self.assertEqual(
+            len(composer._image_groups), len(list(self.temp_path.glob("*.jpg")))
+        )
+        # every group needs more than 1 MB, so each one waits for the previous one
+        for call in budget_check.call_args_list:
+            __, in_flight, memory = call.args
+            self.assertLessEqual(len(in_flight), 1)
+            self.assertGreater(memory, 1024 * 1024)
+
+    def test_create_composition_failed_group(self):
+        composer = PhrugalComposer(decoration_config=self.deco_config)
+        composer.discover_images(self.test_data_path)
+        original_save = ImageComposition.save
+
+        def fail_for_first_group(composition, filename, settings=None):
+            if filename.name == "img-0.jpg":
+                raise OSError("disk full")
+            original_save(composition, filename, settings)
+
+        with mock.patch.object(
+            ImageComposition, "save", staticmethod(fail_for_first_group)
+        ):
+            composer.create_compositions(output_path=self.temp_path)
+
+        self.assertListEqual([0], composer.failed_groups)
+        self.assertFalse((self.temp_path / "img-0.jpg").exists())
+        self.assertTrue((self.temp_path / "img-1.jpg").exists())
+
+    def test_create_composition_missing_file(self):
+        for workers in [1, 2]:
+            with self.subTest(f"{workers} workers"):
+                input_path = self.temp_path / f"input-{workers}"
+                output_path = self.temp_path / f"output-{workers}"
+                shutil.copytree(self.test_data_path, input_path)
+                output_path.mkdir()
+
+                composer = PhrugalComposer(decoration_config=self.deco_config)
+                composer.discover_images(input_path)
+                missing_image = input_path / "600x400.jpg"
+                missing_image.unlink()  # e.g. removed while the images are grouped
+                composer.create_compositions(
+                    output_path=output_path, max_workers=workers
+                )
+
+                failed_groups = [
+                    idx
+                    for idx, group in enumerate(composer._image_groups)
+                    if missing_image in [img.file_name for img in group]
+                ]
+                self.assertEqual(1, len(failed_groups))
+                self.assertListEqual(failed_groups, composer.failed_groups)
+                written = len(list(output_path.glob("*.jpg")))
+                self.assertEqual(len(composer._image_groups) - 1, written)
+
+    def test_create_composition_failed_decode(self):
+        input_path = self.temp_path / "input"
+        output_path = self.temp_path / "output"
+        shutil.copytree(self.test_data_path, input_path)
+        output_path.mkdir()
+        broken_image = input_path / "600x400.jpg"
+        broken_image.write_bytes(broken_image.read_bytes()[:1000])  # header only
+
+        composer = PhrugalComposer(decoration_config=self.deco_config)
+        composer.discover_images(input_path)
+        composer.create_compositions(output_path=output_path)
+
+        failed_groups = [
+            idx
+            for idx, group in enumerate(composer._image_groups)
+            if broken_image in [img.file_name for img in group]
+        ]
+        self.assertTrue(failed_groups)
+        self.assertListEqual(failed_groups, sorted(composer.failed_groups))
+        written = len(list(output_path.glob("*.jpg")))
+        self.assertEqual(len(composer._image_groups) - len(failed_groups), written)
@@ -1,6 +1,9 @@
 import unittest
 
+import PIL.Image
+
 from phrugal.decorated_image import (
+    DecoratedImageCache,
     add_dimensions,
     subtract_dimensions,
     scale_dimensions,
@@ -30,3 +33,38 @@ class TestDimensionHelpers(unittest.TestCase):
         dim_a = 10, 2
         scale = -0.5
         self.assertEqual((-5, -1), scale_dimensions(dim_a, scale))
+
+
+class TestDecoratedImageCache(unittest.TestCase):
+    def setUp(self):
+        self.image = PIL.Image.new("RGB", (10, 10))
+        self.image_bytes = DecoratedImageCache.BYTES_PER_PIXEL * 10 * 10
+
+    def test_get_and_put(self):
+        cache = DecoratedImageCache({"a.jpg": 3, "b.jpg": 1})
+        key = ("a.jpg", 4 / 3)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, self.image)
+        self.assertIn(key, cache)
+        self.assertIs(self.image, cache.get(key))
+        # the last use removes the image
+        self.assertIs(self.image, cache.get(key))
+        self.assertNotIn(key, cache)
+        # images that are used once are not kept
+        other_key = ("b.jpg", 4 / 3)
+        self.assertIsNone(cache.get(other_key))
+        cache.put(other_key, self.image)
+        self.assertNotIn(other_key, cache)
+
+    def test_max_bytes(self):
+        cache = DecoratedImageCache(
+            {"a.jpg": 2, "b.jpg": 2}, max_bytes=self.image_bytes
+        )
+        cache.put(("a.jpg",), self.image)
+        cache.put(("b.jpg",), self.image)
+        # the oldest image is dropped
+        self.assertNotIn(("a.jpg",), cache)
+        self.assertIn(("b.jpg",), cache)
+        cache = DecoratedImageCache({"a.jpg": 2}, max_bytes=self.image_bytes - 1)
+        cache.put(("a.jpg",), self.image)
+        self.assertNotIn(("a.jpg",), cache)
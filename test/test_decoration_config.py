@@ -1,9 +1,12 @@
 import json
 import os
+import pickle
 import tempfile
 import unittest
+from pathlib import Path
 
 from phrugal.decoration_config import DecorationConfig
+from phrugal.exif import PhrugalExifData
 
 
 class TestDecorationConfig(unittest.TestCase):
@@ -41,7 +44,6 @@ class TestDecorationConfig(unittest.TestCase):
         dc.load_from_file(tf.name)
         self.assertDictEqual(test_config, dc._config)
 
-
     def test_write_default_config(self):
         tf = tempfile.NamedTemporaryFile(mode="w+t", delete=False)
         self.tempfiles.append(tf)
@@ -49,12 +51,54 @@ class TestDecorationConfig(unittest.TestCase):
         dc.write_default_config(tf.name)
         tf.close()
 
-
         with open(tf.name) as def_config_fp:
             actual = json.load(def_config_fp)
             expected_subset = {"top_left": {"description": {}}}
             self.assertDictEqual(actual, actual | expected_subset)
 
+    def _write_temp_config(self, config: dict) -> str:
+        tf = tempfile.NamedTemporaryFile(mode="w+t", delete=False)
+        self.tempfiles.append(tf)
+        tf.write(json.dumps(config))
+        tf.close()
+        return tf.name
+
+    def test_plan(self):
+        config = {
+            "bottom_left": {"focal_length": {}, "aperture": {}},
+            "top_right": {"timestamp": {"format": "%Y"}},
+        }
+        dc = DecorationConfig(item_separator=" / ")
+        dc.load_from_file(self._write_temp_config(config))
+        image_path = Path(os.path.dirname(__file__)) / "img" / "exif-data-testdata"
+        exif = PhrugalExifData(next(image_path.glob("20240729_0027*.jpg")))
+
+        plan = pickle.loads(pickle.dumps(dc.plan))
+        self.assertEqual(dc.plan, plan)
+        self.assertListEqual(["24mm / f/4.0", "", "", "2024"], plan.get_strings(exif))
+        self.assertEqual("2024", plan.get_string_at_corner(exif, "top_right"))
+        self.assertEqual("24mm / f/4.0", dc.get_string_at_corner(exif, "bottom_left"))
+        self.assertSetEqual(
+            {"EXIF FocalLength", "EXIF ApertureValue", "EXIF DateTimeOriginal"},
+            dc.get_required_exif_tags(),
+        )
+        with self.assertRaises(ValueError):
+            plan.get_string_at_corner(exif, "center")
+
+    def test_plan_invalid_config(self):
+        configs = [
+            {"top_left": {"foo": {}}},
+            {"top_left": {"iso": {"unknown_param": 1}}},
+            {"top_left": {"timestamp": {"format": "%Y", "zoom": 3}}},
+        ]
+        for config in configs:
+            with self.subTest(str(config)):
+                dc = DecorationConfig()
+                dc.load_default_config()
+                with self.assertRaises(ValueError):
+                    dc.load_from_file(self._write_temp_config(config))
+                # the config that was loaded before is kept
+                self.assertEqual(4, dc.get_image_count())
 
 
 if __name__ == "__main__":
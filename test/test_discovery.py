@@ -0,0 +1,141 @@
+import os
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import GeneratorType
+
+from PIL import Image
+
+from phrugal.composer import PhrugalComposer
+from phrugal.decoration_config import DecorationConfig
+from phrugal.discovery import ImageFilter, find_images
+
+
+class TestFindImages(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.root = Path(self._temp_dir.name)
+        for file_name in [
+            "a.jpg",
+            "b.JPG",
+            "c.jpeg",
+            "d.png",
+            "e.tif",
+            "notes.txt",
+            "2024/f.jpg",
+            "2024/drafts/g.jpg",
+            "2024/drafts/deep/h.JPEG",
+            "thumbnails/i.jpg",
+        ]:
+            path = self.root / file_name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"foo")
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _find(self, **filter_params) -> set[str]:
+        found = find_images(self.root, ImageFilter(**filter_params))
+        return {p.relative_to(self.root).as_posix() for p in found}
+
+    def test_default(self):
+        self.assertSetEqual(
+            {
+                "a.jpg",
+                "b.JPG",
+                "c.jpeg",
+                "d.png",
+                "e.tif",
+                "2024/f.jpg",
+                "2024/drafts/g.jpg",
+                "2024/drafts/deep/h.JPEG",
+                "thumbnails/i.jpg",
+            },
+            self._find(),
+        )
+
+    def test_extensions(self):
+        for extensions in [["jpg", "JPEG"], [".JPG", ".jpeg"]]:
+            with self.subTest(extensions):
+                self.assertSetEqual(
+                    {
+                        "a.jpg",
+                        "b.JPG",
+                        "c.jpeg",
+                        "2024/f.jpg",
+                        "2024/drafts/g.jpg",
+                        "2024/drafts/deep/h.JPEG",
+                        "thumbnails/i.jpg",
+                    },
+                    self._find(extensions=extensions),
+                )
+
+    def test_include_exclude(self):
+        self.assertSetEqual(
+            {"2024/f.jpg", "2024/drafts/g.jpg", "2024/drafts/deep/h.JPEG"},
+            self._find(include=["2024/*"]),
+        )
+        self.assertSetEqual(
+            {"a.jpg", "b.JPG", "c.jpeg", "2024/f.jpg"},
+            self._find(exclude=["drafts", "thumbnails", "*.png", "*.tif"]),
+        )
+        self.assertSetEqual(
+            {"2024/f.jpg"},
+            self._find(include=["2024/*"], exclude=["2024/drafts"]),
+        )
+
+    def test_max_depth(self):
+        self.assertSetEqual(
+            {"a.jpg", "b.JPG", "c.jpeg", "d.png", "e.tif"}, self._find(max_depth=0)
+        )
+        self.assertSetEqual(
+            {"2024/f.jpg", "2024/drafts/g.jpg"},
+            self._find(max_depth=2, include=["2024/*"]),
+        )
+
+    def test_stream(self):
+        found = find_images(self.root)
+        self.assertIsInstance(found, GeneratorType)
+        self.assertIsInstance(next(found), Path)
+        found.close()  # stops the search
+
+    def test_missing_directory(self):
+        with self.assertLogs("phrugal.discovery", level="WARNING"):
+            self.assertListEqual([], list(find_images(self.root / "missing")))
+
+
+class TestDiscoverImages(unittest.TestCase):
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        self.test_images = sorted(Path(f"{current_dir}/img/aspect-ratio").glob("*.jpg"))
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.input_path = Path(self._temp_dir.name) / "input"
+        self.output_path = Path(self._temp_dir.name) / "output"
+        self.input_path.mkdir()
+        self.output_path.mkdir()
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_formats(self):
+        for image, file_name in zip(
+            self.test_images, ["a.jpg", "b.JPG", "c.png", "d.tiff", "e.webp"]
+        ):
+            with Image.open(image) as img:
+                img.save(self.input_path / file_name)
+
+        deco_config = DecorationConfig()
+        deco_config.load_default_config()
+        composer = PhrugalComposer(decoration_config=deco_config)
+        composer.discover_images(self.input_path)
+        self.assertListEqual(
+            ["a.jpg", "b.JPG", "c.png", "d.tiff", "e.webp"],
+            [p.name for p in composer.input_files],
+        )
+        composer.create_compositions(output_path=self.output_path)
+        self.assertListEqual([], composer.failed_groups)
+        self.assertTrue(list(self.output_path.glob("img-*.jpg")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,17 @@
 import os
+import pickle
 import unittest
 from datetime import datetime
 from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
 
 import phrugal.exif
 import phrugal.image
+from phrugal.cache import MetadataCache
+from phrugal.exif import PhrugalExifData
+from phrugal.geocode import Geocoder
+from phrugal.nominatim_stub import NominatimStub, load_fixture
 
 
 class TestPhrugal(unittest.TestCase):
@@ -99,7 +106,27 @@ class TestPhrugal(unittest.TestCase):
                 )
                 self.assertEqual(expected, actual)
 
+    def test_get_gps_decimal(self):
+        input_and_expected = [
+            ("0027", (45.798339, 24.151193)),
+            ("0095", None),
+        ]
+        for img, expected in input_and_expected:
+            with self.subTest(f"image: {img}"):
+                instance = self._get_specific_img_instance(img)
+                actual = instance.get_gps_decimal()
+                if expected is None:
+                    self.assertIsNone(actual)
+                else:
+                    self.assertAlmostEqual(expected[0], actual[0], places=6)
+                    self.assertAlmostEqual(expected[1], actual[1], places=6)
+
     def test_get_geocode(self):
+        fixture_path = Path(__file__).parent / "nominatim-fixture.json"
+        stub = NominatimStub(load_fixture(fixture_path)).start()
+        self.addCleanup(stub.stop)
+        Geocoder.set_nominatim_url(stub.url, min_delay_seconds=0.0)
+        self.addCleanup(Geocoder.set_backend, None)
         instance = self._get_specific_img_instance("21.37.27")
 
         zoom_expected = [
@@ -148,3 +175,97 @@ class TestPhrugal(unittest.TestCase):
         actual = instance.get_image_xp_description()
         expected = "Sibiu train station"
         self.assertEqual(expected, actual)
+
+
+class TestExtractMany(unittest.TestCase):
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        self.images = sorted(
+            Path(f"{current_dir}/img/exif-data-testdata").glob("*.jpg")
+        )
+        self.tag_names = {
+            "EXIF FocalLength",
+            "EXIF DateTimeOriginal",
+            "GPS GPSLatitude",
+        }
+
+    def tearDown(self):
+        PhrugalExifData.RECORDS = None
+        PhrugalExifData.METADATA_CACHE = None
+
+    def _assert_same_columns(self, expected, actual):
+        self.assertTupleEqual(expected.paths, actual.paths)
+        for name in self.tag_names:
+            self.assertListEqual(
+                [str(t) for t in expected.column(name)],
+                [str(t) for t in actual.column(name)],
+            )
+
+    def test_records(self):
+        records = PhrugalExifData.extract_many(self.images, self.tag_names, workers=1)
+        self.assertEqual(len(self.images), len(records))
+        self.assertListEqual(sorted(self.tag_names), list(records.columns))
+        focal_lengths = records.column("EXIF FocalLength")
+        self.assertEqual(len(self.images), len(focal_lengths))
+        for image, focal_length in zip(self.images, focal_lengths):
+            with self.subTest(image.name):
+                expected = PhrugalExifData(image)
+                tags = records.get_tags(image)
+                self.assertLessEqual(set(tags), self.tag_names)
+                for name in self.tag_names:
+                    self.assertEqual(
+                        str(expected.exif_data.get(name)), str(tags.get(name))
+                    )
+                self.assertIs(focal_length, tags.get("EXIF FocalLength"))
+        self.assertIsNone(records.get_tags("unknown.jpg"))
+        self._assert_same_columns(records, pickle.loads(pickle.dumps(records)))
+
+    def test_workers(self):
+        expected = PhrugalExifData.extract_many(self.images, self.tag_names, workers=1)
+        with mock.patch.object(PhrugalExifData, "MIN_IMAGES_PER_WORKER", 2):
+            actual = PhrugalExifData.extract_many(
+                self.images, self.tag_names, workers=2
+            )
+        self._assert_same_columns(expected, actual)
+
+    def test_unreadable_files(self):
+        missing = Path("missing.jpg")
+        with self.assertLogs("phrugal.exif", "WARNING"):
+            PhrugalExifData.extract_many([missing], self.tag_names, workers=1)
+        for workers in [1, 2]:
+            with self.subTest(f"{workers} workers"):
+                with mock.patch.object(PhrugalExifData, "MIN_IMAGES_PER_WORKER", 2):
+                    records = PhrugalExifData.extract_many(
+                        [missing] + self.images, self.tag_names, workers=workers
+                    )
+                # the image is left out, it is read again when it is rendered
+                self.assertNotIn(missing, records)
+                self.assertTupleEqual(tuple(self.images), records.paths)
+                self.assertEqual(
+                    len(self.images), len(records.column("EXIF FocalLength"))
+                )
+
+    def test_exif_data_from_records(self):
+        image = next(i for i in self.images if "0027" in i.name)
+        PhrugalExifData.RECORDS = PhrugalExifData.extract_many(
+            [image], self.tag_names, workers=1
+        )
+        with mock.patch("phrugal.exif._read_exif_file") as read_exif_file:
+            exif = PhrugalExifData(image)
+            read_exif_file.assert_not_called()
+        self.assertEqual("24mm", exif.get_focal_length())
+
+    def test_metadata_cache(self):
+        with TemporaryDirectory(prefix="phrugal-test") as temp_dir:
+            cache = MetadataCache(Path(temp_dir) / "metadata.sqlite", self.tag_names)
+            self.addCleanup(cache.close)
+            PhrugalExifData.METADATA_CACHE = cache
+            first = PhrugalExifData.extract_many(self.images, self.tag_names, workers=1)
+            self.assertEqual((0, len(self.images)), (cache.hits, cache.misses))
+            with mock.patch("phrugal.exif._read_exif_file") as read_exif_file:
+                second = PhrugalExifData.extract_many(
+                    self.images, self.tag_names, workers=1
+                )
+                read_exif_file.assert_not_called()
+            self.assertEqual(len(self.images), cache.hits)
+            self._assert_same_columns(first, second)
@@ -0,0 +1,83 @@
+import io
+import os
+import unittest
+from pathlib import Path
+
+import exifread
+
+from phrugal.exif import PhrugalExifData
+from phrugal.exif_reader import TAG_IDS, ExifTagReader, can_read_tags
+
+
+class TestExifTagReader(unittest.TestCase):
+    def setUp(self):
+        self.test_data_path = Path(os.path.dirname(__file__)) / "img"
+        self.images = sorted(self.test_data_path.glob("exif-data-testdata/*.jpg"))
+
+    def test_same_as_exifread(self):
+        for image in self.images:
+            with self.subTest(image.name), open(image, "rb") as fp:
+                expected = exifread.process_file(fp)
+                reader = ExifTagReader(fp, TAG_IDS)
+                actual = reader.read()
+                for name in TAG_IDS:
+                    if name not in expected:
+                        self.assertNotIn(name, actual)
+                        continue
+                    values = expected[name].values
+                    if not isinstance(values, str):
+                        values = list(values)
+                    self.assertEqual(values, actual[name].values, name)
+                    self.assertEqual(str(expected[name]), str(actual[name]), name)
+                self.assertLess(reader.bytes_read, image.stat().st_size)
+
+    def test_stop_early(self):
+        image = next(self.test_data_path.glob("exif-data-testdata/20240729_0027*.jpg"))
+        with open(image, "rb") as fp:
+            all_tags = ExifTagReader(fp, TAG_IDS)
+            all_tags.read()
+            model = ExifTagReader(fp, ["Image Model"])
+            self.assertListEqual(["Image Model"], list(model.read()))
+        self.assertLess(model.bytes_read, all_tags.bytes_read)
+
+    def test_unsupported(self):
+        with open(self.test_data_path / "aspect-ratio" / "base.png", "rb") as fp:
+            self.assertIsNone(ExifTagReader(fp, ["Image Model"]).read())
+        self.assertDictEqual(
+            dict(),
+            ExifTagReader(io.BytesIO(b"\xff\xd8\xff\xd9"), ["Image Model"]).read(),
+        )
+        self.assertFalse(can_read_tags(["EXIF MakerNote"]))
+        with self.assertRaises(ValueError):
+            ExifTagReader(io.BytesIO(), ["EXIF MakerNote"])
+
+    def test_exif_data(self):
+        """The getters give the same results, whether all tags are read or some."""
+        getters = [
+            ("get_focal_length", "focal_length"),
+            ("get_aperture", "aperture"),
+            ("get_shutter_speed", "shutter_speed"),
+            ("get_iso", "iso"),
+            ("get_timestamp", "timestamp"),
+            ("get_gps_coordinates", "gps_coordinates"),
+            ("get_lens_model", "lens_model"),
+        ]
+        required_tags = {
+            tag for __, item in getters for tag in PhrugalExifData.TAGS_BY_ITEM[item]
+        }
+        self.addCleanup(setattr, PhrugalExifData, "REQUIRED_TAGS", None)
+        for image in self.images:
+            with self.subTest(image.name):
+                PhrugalExifData.REQUIRED_TAGS = None
+                expected = PhrugalExifData(image)
+                PhrugalExifData.REQUIRED_TAGS = frozenset(required_tags)
+                actual = PhrugalExifData(image)
+                self.assertLessEqual(set(actual.exif_data), required_tags)
+                for getter, __ in getters:
+                    self.assertEqual(
+                        getattr(expected, getter)(), getattr(actual, getter)(), getter
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
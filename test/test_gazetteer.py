@@ -0,0 +1,186 @@
+import os
+import pickle
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from phrugal.cache import GeocodeCache
+from phrugal.gazetteer import GazetteerBackend, GazetteerIndex
+from phrugal.geocode import Geocoder
+
+GAZETTEER_CONTENT = """lat,lon,city,county,state,country,country_code
+45.79833,24.15120,Sibiu,Sibiu,Sibiu,România,ro
+45.65156,23.92831,Cisnădie,Sibiu,Sibiu,România,ro
+49.79130,9.95340,Würzburg,Würzburg,Bayern,Deutschland,de
+-34.83289,19.99994,"Cape Agulhas, Overberg",Overberg,Western Cape,South Africa,za
+-16.50000,-179.90000,Labasa,,Northern,Fiji,fj
+"""
+
+
+class TestGazetteerBackend(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.gazetteer_path = Path(self._temp_dir.name) / "places.csv"
+        self.gazetteer_path.write_text(GAZETTEER_CONTENT, encoding="utf-8")
+        self.backend = GazetteerBackend(self.gazetteer_path)
+
+    def tearDown(self):
+        self.backend.close()
+        Geocoder.set_backend(None)
+        Geocoder._ADDRESS_CACHE.clear()
+        self._temp_dir.cleanup()
+
+    def test_reverse(self):
+        # fmt: off
+        lat_lon_expected = [
+            (45.80, 24.15, "Sibiu"),
+            (45.66, 23.92, "Cisnădie"),
+            (49.80264, 9.95056, "Würzburg"),
+            (-34.8, 20.1, "Cape Agulhas, Overberg"),
+            (-16.5, 179.95, "Labasa"),  # across the antimeridian
+        ]
+        # fmt: on
+        for lat, lon, expected in lat_lon_expected:
+            with self.subTest(f"{lat}, {lon}"):
+                address = self.backend.reverse(lat, lon, zoom=18)
+                self.assertEqual(expected, address["city"])
+
+    def test_reverse_too_far(self):
+        self.assertIsNone(self.backend.reverse(0.0, 0.0, zoom=18))
+
+    def test_reverse_zoom(self):
+        self.assertDictEqual(
+            {"country": "Deutschland", "country_code": "de"},
+            self.backend.reverse(49.8, 9.9, zoom=3),
+        )
+        self.assertDictEqual(
+            {
+                "city": "Würzburg",
+                "county": "Würzburg",
+                "state": "Bayern",
+                "country": "Deutschland",
+                "country_code": "de",
+            },
+            self.backend.reverse(49.8, 9.9, zoom=12),
+        )
+
+    def test_index_reused(self):
+        self.backend.reverse(49.8, 9.9, zoom=12)
+        index_path = self.backend.index.index_path
+        index_mtime = os.stat(index_path).st_mtime_ns
+
+        other_backend = GazetteerBackend(self.gazetteer_path)
+        self.assertEqual("Sibiu", other_backend.reverse(45.8, 24.15, zoom=12)["city"])
+        other_backend.close()
+        self.assertEqual(index_mtime, os.stat(index_path).st_mtime_ns)
+
+    def test_index_rebuilt_on_change(self):
+        self.backend.reverse(49.8, 9.9, zoom=12)
+        self.backend.close()
+        with open(self.gazetteer_path, "a", encoding="utf-8") as fp:
+            fp.write("49.80000,9.90000,Zell,Würzburg,Bayern,Deutschland,de\n")
+
+        backend = GazetteerBackend(self.gazetteer_path)
+        self.assertEqual("Zell", backend.reverse(49.8, 9.9, zoom=12)["city"])
+        backend.close()
+
+    def test_index_built_once(self):
+        original_build = GazetteerIndex.build
+        builds = []
+        started = threading.Event()
+
+        def slow_build(index, source_path, locations):
+            builds.append(source_path)
+            started.set()
+            time.sleep(0.1)  # the other threads ask for locations meanwhile
+            original_build(index, source_path, locations)
+
+        with mock.patch.object(GazetteerIndex, "build", slow_build):
+            with ThreadPoolExecutor(4) as executor:
+                addresses = list(
+                    executor.map(
+                        lambda __: self.backend.reverse(45.8, 24.15, zoom=12),
+                        range(8),
+                    )
+                )
+        self.assertTrue(started.is_set())
+        self.assertEqual(1, len(builds))
+        self.assertListEqual(["Sibiu"] * 8, [a["city"] for a in addresses])
+        # the index is written to a temporary file, which replaces the index at once
+        index_path = self.backend.index.index_path
+        self.assertListEqual(
+            sorted([index_path.name, self.gazetteer_path.name]),
+            sorted(p.name for p in index_path.parent.iterdir()),
+        )
+
+    def test_malformed_rows(self):
+        with open(self.gazetteer_path, "a", encoding="utf-8") as fp:
+            fp.write(",9.90000,No latitude,,,,\n")
+            fp.write("north,9.90000,Text,,,,\n")
+            fp.write("nan,9.90000,Not a number,,,,\n")
+        with self.assertLogs("phrugal.gazetteer", "WARNING") as logs:
+            address = self.backend.reverse(49.8, 9.9, zoom=12)
+        self.assertEqual("Würzburg", address["city"])
+        self.assertEqual(3, len(logs.records))
+        for line_number, record in zip([7, 8, 9], logs.records):
+            self.assertIn(f"line {line_number} ", record.getMessage())
+
+    def test_alternative_columns(self):
+        self.gazetteer_path.write_text(
+            "name;latitude;longitude;city\nfoo;10.0;10.0;Foo\n", encoding="utf-8"
+        )
+        backend = GazetteerBackend(self.gazetteer_path)
+        self.assertDictEqual({"city": "Foo"}, backend.reverse(10.1, 10.1, zoom=18))
+        backend.close()
+
+    def test_pickle(self):
+        self.backend.reverse(49.8, 9.9, zoom=12)
+        backend = pickle.loads(pickle.dumps(self.backend))
+        self.assertEqual("Würzburg", backend.reverse(49.8, 9.9, zoom=12)["city"])
+        backend.close()
+
+    def test_geocoder_with_gazetteer(self):
+        Geocoder.set_backend(self.backend)
+        result = Geocoder().get_location_name(45.798333, 24.1512, zoom=12)
+        self.assertEqual("Sibiu, Sibiu, Sibiu, România", result)
+
+    def test_geocode_cache_per_gazetteer(self):
+        other_path = self.gazetteer_path.with_name("other.csv")
+        other_path.write_text(
+            GAZETTEER_CONTENT.replace("Sibiu,Sibiu,Sibiu", "Hermannstadt,Sibiu,Sibiu"),
+            encoding="utf-8",
+        )
+        db_path = Path(self._temp_dir.name) / "geocode.sqlite"
+        # the second use of each gazetteer file is a hit, switching the file is not
+        for gazetteer_path, edit, expected_city, expected_hits in [
+            (self.gazetteer_path, False, "Sibiu", 0),
+            (self.gazetteer_path, False, "Sibiu", 1),
+            (other_path, False, "Hermannstadt", 0),
+            (self.gazetteer_path, True, "Sibiu-Nord", 0),
+        ]:
+            with self.subTest(f"{gazetteer_path.name}, edited: {edit}"):
+                if edit:
+                    content = GAZETTEER_CONTENT.replace("Sibiu,", "Sibiu-Nord,", 1)
+                    gazetteer_path.write_text(content, encoding="utf-8")
+                Geocoder._ADDRESS_CACHE.clear()  # simulate a new run
+                Geocoder.GEOCODE_CACHE = GeocodeCache(db_path)
+                backend = GazetteerBackend(gazetteer_path)
+                Geocoder.set_backend(backend)
+                try:
+                    result = Geocoder().get_location_name(
+                        45.798333, 24.1512, zoom=12, name_parts=["city"]
+                    )
+                    self.assertEqual(expected_city, result)
+                    self.assertEqual(expected_hits, Geocoder.GEOCODE_CACHE.hits)
+                finally:
+                    backend.close()
+                    Geocoder.GEOCODE_CACHE.close()
+                    Geocoder.GEOCODE_CACHE = None
+
+
+if __name__ == "__main__":
+    unittest.main()
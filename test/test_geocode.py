@@ -1,22 +1,40 @@
 import datetime
+import threading
 import time
 import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
 
 import phrugal.geocode
 from geopy import Point
+from phrugal.cache import GeocodeCache
+from phrugal.nominatim_stub import NominatimStub, load_fixture
+
+FIXTURE_PATH = Path(__file__).parent / "nominatim-fixture.json"
 
 
 class TestGeocode(unittest.TestCase):
+    """Lookups over HTTP, answered by a local stand-in for Nominatim."""
+
+    MIN_DELAY_SECONDS = 0.05
 
     @classmethod
     def setUpClass(cls):
+        cls.stub = NominatimStub(load_fixture(FIXTURE_PATH)).start()
+        phrugal.geocode.Geocoder.set_nominatim_url(
+            cls.stub.url, min_delay_seconds=cls.MIN_DELAY_SECONDS
+        )
         cls.geocoder = phrugal.geocode.Geocoder()
 
+    @classmethod
+    def tearDownClass(cls):
+        phrugal.geocode.Geocoder.set_backend(None)
+        cls.stub.stop()
+
     def setUp(self):
         self.geocoder._CALLS_MADE = 0  # reset count
-
-    def tearDown(self):
-        time.sleep(self.geocoder.MIN_DELAY_SECONDS)  # wait for rate limit expire
+        phrugal.geocode.Geocoder._ADDRESS_CACHE.clear()
 
     def test_get_location_name_cached(self):
         __ = self.geocoder.get_location_name(49.96233, 9.15892, zoom=18)
@@ -35,6 +53,7 @@ class TestGeocode(unittest.TestCase):
 
     def test_get_location_name(self):
         start = datetime.datetime.now()
+        requests_before = self.stub.request_count
 
         result = self.geocoder.get_location_name(45.798333, 24.1512)
         self.assertEqual("Sibiu, Sibiu, România", result)
@@ -70,11 +89,13 @@ class TestGeocode(unittest.TestCase):
         self.assertEqual("Robert-Koch-Straße, Würzburg, Würzburg, Bayern, Deutschland", result)
 
         duration = datetime.datetime.now() - start
+        self.assertEqual(
+            self.geocoder._CALLS_MADE, self.stub.request_count - requests_before
+        )
         self.assertGreater(  # we want to have at least
             duration,
             datetime.timedelta(
-                seconds=self.geocoder.MIN_DELAY_SECONDS
-                * (self.geocoder._CALLS_MADE - 1)
+                seconds=self.MIN_DELAY_SECONDS * (self.geocoder._CALLS_MADE - 1)
             ),
         )
 
@@ -97,3 +118,81 @@ class TestGeocode(unittest.TestCase):
                     "Cape Agulhas Local Municipality, Overberg District Municipality, Western Cape, South Africa",
                     result,
                 )
+
+
+class TestGeocodeCache(unittest.TestCase):
+    ADDRESS = {"road": "Piața Mică", "city": "Sibiu", "country": "România"}
+
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.db_path = Path(self._temp_dir.name) / "geocode.sqlite"
+        phrugal.geocode.Geocoder._ADDRESS_CACHE.clear()
+        patcher = mock.patch.object(
+            phrugal.geocode.Geocoder,
+            "_call_reverse_api",
+            return_value=self.ADDRESS,
+        )
+        self.api_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        phrugal.geocode.Geocoder._ADDRESS_CACHE.clear()
+        phrugal.geocode.Geocoder.GEOCODE_CACHE = None
+        self._temp_dir.cleanup()
+
+    def test_get_precision(self):
+        zoom_expected = [(3, 2), (10, 2), (12, 3), (14, 3), (16, 4), (18, 5)]
+        for zoom, expected in zoom_expected:
+            with self.subTest(f"zoom {zoom}"):
+                actual = phrugal.geocode.Geocoder.get_precision(zoom)
+                self.assertEqual(expected, actual)
+
+    def test_nearby_locations_share_lookup(self):
+        geocoder = phrugal.geocode.Geocoder()
+        for lat, lon in [(45.79831, 24.15121), (45.79829, 24.15118)]:
+            result = geocoder.get_location_name(lat, lon, zoom=16)
+            self.assertEqual("Piața Mică, Sibiu, România", result)
+        self.api_mock.assert_called_once_with(lat=45.7983, lon=24.1512, zoom=16)
+
+        geocoder.get_location_name(45.79831, 24.15121, zoom=16, precision=5)
+        self.assertEqual(2, self.api_mock.call_count)
+
+    def test_shared_between_instances(self):
+        phrugal.geocode.Geocoder().get_location_name(45.798333, 24.1512)
+        phrugal.geocode.Geocoder().get_location_name(45.798333, 24.1512)
+        self.api_mock.assert_called_once()
+
+    def test_concurrent_lookups_share_call(self):
+        def slow_lookup(lat, lon, zoom):
+            time.sleep(0.2)
+            return self.ADDRESS
+
+        self.api_mock.side_effect = slow_lookup
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    phrugal.geocode.Geocoder().get_location_name(45.798333, 24.1512)
+                )
+            )
+            for _ in range(3)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertListEqual(["Piața Mică, Sibiu, România"] * 3, results)
+        self.api_mock.assert_called_once()
+
+    def test_persistent_cache(self):
+        phrugal.geocode.Geocoder.GEOCODE_CACHE = GeocodeCache(self.db_path)
+        phrugal.geocode.Geocoder().get_location_name(45.798333, 24.1512)
+        phrugal.geocode.Geocoder.GEOCODE_CACHE.close()
+
+        phrugal.geocode.Geocoder._ADDRESS_CACHE.clear()  # simulate a new run
+        phrugal.geocode.Geocoder.GEOCODE_CACHE = GeocodeCache(self.db_path)
+        result = phrugal.geocode.Geocoder().get_location_name(45.798333, 24.1512)
+        self.assertEqual("Piața Mică, Sibiu, România", result)
+        self.api_mock.assert_called_once()
+        self.assertEqual(1, phrugal.geocode.Geocoder.GEOCODE_CACHE.hits)
+        phrugal.geocode.Geocoder.GEOCODE_CACHE.close()
@@ -0,0 +1,226 @@
+import itertools
+import os
+import random
+import unittest
+from fractions import Fraction
+from pathlib import Path
+
+from phrugal.exif import PhrugalExifData
+from phrugal.grouping import (
+    GROUPING_TAGS,
+    GroupingStrategy,
+    _get_padded_long_side,
+    _hilbert_index,
+    _split_least_waste,
+    get_wasted_area,
+    group_images,
+)
+from phrugal.image import ImageInfo
+from phrugal.probe import probe_images
+
+
+def get_synthetic_images(count: int, seed: int = 1) -> list[ImageInfo]:
+    """Images of different resolution and orientation, only their headers."""
+    rng = random.Random(seed)
+    images = []
+    for i in range(count):
+        long_side = rng.choice([800, 1600, 3200, 6000])
+        dims = (long_side, long_side * 2 // 3)
+        if rng.random() < 0.3:
+            dims = dims[::-1]
+        images.append(ImageInfo(Path(f"img{i:05d}.jpg"), dims))
+    return images
+
+
+class TestGrouping(unittest.TestCase):
+    def setUp(self):
+        self.target_aspect_ratio = Fraction(4, 3)
+        self.images = get_synthetic_images(50)
+
+    def _get_total_waste(self, groups) -> float:
+        return sum(get_wasted_area(g, self.target_aspect_ratio) for g in groups)
+
+    def _assert_valid_groups(self, images, groups, group_len) -> None:
+        grouped = [img for g in groups for img in g]
+        self.assertCountEqual(images, grouped)
+        self.assertTrue(all(len(g) == group_len for g in groups[:-1]))
+        self.assertLessEqual(len(groups[-1]), group_len)
+
+    def test_group_images(self):
+        for strategy in [
+            GroupingStrategy.ASPECT_RATIO,
+            GroupingStrategy.AREA,
+            GroupingStrategy.ORDER,
+        ]:
+            for group_len in [1, 3, 4, 50, 60]:
+                with self.subTest(f"{strategy}, {group_len} per group"):
+                    groups = group_images(
+                        self.images,
+                        group_len,
+                        strategy,
+                        target_aspect_ratio=self.target_aspect_ratio,
+                    )
+                    self._assert_valid_groups(self.images, groups, group_len)
+                    self.assertEqual(-(-len(self.images) // group_len), len(groups))
+        self.assertListEqual([], group_images([], 4, GroupingStrategy.AREA))
+
+    def test_aspect_ratio_and_order(self):
+        groups = group_images(self.images, 4, GroupingStrategy.ASPECT_RATIO)
+        ratios = [img.aspect_ratio_normalized for g in groups for img in g]
+        self.assertListEqual(sorted(ratios), ratios)
+        groups = group_images(self.images, 4, GroupingStrategy.ORDER)
+        self.assertListEqual(self.images, [img for g in groups for img in g])
+
+    def test_least_waste(self):
+        for output_long_side in [None, 2000]:
+            with self.subTest(f"output long side {output_long_side}"):
+                waste = {
+                    strategy: self._get_total_waste(
+                        group_images(
+                            self.images,
+                            4,
+                            strategy,
+                            self.target_aspect_ratio,
+                            output_long_side,
+                        )
+                    )
+                    for strategy in [
+                        GroupingStrategy.AREA,
+                        GroupingStrategy.ASPECT_RATIO,
+                        GroupingStrategy.ORDER,
+                    ]
+                }
+                self.assertLessEqual(
+                    waste[GroupingStrategy.AREA],
+                    min(waste.values()) + 1e-9,
+                )
+        # without scaling, the small images are upscaled unless they are grouped
+        # with each other
+        self.assertLess(
+            self._get_total_waste(group_images(self.images, 4, GroupingStrategy.AREA)),
+            self._get_total_waste(group_images(self.images, 4, GroupingStrategy.ORDER)),
+        )
+
+    def test_area_and_aspect_ratio(self):
+        # large and small images of two aspect ratios, the count divides evenly
+        images = [
+            ImageInfo(Path(f"{name}-{i}.jpg"), dims)
+            for name, dims in [
+                ("large-4x3", (4000, 3000)),
+                ("small-4x3", (800, 600)),
+                ("large-3x2", (6000, 4000)),
+                ("small-3x2", (900, 600)),
+            ]
+            for i in range(2)
+        ]
+        by_area = group_images(images, 4, GroupingStrategy.AREA)
+        by_aspect_ratio = group_images(images, 4, GroupingStrategy.ASPECT_RATIO)
+        # the small images are not upscaled to the size of the large ones
+        self.assertCountEqual(
+            [{"small"}, {"large"}],
+            [{img.file_name.name.split("-")[0] for img in g} for g in by_area],
+        )
+        self.assertLess(
+            self._get_total_waste(by_area) + 0.3,
+            self._get_total_waste(by_aspect_ratio),
+        )
+
+    def test_swap_images(self):
+        rng = random.Random(1)
+        long_sides = [800, 1600, 2000, 3200, 6000]
+        ratios = [Fraction(1), Fraction(4, 3), Fraction(3, 2), Fraction(3)]
+        swapped = 0
+        for run in range(10):
+            images = []
+            for i in range(8):
+                long_side = rng.choice(long_sides)
+                dims = (long_side, int(long_side / rng.choice(ratios)))
+                images.append(ImageInfo(Path(f"img{i}.jpg"), dims))
+            with self.subTest(f"run {run}"):
+                groups = group_images(images, 4, GroupingStrategy.AREA)
+                sorted_split = _split_least_waste(
+                    images,
+                    4,
+                    lambda g: get_wasted_area(g, self.target_aspect_ratio),
+                    key=lambda img: _get_padded_long_side(
+                        img, self.target_aspect_ratio
+                    ),
+                )
+                waste = self._get_total_waste(groups)
+                self.assertLessEqual(waste, self._get_total_waste(sorted_split) + 1e-9)
+                swapped += waste < self._get_total_waste(sorted_split) - 0.01
+                # close to the best of all ways to split the images in two groups
+                best = min(
+                    self._get_total_waste([first, set(images) - set(first)])
+                    for first in itertools.combinations(images, 4)
+                )
+                self.assertLess(waste, best + 0.005)
+        self.assertGreater(swapped, 0)
+
+    def test_wasted_area(self):
+        big = ImageInfo(Path("big.jpg"), (3000, 2000))
+        small = ImageInfo(Path("small.jpg"), (600, 400))
+        single = get_wasted_area((big,), self.target_aspect_ratio)
+        # the border and the padding from 3:2 to 4:3
+        self.assertGreater(single, 0.1)
+        self.assertLess(single, 0.3)
+        self.assertAlmostEqual(
+            single, get_wasted_area((big, big), self.target_aspect_ratio), places=2
+        )
+        self.assertGreater(
+            get_wasted_area((big, small), self.target_aspect_ratio), single + 0.3
+        )
+        # scaled down, the small image has enough pixels
+        self.assertAlmostEqual(
+            single,
+            get_wasted_area((big, small), self.target_aspect_ratio, 600),
+            places=2,
+        )
+
+    def test_exif_strategies(self):
+        current_dir = os.path.dirname(__file__)
+        paths = sorted(Path(f"{current_dir}/img/exif-data-testdata").glob("*.jpg"))
+        images = probe_images(reversed(paths))
+        for strategy, get_value in [
+            (GroupingStrategy.TIME, lambda exif: exif.get_timestamp()),
+            (GroupingStrategy.LOCATION, lambda exif: exif.get_gps_decimal()),
+        ]:
+            with self.subTest(strategy):
+                records = PhrugalExifData.extract_many(
+                    paths, GROUPING_TAGS[strategy], workers=1
+                )
+                groups = group_images(images, 4, strategy, exif_records=records)
+                self._assert_valid_groups(images, groups, 4)
+                values = [
+                    get_value(
+                        PhrugalExifData.from_tags(
+                            img.file_name, records.get_tags(img.file_name)
+                        )
+                    )
+                    for g in groups
+                    for img in g
+                ]
+                # images without the data go last
+                known = [v for v in values if v is not None]
+                self.assertTrue(known)
+                self.assertListEqual(known, values[: len(known)])
+                if strategy == GroupingStrategy.TIME:
+                    self.assertListEqual(sorted(known), known)
+
+                with self.assertRaises(ValueError):
+                    group_images(images, 4, strategy)
+
+    def test_hilbert_index(self):
+        side = 8
+        cells = {
+            _hilbert_index(side, x, y): (x, y) for x in range(side) for y in range(side)
+        }
+        self.assertListEqual(list(range(side * side)), sorted(cells))
+        # the curve goes from cell to neighbouring cell
+        for index in range(1, side * side):
+            (x0, y0), (x1, y1) = cells[index - 1], cells[index]
+            self.assertEqual(1, abs(x1 - x0) + abs(y1 - y0))
+
+
+if __name__ == "__main__":
+    unittest.main()
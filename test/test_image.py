@@ -0,0 +1,85 @@
+import io
+import mmap
+import os
+import unittest
+from pathlib import Path
+
+from phrugal.decorated_image import DecoratedPhrugalImage
+from phrugal.image import PhrugalImage, mm_to_pixels
+from phrugal.metrics import Metrics
+
+
+class TestPhrugalImage(unittest.TestCase):
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        self.test_data_path = Path(f"{current_dir}/img/aspect-ratio")
+
+    def test_mm_to_pixels(self):
+        self.assertEqual(300, mm_to_pixels(25.4, 300))
+        self.assertEqual(1535, mm_to_pixels(130, 300))
+
+    def test_reduce_on_load(self):
+        # fmt: off
+        min_dims_expected = [
+            ((600, 400), (600, 400)),
+            ((301, 201), (600, 400)),
+            ((300, 200), (300, 200)),
+            ((200, 120), (300, 200)),
+            ((10, 10), (75, 50)),
+        ]
+        # fmt: on
+        for min_dims, expected in min_dims_expected:
+            with self.subTest(f"min dims {min_dims}"):
+                with PhrugalImage(self.test_data_path / "600x400.jpg") as img:
+                    img.reduce_on_load(min_dims)
+                    img.pillow_image.load()
+                    self.assertEqual(expected, img.image_dims)
+
+    def test_reduce_on_load_after_load(self):
+        with PhrugalImage(self.test_data_path / "600x400.jpg") as img:
+            img.pillow_image.load()
+            img.reduce_on_load((10, 10))
+            self.assertEqual((600, 400), img.image_dims)
+
+    def test_single_read(self):
+        """Pixel data and EXIF data come from the same read of the file."""
+        exif_data_path = Path(os.path.dirname(__file__)) / "img/exif-data-testdata"
+        image_path = next(exif_data_path.glob("20240729_0027*.jpg"))
+        Metrics.reset()
+        self.addCleanup(Metrics.reset)
+        with PhrugalImage(image_path) as img:
+            decorated = DecoratedPhrugalImage(img)
+            img.load()
+            self.assertEqual("24mm", decorated.exif.get_focal_length())
+            # every stream starts at the beginning
+            self.assertEqual(img.get_file_data().read(), img.get_file_data().read())
+            self.assertEqual(image_path.read_bytes(), img.get_file_data().read())
+            # the file is mapped, not copied into memory
+            mapping = img.file_data
+            self.assertIsInstance(mapping, mmap.mmap)
+        self.assertIsNone(img.get_file_data())
+        self.assertTrue(mapping.closed)
+
+        stages = Metrics.get_report()["stages"]
+        self.assertEqual(1, stages["read"]["calls"])
+        self.assertEqual(image_path.stat().st_size, stages["read"]["bytes_read"])
+        self.assertEqual(0, stages["exif"]["bytes_read"])
+        self.assertEqual(0, stages["decode"]["bytes_read"])
+
+    def test_file_data_seek(self):
+        image_path = self.test_data_path / "600x400.jpg"
+        size = image_path.stat().st_size
+        with PhrugalImage(image_path) as img:
+            stream = img.get_file_data()
+            self.assertEqual(size - 2, stream.seek(-2, io.SEEK_END))
+            self.assertEqual(b"\xff\xd9", stream.read())  # end of image marker
+            self.assertEqual(b"", stream.read(1))
+            self.assertEqual(2, stream.seek(2))
+            self.assertEqual(4, stream.seek(2, io.SEEK_CUR))
+            self.assertEqual(image_path.read_bytes()[4:8], stream.read(4))
+            with self.assertRaises(ValueError):
+                stream.seek(-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import random
+import unittest
+
+import PIL.Image
+from PIL import ImageChops, ImageStat
+
+from phrugal.composition import ImageComposition, ImageMerge
+from phrugal.layout import LayoutPlanner, Placement, merge_pairwise
+
+
+def merge_legacy(images):
+    merge_list = [ImageMerge(image=im, count=1) for im in images]
+    return ImageComposition._merge_image_list(merge_list, draw_separator=True).image
+
+
+class TestLayoutPlanner(unittest.TestCase):
+    COLORS = ["red", "green", "blue", "yellow", "cyan", "magenta", "orange", "purple"]
+
+    def _get_test_dims(self, count):
+        # fmt: off
+        return {
+            "same size": [(400, 300)] * count,
+            "growing": [(400 + 37 * i, 300 + 11 * i) for i in range(count)],
+            "mixed orientation": [(300, 400) if i % 2 else (500, 300) for i in range(count)],
+        }
+        # fmt: on
+
+    def test_merge_order_same_as_sorting(self):
+        def merge_by_sorting(items):
+            merges = []
+            while len(items) > 1:
+                items.sort(key=lambda i: i[0])
+                a, b = items.pop(0), items.pop(0)
+                merges.append((a[1], b[1]))
+                items.append((a[0] + b[0], f"({a[1]}+{b[1]})"))
+            return merges
+
+        rng = random.Random(42)
+        for count in [1, 2, 3, 7, 16, 50]:
+            with self.subTest(f"{count} items"):
+                items = [(rng.randint(1, 4), str(i)) for i in range(count)]
+                merges = []
+
+                def merge(a, b):
+                    merges.append((a[1], b[1]))
+                    return a[0] + b[0], f"({a[1]}+{b[1]})"
+
+                merge_pairwise(items, merge, get_count=lambda i: i[0])
+                self.assertListEqual(merge_by_sorting(list(items)), merges)
+
+    def test_many_tiles(self):
+        dims = [(40 + i % 7, 30 + i % 5) for i in range(1200)]
+        planner = LayoutPlanner(dims)
+        self.assertEqual(len(dims), len(planner.placements))
+        canvas_x, canvas_y = planner.size
+        for p in planner.placements:
+            x0, y0, x1, y1 = p.box
+            self.assertTrue(0 <= x0 < x1 <= canvas_x + 1e-6)
+            self.assertTrue(0 <= y0 < y1 <= canvas_y + 1e-6)
+
+        images = [PIL.Image.new("RGB", d, "red") for d in dims]
+        self.assertEqual(planner.size, merge_legacy(images).size)
+
+    def test_empty(self):
+        self.assertIsNone(LayoutPlanner([]).root)
+
+    def test_single_image(self):
+        planner = LayoutPlanner([(300, 400)])
+        self.assertEqual((300, 400), planner.size)
+        self.assertListEqual([Placement(0, (0, 0, 300, 400))], planner.placements)
+        self.assertListEqual([], planner.separators)
+
+    def test_same_layout_as_merge(self):
+        for count in range(1, len(self.COLORS) + 1):
+            for name, dims in self._get_test_dims(count).items():
+                with self.subTest(f"{count} images, {name}"):
+                    images = [
+                        PIL.Image.new("RGB", d, c) for d, c in zip(dims, self.COLORS)
+                    ]
+                    expected = merge_legacy(images)
+                    planner = LayoutPlanner(dims)
+                    actual = planner.render(images)
+
+                    self.assertEqual(expected.size, planner.size)
+                    self.assertEqual(expected.size, actual.size)
+                    for p in planner.placements:
+                        x0, y0, x1, y1 = p.int_box
+                        center = (x0 + x1) // 2, (y0 + y1) // 2
+                        self.assertEqual(
+                            expected.getpixel(center), actual.getpixel(center)
+                        )
+
+    def test_same_rotation_as_merge(self):
+        gradient = PIL.Image.linear_gradient("L").resize((400, 300))
+        image = PIL.Image.merge(
+            "RGB",
+            (
+                gradient,
+                gradient.transpose(PIL.Image.Transpose.FLIP_LEFT_RIGHT),
+                gradient,
+            ),
+        )
+        for count in [2, 3, 4, 5, 8]:
+            with self.subTest(f"{count} images"):
+                images = [image.copy() for _ in range(count)]
+                expected = merge_legacy(images)
+                actual = LayoutPlanner([im.size for im in images]).render(images)
+                mean_difference = ImageStat.Stat(
+                    ImageChops.difference(expected, actual)
+                ).mean
+                for channel_difference in mean_difference:
+                    self.assertLess(channel_difference, 2.0)
+
+    def test_render_scaled_from_generator(self):
+        dims = self._get_test_dims(5)["mixed orientation"]
+        planner = LayoutPlanner(dims)
+        requested = []
+
+        def generate_images():
+            for d, c in zip(dims, self.COLORS):
+                requested.append(c)
+                yield PIL.Image.new("RGB", d, c)
+
+        actual = planner.render(generate_images(), scale=0.25)
+        self.assertListEqual(self.COLORS[:5], requested)
+        self.assertEqual(planner.get_canvas_size(0.25), actual.size)
+        self.assertEqual(round(max(planner.size) * 0.25), max(actual.size))
+        expected = planner.render(
+            [PIL.Image.new("RGB", d, c) for d, c in zip(dims, self.COLORS)]
+        )
+        for p in planner.placements:
+            x0, y0, x1, y1 = p.scaled(0.25).int_box
+            center = (x0 + x1) // 2, (y0 + y1) // 2
+            self.assertEqual(
+                expected.getpixel((center[0] * 4, center[1] * 4)),
+                actual.getpixel(center),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from phrugal.composer import PhrugalComposer
+from phrugal.decoration_config import DecorationConfig
+from phrugal.manifest import Manifest, get_input_key
+
+
+class TestIncrementalRebuild(unittest.TestCase):
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        self.test_data_path = Path(f"{current_dir}/img/aspect-ratio")
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.input_path = Path(self._temp_dir.name) / "input"
+        self.output_path = Path(self._temp_dir.name) / "output"
+        self.output_path.mkdir()
+        # 8 images, so that all groups of 4 are complete
+        self.spare_image = sorted(self.test_data_path.glob("*.jpg"))[0]
+        self.input_path.mkdir()
+        for image in sorted(self.test_data_path.glob("*.jpg"))[1:]:
+            shutil.copy(image, self.input_path)
+        self.deco_config = DecorationConfig()
+        self.deco_config.load_default_config()
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _run(self, incremental: bool = True) -> PhrugalComposer:
+        composer = PhrugalComposer(decoration_config=self.deco_config)
+        composer.discover_images(self.input_path)
+        composer.create_compositions(
+            output_path=self.output_path, incremental=incremental
+        )
+        self.assertListEqual([], composer.failed_groups)
+        return composer
+
+    def _get_outputs(self) -> dict[str, int]:
+        return {f.name: f.stat().st_mtime_ns for f in self.output_path.glob("img-*")}
+
+    def _add_image(self, source: Path, name: str) -> Path:
+        target = self.input_path / name
+        shutil.copy(source, target)
+        return target
+
+    def test_unchanged(self):
+        first_run = self._run()
+        outputs = self._get_outputs()
+        self.assertEqual(len(first_run._image_groups), len(outputs))
+
+        second_run = self._run()
+        self.assertListEqual([], second_run._image_groups)
+        self.assertDictEqual(outputs, self._get_outputs())
+
+    def test_new_images(self):
+        self._run()
+        outputs = self._get_outputs()
+
+        self._add_image(self.spare_image, "new-1.jpg")
+        composer = self._run()
+        self.assertEqual(1, len(composer._image_groups))
+        after_first_new = self._get_outputs()
+        self.assertEqual(len(outputs) + 1, len(after_first_new))
+        for name, mtime in outputs.items():
+            self.assertEqual(mtime, after_first_new[name])
+
+        # the group with only one image is not complete, it takes up the next image
+        self._add_image(self.spare_image, "new-2.jpg")
+        composer = self._run()
+        self.assertEqual(1, len(composer._image_groups))
+        self.assertEqual(2, len(composer._image_groups[0]))
+        self.assertEqual(len(after_first_new), len(self._get_outputs()))
+        manifest = Manifest.load(self.output_path)
+        self.assertEqual(len(after_first_new), len(manifest.entries))
+
+    def test_changed_input(self):
+        self._run()
+        outputs = self._get_outputs()
+        # the image that is part of the fewest compositions
+        inputs = [i for e in Manifest.load(self.output_path).entries for i in e.inputs]
+        changed_image = Path(min(set(inputs), key=inputs.count))
+        stat = changed_image.stat()
+        os.utime(changed_image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        composer = self._run()
+        rendered = composer._image_groups
+        self.assertTrue(rendered)
+        self.assertLess(len(rendered), len(outputs))
+        for group in rendered:
+            self.assertIn(
+                str(changed_image), [get_input_key(img.file_name) for img in group]
+            )
+
+    def test_removed_input(self):
+        self._run()
+        outputs = self._get_outputs()
+        sorted(self.input_path.glob("*.jpg"))[0].unlink()
+
+        self._run()
+        manifest = Manifest.load(self.output_path)
+        self.assertSetEqual(
+            {e.filename for e in manifest.entries}, set(self._get_outputs())
+        )
+        self.assertLessEqual(len(self._get_outputs()), len(outputs))
+
+    def test_changed_settings(self):
+        first_run = self._run()
+        self.deco_config.set_output_params(quality=90)
+        second_run = self._run()
+        self.assertEqual(len(first_run._image_groups), len(second_run._image_groups))
+
+    def test_not_incremental(self):
+        first_run = self._run()
+        second_run = self._run(incremental=False)
+        self.assertEqual(len(first_run._image_groups), len(second_run._image_groups))
+
+    def test_unreadable_manifest(self):
+        (self.output_path / Manifest.FILE_NAME).write_text("{", encoding="utf-8")
+        with self.assertLogs("phrugal.manifest", level="WARNING"):
+            self.assertListEqual([], Manifest.load(self.output_path).entries)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import os
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from phrugal.composer import PhrugalComposer
+from phrugal.decoration_config import DecorationConfig
+from phrugal.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        Metrics.reset()
+
+    def tearDown(self):
+        Metrics.reset()
+
+    def test_measure(self):
+        for size in [100, 200]:
+            with Metrics.measure("encode") as stats:
+                stats.bytes_written = size
+        stats = Metrics.STAGES["encode"]
+        self.assertEqual(2, stats.calls)
+        self.assertEqual(300, stats.bytes_written)
+        self.assertGreater(stats.wall_seconds, 0.0)
+
+    def test_measure_error(self):
+        with self.assertRaises(ValueError):
+            with Metrics.measure("decode"):
+                raise ValueError()
+        self.assertEqual(1, Metrics.STAGES["decode"].calls)
+
+    def test_merge(self):
+        with Metrics.measure("exif") as stats:
+            stats.bytes_read = 10
+        Metrics.count_cache("address cache", hits=3, misses=1)
+        snapshot = json.loads(json.dumps(Metrics.snapshot()))
+        Metrics.merge(snapshot)
+
+        report = Metrics.get_report()
+        self.assertEqual(2, report["stages"]["exif"]["calls"])
+        self.assertEqual(20, report["stages"]["exif"]["bytes_read"])
+        self.assertDictEqual(
+            {"hits": 6, "misses": 2, "hit_rate": 0.75},
+            report["caches"]["address cache"],
+        )
+
+    def test_empty_report(self):
+        report = Metrics.get_report()
+        self.assertEqual(0, report["images"])
+        self.assertIsNone(report["images_per_second"])
+        self.assertIn("0 images", Metrics.get_summary())
+
+
+class TestComposerMetrics(unittest.TestCase):
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        self.test_data_path = Path(f"{current_dir}/img/aspect-ratio")
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.temp_path = Path(self._temp_dir.name)
+        Metrics.reset()
+
+    def tearDown(self):
+        Metrics.reset()
+        self._temp_dir.cleanup()
+
+    def test_stages(self):
+        for workers in [1, 2]:
+            with self.subTest(workers=workers):
+                Metrics.reset()
+                deco_config = DecorationConfig()
+                deco_config.load_default_config()
+                composer = PhrugalComposer(
+                    decoration_config=deco_config,
+                    metadata_cache=self.temp_path / f"metadata-{workers}.sqlite",
+                )
+                composer.discover_images(self.test_data_path)
+                output_path = self.temp_path / str(workers)
+                output_path.mkdir()
+                composer.create_compositions(output_path, max_workers=workers)
+                # the metadata cache is cold and written by the geocode prefetch thread
+                # and the workers at the same time
+                self.assertListEqual([], composer.failed_groups)
+
+                report = Metrics.get_report()
+                group_count = len(composer._image_groups)
+                image_count = sum(len(g) for g in composer._image_groups)
+                self.assertEqual(group_count, report["groups"])
+                self.assertEqual(image_count, report["images"])
+                self.assertGreater(report["images_per_second"], 0.0)
+                self.assertAlmostEqual(sum(composer.wasted_area), report["wasted_area"])
+                stages = report["stages"]
+                for stage in ["read", "decode", "decorate", "text", "resize"]:
+                    self.assertEqual(image_count, stages[stage]["calls"], stage)
+                self.assertEqual(group_count, stages["encode"]["calls"])
+                output_size = sum(f.stat().st_size for f in output_path.glob("img-*"))
+                self.assertEqual(output_size, stages["encode"]["bytes_written"])
+                input_size = sum(
+                    img.file_name.stat().st_size
+                    for group in composer._image_groups
+                    for img in group
+                )
+                self.assertEqual(input_size, stages["read"]["bytes_read"])
+                # the prefetch thread reads EXIF data from the files, the workers get it
+                # from the metadata cache or the bytes that were read already
+                self.assertGreater(stages["exif"]["bytes_read"], 0)
+                self.assertIn("metadata cache", report["caches"])
+
+    def test_write_report(self):
+        with Metrics.measure("encode"):
+            pass
+        report_path = self.temp_path / "report.json"
+        Metrics.write_report(report_path)
+        with open(report_path, encoding="utf-8") as fp:
+            self.assertIn("encode", json.load(fp)["stages"])
+
+
+if __name__ == "__main__":
+    unittest.main()
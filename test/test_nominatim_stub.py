@@ -0,0 +1,151 @@
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from phrugal.composer import PhrugalComposer
+from phrugal.decoration_config import DecorationConfig
+from phrugal.geocode import Geocoder, NominatimBackend
+from phrugal.nominatim_stub import NominatimStub, load_fixture
+
+FIXTURE_PATH = Path(__file__).parent / "nominatim-fixture.json"
+TEST_DATA = Path(__file__).parent / "img" / "exif-data-testdata"
+
+
+class TestNominatimStub(unittest.TestCase):
+    def setUp(self):
+        self.places = load_fixture(FIXTURE_PATH)
+        Geocoder._ADDRESS_CACHE.clear()
+
+    def tearDown(self):
+        Geocoder.set_backend(None)
+        Geocoder._ADDRESS_CACHE.clear()
+
+    def _use_stub(self, stub: NominatimStub, max_retries: int = 0) -> None:
+        backend = NominatimBackend.from_url(
+            stub.url,
+            min_delay_seconds=0.0,
+            max_retries=max_retries,
+            error_wait_seconds=0.0,
+        )
+        Geocoder.set_backend(backend)
+
+    def test_reverse_zoom(self):
+        stub = NominatimStub(self.places)
+        self.addCleanup(stub.stop)
+        zoom_expected = [
+            (3, {"country": "România", "country_code": "ro"}),
+            (
+                12,
+                {
+                    "city": "Sibiu",
+                    "county": "Sibiu",
+                    "ISO3166-2-lvl4": "RO-SB",
+                    "postcode": "550182",
+                    "country": "România",
+                    "country_code": "ro",
+                },
+            ),
+        ]
+        for zoom, expected in zoom_expected:
+            with self.subTest(f"zoom {zoom}"):
+                answer = stub.reverse(45.7983, 24.1512, zoom)
+                self.assertDictEqual(expected, answer["address"])
+                self.assertEqual("45.79833", answer["lat"])
+        self.assertIn(
+            "Piața Mică", stub.reverse(45.7983, 24.1512, 18)["address"]["road"]
+        )
+        self.assertDictEqual({"error": "Unable to geocode"}, stub.reverse(0.0, 0.0, 18))
+
+    def test_http(self):
+        with NominatimStub(self.places) as stub:
+            url = f"{stub.url}/reverse?lat=49.8&lon=9.95&zoom=10&format=json"
+            with urllib.request.urlopen(url) as response:
+                answer = json.load(response)
+            self.assertEqual("Würzburg", answer["address"]["city"])
+            self.assertNotIn("road", answer["address"])
+
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(f"{stub.url}/search?q=Sibiu")
+            self.assertEqual(404, context.exception.code)
+
+    def test_geocoder(self):
+        with NominatimStub(self.places) as stub:
+            self._use_stub(stub)
+            geocoder = Geocoder()
+            self.assertEqual(
+                "Robert-Koch-Straße, Würzburg, Würzburg, Bayern, Deutschland",
+                geocoder.get_location_name(49.80264, 9.95056, zoom=18),
+            )
+            self.assertEqual("", geocoder.get_location_name(0.0, 0.0))
+            self.assertEqual(2, stub.request_count)
+
+    def test_nominatim_url(self):
+        with NominatimStub(self.places) as stub:
+            Geocoder.set_nominatim_url(stub.url + "/", min_delay_seconds=0.0)
+            self.assertEqual(f"nominatim@{stub.url[7:]}", Geocoder.BACKEND.NAME)
+            self.assertEqual(
+                "Sibiu, Sibiu, România", Geocoder().get_location_name(45.7983, 24.1512)
+            )
+
+        for url in ["localhost:8080", "ftp://localhost"]:
+            with self.subTest(url):
+                with self.assertRaises(ValueError):
+                    Geocoder.set_nominatim_url(url)
+
+    def test_errors_are_retried(self):
+        with NominatimStub(self.places, error_rate=0.5, seed=1) as stub:
+            self._use_stub(stub, max_retries=20)
+            geocoder = Geocoder()
+            for lat, lon in [(45.7983, 24.1512), (45.6516, 23.9283), (49.8, 9.95)]:
+                with self.subTest(f"{lat}, {lon}"):
+                    self.assertNotEqual("", geocoder.get_location_name(lat, lon))
+            self.assertGreater(stub.error_count, 0)
+            self.assertEqual(3, stub.request_count - stub.error_count)
+
+    def test_concurrent_lookups_share_request(self):
+        with NominatimStub(self.places, latency_seconds=0.2) as stub:
+            self._use_stub(stub)
+            results = []
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(
+                        Geocoder().get_location_name(45.7983, 24.1512)
+                    )
+                )
+                for _ in range(3)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertListEqual(["Sibiu, Sibiu, România"] * 3, results)
+            self.assertEqual(1, stub.request_count)
+
+    def test_invalid_error_rate(self):
+        with self.assertRaises(ValueError):
+            NominatimStub(self.places, error_rate=1.5)
+
+    def test_composer(self):
+        images = sorted(TEST_DATA.glob("20240729_00[2-3]*.jpg"))[:8]
+        config = DecorationConfig()
+        config.load_default_config()
+        for max_workers in [1, 2]:
+            with self.subTest(f"workers: {max_workers}"), TemporaryDirectory(
+                prefix="phrugal-test"
+            ) as temp_dir, NominatimStub(self.places) as stub:
+                Geocoder._ADDRESS_CACHE.clear()
+                composer = PhrugalComposer(
+                    config,
+                    input_files=images,
+                    nominatim_url=stub.url,
+                    nominatim_delay_seconds=0.0,
+                )
+                composer.create_compositions(temp_dir, max_workers=max_workers)
+                self.assertListEqual([], composer.failed_groups)
+                # all images are taken at the same place, the workers get the result
+                self.assertEqual(1, stub.request_count)
+                self.assertIsNone(Geocoder.BACKEND)
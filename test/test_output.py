@@ -0,0 +1,97 @@
+import os
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import PIL.Image
+
+from phrugal.composer import PhrugalComposer
+from phrugal.composition import ImageComposition
+from phrugal.decoration_config import DecorationConfig
+from phrugal.output import OutputFormat, OutputSettings
+
+
+class TestOutputSettings(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.temp_path = Path(self._temp_dir.name)
+        noise = PIL.Image.effect_noise((200, 150), 60)
+        self.image = PIL.Image.merge("RGB", (noise, noise, noise))
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_defaults(self):
+        settings = OutputSettings()
+        self.assertEqual(".jpg", settings.extension)
+        self.assertDictEqual(
+            {"format": "JPEG", "progressive": False, "optimize": False},
+            settings.get_save_params(),
+        )
+
+    def test_from_dict(self):
+        settings = OutputSettings.from_dict({"format": "webp", "quality": 90})
+        self.assertEqual(OutputFormat.WEBP, settings.format)
+        self.assertEqual(".webp", settings.extension)
+        self.assertDictEqual(
+            {"format": "WEBP", "quality": 90}, settings.get_save_params()
+        )
+
+    def test_invalid(self):
+        invalid_params = [
+            {"format": "gif"},
+            {"quality": 0},
+            {"subsampling": "4:1:1"},
+            {"compression": "lzw"},
+        ]
+        for params in invalid_params:
+            with self.subTest(f"{params}"):
+                with self.assertRaises(ValueError):
+                    OutputSettings.from_dict(params)
+
+    def test_save_formats(self):
+        for output_format in OutputFormat:
+            with self.subTest(f"{output_format}"):
+                settings = OutputSettings(format=output_format, optimize=True)
+                filename = self.temp_path / f"image{settings.extension}"
+                ImageComposition.save(self.image, filename, settings)
+                with PIL.Image.open(filename) as written:
+                    self.assertEqual(output_format.value.upper(), written.format)
+                    self.assertEqual(self.image.size, written.size)
+
+    def test_jpeg_quality_and_subsampling(self):
+        sizes = []
+        for quality, subsampling in [(95, "4:4:4"), (95, "4:2:0"), (50, "4:2:0")]:
+            filename = self.temp_path / f"{quality}-{subsampling.replace(':', '')}.jpg"
+            settings = OutputSettings(quality=quality, subsampling=subsampling)
+            ImageComposition.save(self.image, filename, settings)
+            sizes.append(os.path.getsize(filename))
+        self.assertEqual(sorted(sizes, reverse=True), sizes)
+
+
+class TestComposerOutput(unittest.TestCase):
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        self.test_data_path = Path(f"{current_dir}/img/aspect-ratio")
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.temp_path = Path(self._temp_dir.name)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_create_compositions_png(self):
+        config = DecorationConfig()
+        config.load_default_config()
+        config.set_output_params(format="png", quality=None)
+        composer = PhrugalComposer(decoration_config=config)
+        composer.discover_images(self.test_data_path)
+        composer.create_compositions(output_path=self.temp_path)
+
+        written = sorted(self.temp_path.glob("img-*"))
+        self.assertTrue(written)
+        self.assertSetEqual({".png"}, {f.suffix for f in written})
+        self.assertNotIn("output", DecorationConfig.DEFAULT_CONFIG)
+
+
+if __name__ == "__main__":
+    unittest.main()
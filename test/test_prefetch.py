@@ -0,0 +1,69 @@
+import os
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from phrugal.exif import PhrugalExifData
+from phrugal.geocode import Geocoder
+from phrugal.prefetch import GeocodePrefetcher
+
+
+class TestGeocodePrefetcher(unittest.TestCase):
+    ADDRESS = {"road": "Piața Mică", "city": "Sibiu", "country": "România"}
+
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        test_data = Path(f"{current_dir}/img/exif-data-testdata")
+        self.with_gps = sorted(test_data.glob("20240729_00[2-3]*.jpg"))
+        self.without_gps = sorted(test_data.glob("20240729_009*.jpg"))
+        self.other_location = test_data / "2019-07-04 21.37.27.jpg"
+        Geocoder._ADDRESS_CACHE.clear()
+        patcher = mock.patch.object(
+            Geocoder, "_call_reverse_api", return_value=self.ADDRESS
+        )
+        self.api_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        Geocoder._ADDRESS_CACHE.clear()
+
+    def test_duplicates_are_resolved_once(self):
+        groups = [
+            tuple(self.with_gps[:4]),
+            tuple(self.with_gps[4:]) + (None,),
+            tuple(self.without_gps) + (self.other_location,),
+        ]
+        prefetcher = GeocodePrefetcher(groups, [{"zoom": 12}])
+        prefetcher.start()
+        addresses = [prefetcher.get_group_addresses(i) for i in range(len(groups))]
+        prefetcher.stop()
+
+        self.assertEqual(2, self.api_mock.call_count)
+        self.assertEqual(1, len(addresses[0]))
+        self.assertDictEqual(addresses[0], addresses[1])
+        self.assertEqual(1, len(addresses[2]))
+
+    def test_rendering_uses_prefetched_locations(self):
+        params = [{"zoom": 12}, {"zoom": 18, "precision": 3}]
+        prefetcher = GeocodePrefetcher([tuple(self.with_gps)], params)
+        prefetcher.start()
+        prefetcher.get_group_addresses(0)
+        prefetcher.stop()
+        self.assertEqual(2, self.api_mock.call_count)
+
+        for image in self.with_gps:
+            exif = PhrugalExifData(image)
+            for p in params:
+                self.assertEqual("Piața Mică, Sibiu, România", exif.get_geocode(**p))
+        self.assertEqual(2, self.api_mock.call_count)
+
+    def test_stop_early(self):
+        prefetcher = GeocodePrefetcher([tuple(self.with_gps)] * 3, [{"zoom": 12}])
+        prefetcher._stop.set()
+        prefetcher.start()
+        self.assertDictEqual({}, prefetcher.get_group_addresses(2))
+        prefetcher.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import PIL.Image
+
+from phrugal.image import PhrugalImage
+from phrugal.probe import probe_image, probe_images
+
+ORIENTATION_TAG = 0x0112
+
+
+class TestProbe(unittest.TestCase):
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        self.test_images = sorted(Path(f"{current_dir}/img").glob("**/*.jpg"))
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.temp_path = Path(self._temp_dir.name)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_same_dimensions_as_pillow(self):
+        for image in self.test_images:
+            with self.subTest(f"image {image.name}"):
+                info = probe_image(image)
+                with PhrugalImage(image) as img:
+                    self.assertEqual(img.image_dims, info.image_dims)
+                    self.assertEqual(img.aspect_ratio, info.aspect_ratio)
+                    self.assertEqual(
+                        img.aspect_ratio_normalized, info.aspect_ratio_normalized
+                    )
+
+    def test_exif_segment(self):
+        """The EXIF segment is skipped, its orientation does not change the dimensions."""
+        for orientation in [1, 3, 6, 8]:
+            for byte_order in ["<", ">"]:
+                with self.subTest(
+                    f"orientation {orientation}, byte order {byte_order}"
+                ):
+                    image_path = self.temp_path / f"{orientation}.jpg"
+                    exif = PIL.Image.Exif()
+                    exif._endian = byte_order
+                    exif[ORIENTATION_TAG] = orientation
+                    PIL.Image.new("RGB", (60, 40)).save(image_path, exif=exif)
+
+                    info = probe_image(image_path)
+                    self.assertEqual((60, 40), info.image_dims)
+
+    def test_without_exif(self):
+        image_path = self.temp_path / "no-exif.jpg"
+        PIL.Image.new("RGB", (60, 40)).save(image_path)
+        self.assertEqual((60, 40), probe_image(image_path).image_dims)
+
+    def test_other_format(self):
+        image_path = self.temp_path / "image.png"
+        PIL.Image.new("RGB", (60, 40)).save(image_path)
+        self.assertEqual((60, 40), probe_image(image_path).image_dims)
+
+    def test_not_an_image(self):
+        image_path = self.temp_path / "image.jpg"
+        image_path.write_bytes(b"\xff\xd8\xff\xe0\x00")
+        with self.assertRaises(PIL.UnidentifiedImageError):
+            probe_image(image_path)
+
+    def test_probe_images(self):
+        infos = probe_images(self.test_images, max_workers=4)
+        self.assertListEqual(self.test_images, [i.file_name for i in infos])
+
+
+if __name__ == "__main__":
+    unittest.main()
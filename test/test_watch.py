@@ -0,0 +1,187 @@
+import os
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from phrugal.composer import PhrugalComposer
+from phrugal.decoration_config import DecorationConfig
+from phrugal.exif import PhrugalExifData
+from phrugal.manifest import Manifest, get_input_key
+from phrugal.probe import probe_images
+from phrugal.watch import DirectoryPoller, PhrugalWatcher
+
+
+class TestDirectoryPoller(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.root = Path(self._temp_dir.name)
+        (self.root / "existing.jpg").write_bytes(b"foo")
+        self.poller = DirectoryPoller(self.root)
+        self.poller.RACY_SECONDS = 0.0
+        self.poller.scan()
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_scan(self):
+        self.assertSetEqual({self.root / "existing.jpg"}, self.poller.known_files)
+        self.assertListEqual([], self.poller.poll())
+
+    def test_new_files(self):
+        (self.root / "new.jpg").write_bytes(b"foo")
+        (self.root / "new.txt").write_bytes(b"foo")
+        (self.root / "sub" / "dir").mkdir(parents=True)
+        (self.root / "sub" / "dir" / "nested.jpg").write_bytes(b"foo")
+
+        self.assertListEqual([], self.poller.poll())  # not known to be complete yet
+        new_files = [self.root / "new.jpg", self.root / "sub" / "dir" / "nested.jpg"]
+        self.assertListEqual(new_files, self.poller.poll())
+        self.assertListEqual([], self.poller.poll())
+        self.assertEqual(3, len(self.poller.known_files))
+
+    def test_growing_file(self):
+        new_file = self.root / "new.jpg"
+        new_file.write_bytes(b"foo")
+        self.assertListEqual([], self.poller.poll())
+        with open(new_file, "ab") as fp:
+            fp.write(b"bar")
+        self.assertListEqual([], self.poller.poll())
+        self.assertListEqual([new_file], self.poller.poll())
+
+    def test_removed_files(self):
+        (self.root / "sub").mkdir()
+        (self.root / "sub" / "new.jpg").write_bytes(b"foo")
+        self.poller.poll()
+        self.poller.poll()
+        (self.root / "existing.jpg").unlink()
+        shutil.rmtree(self.root / "sub")
+
+        self.assertListEqual([], self.poller.poll())
+        self.assertSetEqual(set(), self.poller.known_files)
+
+    def test_unchanged_directories_not_listed(self):
+        (self.root / "sub").mkdir()
+        self.poller.poll()
+        with mock.patch("phrugal.watch.os.scandir", wraps=os.scandir) as scandir:
+            self.poller.poll()
+            scandir.assert_not_called()
+
+            (self.root / "sub" / "new.jpg").write_bytes(b"foo")
+            self.poller.poll()
+            scandir.assert_called_once_with(self.root / "sub")
+
+
+class TestPhrugalWatcher(unittest.TestCase):
+    def setUp(self):
+        current_dir = os.path.dirname(__file__)
+        self.test_images = sorted(Path(f"{current_dir}/img/aspect-ratio").glob("*.jpg"))
+        self._temp_dir = TemporaryDirectory(prefix="phrugal-test")
+        self.input_path = Path(self._temp_dir.name) / "input"
+        self.output_path = Path(self._temp_dir.name) / "output"
+        self.input_path.mkdir()
+        self.output_path.mkdir()
+        for image in self.test_images[:2]:
+            shutil.copy(image, self.input_path)
+
+        config = DecorationConfig()
+        config.load_default_config()
+        self.image_count = config.get_image_count()
+        self.watcher = PhrugalWatcher(
+            PhrugalComposer(decoration_config=config),
+            self.input_path,
+            self.output_path,
+            batch_timeout=60.0,
+        )
+        self.watcher.poller.RACY_SECONDS = 0.0
+        self.watcher.start()
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _add_images(self, images: list[Path]) -> None:
+        for image in images:
+            shutil.copy(image, self.input_path)
+
+    def _get_composed_images(self) -> set[str]:
+        entries = Manifest.load(self.output_path).entries
+        return {i for entry in entries for i in entry.real_inputs}
+
+    def _get_input_keys(self) -> set[str]:
+        return {get_input_key(p) for p in self.input_path.glob("*.jpg")}
+
+    def test_start(self):
+        self.assertEqual(1, self.watcher.batch_count)
+        self.assertSetEqual(self._get_input_keys(), self._get_composed_images())
+
+    def test_full_batch(self):
+        self._add_images(self.test_images[2 : 1 + self.image_count])
+        self.assertFalse(self.watcher.poll_once(now=0.0))
+        self.assertFalse(self.watcher.poll_once(now=1.0))  # one image is missing
+
+        self._add_images(self.test_images[1 + self.image_count : 2 + self.image_count])
+        self.assertFalse(self.watcher.poll_once(now=2.0))
+        self.assertTrue(self.watcher.poll_once(now=3.0))
+        self.assertEqual(2, self.watcher.batch_count)
+        self.assertSetEqual(self._get_input_keys(), self._get_composed_images())
+
+    def test_batch_timeout(self):
+        self._add_images(self.test_images[2:3])
+        self.assertFalse(self.watcher.poll_once(now=0.0))
+        self.assertFalse(self.watcher.poll_once(now=1.0))
+        self.assertFalse(self.watcher.poll_once(now=60.0))
+        self.assertTrue(self.watcher.poll_once(now=61.0))
+        self.assertSetEqual(self._get_input_keys(), self._get_composed_images())
+
+    def test_pending_images_not_composed(self):
+        self._add_images(self.test_images[2:3])
+        self.watcher.poll_once(now=0.0)
+        self.watcher.poll_once(now=1.0)
+        self._add_images(self.test_images[3 : 3 + self.image_count])
+        self.watcher.poll_once(now=2.0)
+        self.assertTrue(self.watcher.poll_once(now=3.0))
+
+        # the batch has the oldest new images, the rest waits for more images or the timeout
+        composed = self._get_composed_images()
+        self.assertEqual(2 + self.image_count, len(composed))
+        self.assertNotIn(
+            get_input_key(
+                self.input_path / self.test_images[2 + self.image_count].name
+            ),
+            composed,
+        )
+
+    def test_only_new_images_probed(self):
+        new_images = self.test_images[2 : 2 + self.image_count]
+        self._add_images(new_images)
+        (self.input_path / self.test_images[0].name).unlink()
+        with mock.patch(
+            "phrugal.composer.probe_images", wraps=probe_images
+        ) as probe_mock:
+            self.watcher.poll_once(now=0.0)
+            self.assertTrue(self.watcher.poll_once(now=1.0))
+        probe_mock.assert_called_once()
+        self.assertListEqual(
+            [self.input_path / p.name for p in new_images],
+            list(probe_mock.call_args.args[0]),
+        )
+        self.assertListEqual(
+            sorted(self.input_path.glob("*.jpg")), self.watcher.composer.input_files
+        )
+
+    def test_run(self):
+        self.watcher.poll_interval = 0.0
+        with mock.patch.object(
+            self.watcher, "poll_once", side_effect=self.watcher.stop
+        ) as poll_once:
+            self.watcher.run()
+        poll_once.assert_called_once()
+        self.assertEqual(2, self.watcher.batch_count)
+        # without a metadata cache file, the EXIF data is kept in memory while watching
+        self.assertEqual(":memory:", str(self.watcher.composer.metadata_cache_path))
+        self.assertIsNone(PhrugalExifData.METADATA_CACHE)
+
+
+if __name__ == "__main__":
+    unittest.main()